@@ -22,11 +22,40 @@ CREATE TABLE IF NOT EXISTS recipes (
     metadata JSONB,  -- Changed from TEXT to JSONB for timescale compatibility
     contents TEXT NOT NULL,
     embedding vector(1536),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Uniform random key for index-based sampling (MealDatabase.get_diverse_recipes)
+    random_key DOUBLE PRECISION NOT NULL DEFAULT random(),
+    -- Recipe cluster, see recipes_clusters (RecipeClusters)
+    cluster_id INTEGER,
+    -- Typed diet columns generated from the metadata written at ingest
+    -- (VectorStore.create_diet_columns adds them to existing tables)
+    diet_pref TEXT GENERATED ALWAYS AS (metadata->>'diet_pref') STORED,
+    is_vegan BOOLEAN GENERATED ALWAYS AS (metadata->>'diet_pref' IN ('vegan')) STORED,
+    is_vegetarian BOOLEAN GENERATED ALWAYS AS (metadata->>'diet_pref' IN ('vegan', 'vegetarian')) STORED,
+    is_pescetarian BOOLEAN GENERATED ALWAYS AS (metadata->>'diet_pref' IN ('vegan', 'vegetarian', 'pescetarian')) STORED,
+    -- Full-text lexemes of the contents for hybrid search (VectorStore.create_text_search)
+    contents_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(contents, ''))) STORED
+);
+
+CREATE INDEX IF NOT EXISTS recipes_random_key_idx ON recipes (random_key);
+CREATE INDEX IF NOT EXISTS recipes_random_key_vegan_idx ON recipes (random_key) WHERE is_vegan;
+CREATE INDEX IF NOT EXISTS recipes_random_key_vegetarian_idx ON recipes (random_key) WHERE is_vegetarian;
+CREATE INDEX IF NOT EXISTS recipes_random_key_pescetarian_idx ON recipes (random_key) WHERE is_pescetarian;
+
+CREATE INDEX IF NOT EXISTS recipes_cluster_id_idx ON recipes (cluster_id, random_key);
+
+CREATE INDEX IF NOT EXISTS recipes_contents_tsv_idx ON recipes USING gin (contents_tsv);
+
+-- Centroids of the recipe clusters, filled by insert_vectors.py --cluster N
+CREATE TABLE IF NOT EXISTS recipes_clusters (
+    cluster_id INTEGER PRIMARY KEY,
+    centroid vector(1536) NOT NULL,
+    size BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create index for vector similarity search
-CREATE INDEX IF NOT EXISTS recipes_embedding_idx ON recipes USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+-- The vector similarity index is built after loading, sized to the data:
+-- see VectorStore.ensure_index (run by insert_vectors.py)
 
 
 -- Create meal_plans table
@@ -41,4 +70,28 @@ CREATE TABLE IF NOT EXISTS meal_plans (
 
 -- Add foreign key constraint
 ALTER TABLE meals ADD CONSTRAINT fk_meal_plan 
-    FOREIGN KEY (meal_plan_id) REFERENCES meal_plans(id) ON DELETE CASCADE;
\ No newline at end of file
+    FOREIGN KEY (meal_plan_id) REFERENCES meal_plans(id) ON DELETE CASCADE;
+
+-- Shared cache of LLM suggestions and plans (ResponseCache, created on first
+-- use if missing); embeddings of any model/length, compared per model
+CREATE TABLE IF NOT EXISTS response_cache (
+    id BIGSERIAL PRIMARY KEY,
+    request_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ingredients TEXT NOT NULL,
+    preferences TEXT NOT NULL,
+    num_people INTEGER NOT NULL,
+    num_days INTEGER NOT NULL,
+    embedding_model TEXT,
+    embedding vector,
+    response JSONB NOT NULL,
+    meal_names TEXT[] NOT NULL,
+    latency_ms DOUBLE PRECISION NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS response_cache_request_key_idx ON response_cache (request_key, created_at);
+CREATE INDEX IF NOT EXISTS response_cache_semantic_idx
+    ON response_cache (kind, num_people, num_days, preferences, created_at)
+    WHERE embedding IS NOT NULL;
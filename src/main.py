@@ -1,8 +1,16 @@
 from datetime import datetime
 import streamlit as st
+from mealprep.services.container import get_container
 from mealprep.services.meal_service import MealService
 
-service = MealService()
+
+@st.cache_resource
+def get_service() -> MealService:
+    """Meal service shared by all sessions and reruns of this process."""
+    # The container owns the database pool and the API clients and closes
+    # them when the process exits. Handlers call this when they need the
+    # service, so the page renders before the clients are loaded
+    return get_container().service
 
 st.set_page_config(page_title="Meal Planner", layout="wide")
 st.title("🍽️ AI Meal Planner")
@@ -81,7 +89,7 @@ active_ingredients = [
 if st.button("🚀 Suggest a Meal", type="primary"):
     if active_ingredients:
         with st.spinner(f"Looking for a meal with: {', '.join(active_ingredients)}"):
-            parsed_meal = service.suggest_meal(
+            parsed_meal = get_service().suggest_meal(
                 active_ingredients,
                 rejected_meals=st.session_state.rejected_meals,
                 num_people=num_people,
@@ -119,7 +127,7 @@ if st.session_state.current_meal:
                 st.success(
                     f"Saved! You're cooking {st.session_state.current_meal['meal_name']} today."
                 )
-                service.add_meal(
+                get_service().add_meal(
                     ingredients=st.session_state.current_meal["ingredients"],
                     meal=st.session_state.current_meal["meal_name"],
                     recipe="\n".join(st.session_state.current_meal["recipe"]),
@@ -180,7 +188,7 @@ col1, col2 = st.columns(2)
 with col1:
     if st.button("📅 Generate Meal Plan", type="primary"):
         with st.spinner(f"Generating {num_days}-day meal plan..."):
-            meal_plan = service.generate_meal_plan(
+            meal_plan = get_service().generate_meal_plan(
                 num_days=num_days,
                 num_people=num_people_plan,
                 days_back=days_back_plan,
@@ -192,7 +200,7 @@ with col1:
             st.rerun()
 with col2:
     if st.button("📋 Load Last Plan", key="planloader_first_run"):
-        loaded_plan = service.get_latest_plan()
+        loaded_plan = get_service().get_latest_plan()
         if loaded_plan:
             st.session_state.meal_plan = {
                 "meals": loaded_plan["meals"],
@@ -283,7 +291,7 @@ if st.session_state.meal_plan:
                     if st.button("🔄", key=f"regenerate_{idx}"):
                         # Regenerate this meal
                         with st.spinner("Generating new meal..."):
-                            new_meal = service.regenerate_meal_for_day(
+                            new_meal = get_service().regenerate_meal_for_day(
                                 day=meal["day_number"],
                                 meal_plan_context=plan,
                                 num_people=num_people_plan,
@@ -324,7 +332,7 @@ if st.session_state.meal_plan:
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         if st.button("💾 Save Meal Plan", type="primary"):
-            service.save_meal_plan_to_db(
+            get_service().save_meal_plan_to_db(
                 meal_plan=plan,
                 num_people=num_people_plan,
                 dietary_preferences=dietary_preferences_plan,
@@ -334,7 +342,7 @@ if st.session_state.meal_plan:
 
     with col2:
         if st.button("📋 Load Last Plan", key="planloader_after_new_gen"):
-            loaded_plan = service.get_latest_plan()
+            loaded_plan = get_service().get_latest_plan()
             if loaded_plan:
                 st.session_state.meal_plan = {
                     "meals": loaded_plan["meals"],
@@ -0,0 +1,149 @@
+"""
+Benchmark the dietary classifier against the previous regex-scan implementation.
+
+Run with:
+    python -m mealprep.benchmarks.dietary_classifier --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from mealprep.helpers.utils import FLAG_COLUMNS, add_dietary_prefs
+
+DATA_PATH = Path(__file__).parent.parent.parent.parent / "data" / "recipes_data.csv"
+
+SYNTHETIC_INGREDIENTS = [
+    '["1 lb. ground beef", "1 onion, chopped", "2 c. tomato sauce"]',
+    '["2 salmon fillets", "1 lemon", "2 Tbsp. butter"]',
+    '["1 c. sugar", "2 eggs", "1 c. flour", "1 tsp. vanilla"]',
+    '["1 block tofu", "2 c. broccoli", "3 Tbsp. soy sauce", "1 Tbsp. honey"]',
+    '["1 lb. shrimp", "2 cloves garlic", "1 c. white rice"]',
+    '["1 eggplant", "2 c. chickpeas", "1 tsp. cumin", "2 Tbsp. olive oil"]',
+    '["4 chicken breasts", "1 c. sour cream", "1 c. Cheddar cheese"]',
+    '["2 c. milk", "3 Tbsp. cocoa", "1/2 c. whipping cream"]',
+]
+SYNTHETIC_TITLES = ["Casserole", "Baked Salmon", "Vanilla Cake", "Stir Fry", "Cookies", "Curry"]
+
+
+def legacy_add_dietary_prefs(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous implementation: one substring scan per flag."""
+    df["with_meat"] = df.ingredients.str.contains(
+        """
+    meat|chicken|turkey|duck|goose|quail|pheasant|guinea|cornish hen|
+    beef|veal|steak|ground beef|minced beef|roast beef|brisket|short ribs|oxtail|beef tenderloin|sirloin|ribeye|
+    pork|bacon|ham|prosciutto|pancetta|sausage|chorizo|
+    lamb|mutton|goat|venison|deer|elk|rabbit|boar|bison|buffalo|
+    meatballs|deli meat|hot dog|kebab|salami|pepperoni|pâté|liverwurst
+    """
+    )
+
+    df["with_fish"] = df.ingredients.str.contains(
+        """
+        salmon|tuna|cod|haddock|tilapia|trout|mackerel|sardines|anchovies|halibut|snapper|catfish|sole|swordfish|pollock
+        """
+    )
+
+    df["with_shellfish"] = df.ingredients.str.contains(
+        """shrimp|prawns|crab|lobster|mussels|clams|scallops|squid|calamari|octopus|oysters
+        """
+    )
+
+    df["with_dairy"] = df.ingredients.str.contains(
+        """dairy|milk|cream|butter|ghee|cheese|cheddar|mozzarella|parmesan|gouda|provolone|brie|camembert|feta|gorgonzola|ricotta|mascarpone|queso fresco|halloumi|paneer|pecorino|asiago|romano|colby jack|monterey jack|havarti|yogurt|kefir|labneh|ayran|skyr|ice cream|custard|flan
+        """
+    )
+
+    df["with_eggs"] = df.ingredients.str.contains(
+        """
+        egg|mayonnaise|aioli|hollandaise|custard|meringue|quiche|omelette|frittata|pasta dough|brioche|challah|pancakes|waffles|crepes|éclairs|choux|macarons
+        """
+    )
+    df["with_honey"] = df.ingredients.str.contains(
+        """
+        honey
+        """
+    )
+    deserts_str = """cake|cookie|brownie|muffin|cupcake|pancake|waffle|pie|tart|crumble|pudding|custard|mousse|cheesecake|ice cream|gelato|sorbet|parfait|trifle|doughnut|donut|croissant|strudel|crepe|biscuit|scone|macaron|meringue|chocolate|cocoa|caramel|vanilla|sweet|sugar|dessert|fruit salad|compote|jam|syrup|frosting|icing"""
+
+    df["dessert"] = (
+        df.title.str.contains(deserts_str) | df.ingredients.str.contains(deserts_str)
+    ) & ~(df["with_fish"] | df["with_meat"])
+
+    df["diet_pref"] = np.select(
+        condlist=[
+            df["with_meat"],
+            ~df["with_meat"] & (df["with_fish"] | df["with_shellfish"]),
+            ~df["with_meat"] & ~df["with_fish"] & ~df["with_shellfish"],
+            ~df["with_meat"]
+            & ~df["with_fish"]
+            & ~df["with_shellfish"]
+            & ~df["with_dairy"]
+            & ~df["with_honey"],
+        ],
+        choicelist=["with_meat", "pescetarian", "vegetarian", "vegan"],
+        default="omni",
+    )
+    return df
+
+
+def load_sample(rows: int, data_path: Path, seed: int = 0) -> pd.DataFrame:
+    """Read the first rows of the dataset, or build a synthetic frame if it is missing."""
+    if data_path.exists():
+        return pd.read_csv(data_path, nrows=rows, usecols=["title", "ingredients"])
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "title": rng.choice(SYNTHETIC_TITLES, size=rows),
+            "ingredients": rng.choice(SYNTHETIC_INGREDIENTS, size=rows),
+        }
+    )
+
+
+def timed(fn, df: pd.DataFrame, **kwargs):
+    start = time.perf_counter()
+    result = fn(df.copy(), **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--data-path", type=Path, default=DATA_PATH)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    df = load_sample(args.rows, args.data_path)
+    legacy, legacy_seconds = timed(legacy_add_dietary_prefs, df)
+    _, legacy_arrow_seconds = timed(
+        legacy_add_dietary_prefs,
+        df.astype({"title": "string[pyarrow]", "ingredients": "string[pyarrow]"}),
+    )
+    single, single_seconds = timed(add_dietary_prefs, df, n_jobs=1)
+    _, parallel_seconds = timed(add_dietary_prefs, df, n_jobs=args.jobs)
+
+    report = {
+        "rows": len(df),
+        "source": str(args.data_path) if args.data_path.exists() else "synthetic",
+        "legacy_seconds": round(legacy_seconds, 3),
+        "legacy_arrow_seconds": round(legacy_arrow_seconds, 3),
+        "single_process_seconds": round(single_seconds, 3),
+        "parallel_seconds": round(parallel_seconds, 3),
+        "jobs": args.jobs,
+        "speedup_single": round(legacy_seconds / single_seconds, 2),
+        "speedup_parallel": round(legacy_seconds / parallel_seconds, 2),
+        # Word-boundary matching changes some flags on purpose (e.g. "eggplant")
+        "agreement_with_legacy": {
+            flag: round(float((legacy[flag] == single[flag]).mean()), 4)
+            for flag in FLAG_COLUMNS + ["diet_pref"]
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Report the import time of the mealprep entry points, broken down by package.
+
+Every module is imported in a fresh interpreter with ``-X importtime``, so
+earlier imports do not hide the cost of later ones; interpreter startup is
+left out. The report gives the total import time of each module, the time
+spent per top-level package and the slowest individual imports, and lists
+the heavy packages (pandas, openai, database drivers) the import pulled in.
+
+Run with:
+    python -m mealprep.benchmarks.import_time --output import_time.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+# Imports that should not be paid before the first request that needs them
+HEAVY_PACKAGES = (
+    "pandas",
+    "numpy",
+    "pyarrow",
+    "openai",
+    "timescale_vector",
+    "psycopg2",
+    "asyncpg",
+    "streamlit",
+)
+
+DEFAULT_MODULES = [
+    "mealprep.mcp_server",
+    "mealprep.services.meal_service",
+    "mealprep.services.async_meal_service",
+    "mealprep.services.container",
+]
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """
+    Parse the ``-X importtime`` output of an interpreter.
+
+    Args:
+        stderr: Standard error of the interpreter
+
+    Returns:
+        One dict per imported module with its name, nesting depth, and self
+        and cumulative time in milliseconds, in import completion order
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        imports.append(
+            {
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+            }
+        )
+    return imports
+
+
+def measure_import(module: str, top: int = 10) -> dict:
+    """
+    Import a module in a fresh interpreter and break its import time down.
+
+    Args:
+        module: Dotted name of the module to import
+        top: Number of slowest imports to report
+
+    Returns:
+        Total time, time per top-level package, slowest imports and the
+        heavy packages that were imported
+
+    Raises:
+        RuntimeError: If the module cannot be imported
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    imports = parse_importtime(completed.stderr)
+    # The module's own imports are the ones after the previous top-level
+    # import; those before it belong to interpreter startup
+    start = len(imports) - 1
+    while start > 0 and imports[start - 1]["depth"] > 0:
+        start -= 1
+    imports = imports[start:]
+
+    by_package: Dict[str, float] = defaultdict(float)
+    for entry in imports:
+        by_package[entry["module"].split(".")[0]] += entry["self_ms"]
+    loaded = {entry["module"].split(".")[0] for entry in imports}
+    slowest = sorted(imports, key=lambda entry: entry["self_ms"], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_ms": round(imports[-1]["cumulative_ms"], 1),
+        "by_package_ms": {
+            package: round(ms, 1)
+            for package, ms in sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+        },
+        "slowest": [
+            {"module": e["module"], "self_ms": round(e["self_ms"], 1)} for e in slowest
+        ],
+        "heavy_packages": sorted(loaded.intersection(HEAVY_PACKAGES)),
+    }
+
+
+def print_report(result: dict, packages: int = 8) -> None:
+    """Print one module's breakdown as a table."""
+    print(f"{result['module']}: {result['total_ms']:.1f} ms")
+    for package, ms in list(result["by_package_ms"].items())[:packages]:
+        print(f"  {package:<30} {ms:>9.1f} ms")
+    heavy = ", ".join(result["heavy_packages"]) or "none"
+    print(f"  heavy packages: {heavy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = []
+    for module in args.modules:
+        result = measure_import(module, args.top)
+        print_report(result)
+        report.append(result)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Measure recall@k and latency of the embedding index configurations.
+
+For every corpus size a benchmark table is filled from the vector table (or
+with synthetic clustered vectors when it holds too few rows), exact top-k
+neighbours are computed by brute force in NumPy, and every index type is
+built and queried through timescale_vector's search with a range of search
+parameters. The report is written as JSON with stable ordering so reports of
+two releases can be diffed.
+
+Run with:
+    python -m mealprep.benchmarks.index_recall --sizes 10000 100000 --output report.json
+"""
+
+import argparse
+import json
+import platform
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from mealprep.config.settings import get_settings
+from mealprep.db.bulk_loader import BulkLoader
+from mealprep.db.index_tuning import build_index, index_options, query_params
+from timescale_vector import client
+
+# Search parameter sweeps per index type
+DEFAULT_SWEEPS = {
+    "ivfflat": {"probes": [1, 5, 10, 20, 40]},
+    "hnsw": {"ef_search": [10, 20, 40, 80, 160]},
+    "diskann": {"search_list_size": [25, 50, 100, 200]},
+}
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, leaving zero rows as they are."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+def exact_top_k(
+    corpus: np.ndarray, queries: np.ndarray, k: int, block: int = 50_000
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exact cosine top-k by brute force, processed in corpus blocks.
+
+    Args:
+        corpus: (n, d) corpus vectors
+        queries: (q, d) query vectors
+        k: Number of neighbours
+
+    Returns:
+        (q, k) corpus positions and cosine similarities, most similar first
+    """
+    queries = normalize(queries.astype(np.float32))
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    best_positions = np.empty((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(corpus), block):
+        vectors = normalize(corpus[start : start + block].astype(np.float32))
+        scores = np.hstack([best_scores, queries @ vectors.T])
+        positions = np.hstack(
+            [
+                best_positions,
+                np.broadcast_to(np.arange(start, start + len(vectors)), (len(queries), len(vectors))),
+            ]
+        )
+        keep = min(k, scores.shape[1])
+        top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+        best_scores = np.take_along_axis(scores, top, axis=1)
+        best_positions = np.take_along_axis(positions, top, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return (
+        np.take_along_axis(best_positions, order, axis=1),
+        np.take_along_axis(best_scores, order, axis=1),
+    )
+
+
+def synthetic_vectors(n: int, dimensions: int, rng: np.random.Generator, clusters: int = 100) -> np.ndarray:
+    """Clustered unit vectors, a rough stand-in for text embeddings."""
+    centers = normalize(rng.standard_normal((clusters, dimensions)).astype(np.float32))
+    vectors = centers[rng.integers(0, clusters, n)]
+    # Noise of norm ~0.7 around each center
+    vectors += rng.standard_normal((n, dimensions)).astype(np.float32) * (0.7 / np.sqrt(dimensions))
+    return normalize(vectors)
+
+
+class IndexBenchmark:
+    """Runs the recall and latency benchmark against one database."""
+
+    def __init__(self, service_url: str, source_table: str, dimensions: int, k: int, seed: int = 0):
+        """
+        Initialize IndexBenchmark.
+
+        Args:
+            service_url: Database connection string
+            source_table: Vector table to draw corpus and queries from
+            dimensions: Embedding dimensions
+            k: Number of neighbours per query
+            seed: Seed for sampling and synthetic data
+        """
+        self.service_url = service_url
+        self.source_table = source_table
+        self.dimensions = dimensions
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+
+    def _connect(self):
+        return psycopg2.connect(self.service_url)
+
+    def _fetch_vectors(self, limit: int, offset: int) -> np.ndarray:
+        # timescale_vector connections decode embeddings with pgvector
+        vec_client = client.Sync(self.service_url, self.source_table, self.dimensions)
+        with vec_client.connect() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                f'SELECT embedding FROM "{self.source_table}" ORDER BY id LIMIT %s OFFSET %s',
+                (limit, offset),
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        # Depending on the pgvector version these are NumPy arrays or Vector objects
+        return np.stack(
+            [row[0].to_numpy() if hasattr(row[0], "to_numpy") else row[0] for row in rows]
+        ).astype(np.float32)
+
+    def source_rows(self) -> int:
+        try:
+            with self._connect() as conn, conn.cursor() as cursor:
+                cursor.execute(f'SELECT count(*) FROM "{self.source_table}"')
+                return cursor.fetchone()[0]
+        except psycopg2.Error:
+            return 0
+
+    def load_data(self, size: int, num_queries: int) -> Tuple[np.ndarray, np.ndarray, str]:
+        """Return corpus and query vectors, real if the source table is large enough."""
+        if self.source_rows() >= size + num_queries:
+            # Queries are rows outside the corpus, like unseen user queries
+            return (
+                self._fetch_vectors(size, 0),
+                self._fetch_vectors(num_queries, size),
+                self.source_table,
+            )
+        vectors = synthetic_vectors(size + num_queries, self.dimensions, self.rng)
+        return vectors[:size], vectors[size:], "synthetic"
+
+    def create_table(self, table_name: str, corpus: np.ndarray) -> None:
+        """Create and fill a benchmark table with the corpus vectors."""
+        ids = [uuid.uuid4() for _ in range(len(corpus))]
+        with self._connect() as conn, conn.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+            cursor.execute(
+                f"""CREATE TABLE "{table_name}" (
+                    id UUID PRIMARY KEY,
+                    metadata JSONB,
+                    contents TEXT,
+                    embedding vector({self.dimensions})
+                )"""
+            )
+        vec_client = client.Sync(self.service_url, table_name, self.dimensions)
+        loader = BulkLoader(vec_client, table_name, self.dimensions)
+        for start in range(0, len(corpus), 50_000):
+            chunk = corpus[start : start + 50_000]
+            loader.copy(
+                pd.DataFrame(
+                    {
+                        "id": ids[start : start + len(chunk)],
+                        "metadata": ["{}"] * len(chunk),
+                        "contents": [""] * len(chunk),
+                        "embedding": list(chunk),
+                    }
+                )
+            )
+        with self._connect() as conn, conn.cursor() as cursor:
+            cursor.execute(f'ANALYZE "{table_name}"')
+
+    def run_kind(
+        self,
+        kind: str,
+        table_name: str,
+        size: int,
+        queries: np.ndarray,
+        truth_scores: np.ndarray,
+        sweep: Dict[str, List[int]],
+    ) -> List[dict]:
+        """Build one index type and measure every search parameter in its sweep."""
+        vec_client = client.Sync(self.service_url, table_name, self.dimensions)
+        options = index_options(kind, size)
+        vec_client.drop_embedding_index()
+        start = time.perf_counter()
+        try:
+            vec_client.create_embedding_index(build_index(kind, options))
+        except psycopg2.Error as e:
+            # e.g. DiskANN without the vectorscale extension
+            result = {"kind": kind, "size": size, "error": str(e).strip().splitlines()[0]}
+            print(json.dumps(result))
+            return [result]
+        build_seconds = time.perf_counter() - start
+
+        # A result counts as a true neighbour if it is at least as similar as
+        # the exact k-th neighbour, so ties between duplicates are not misses
+        thresholds = truth_scores[:, -1] - 1e-4
+        results = []
+        [(name, values)] = sweep.items()
+        for value in values:
+            params = query_params(kind, options, self.k, **{name: value})
+            latencies, recalls = [], []
+            for query, threshold in zip(queries, thresholds):
+                start = time.perf_counter()
+                rows = vec_client.search(query.tolist(), limit=self.k, query_params=params)
+                latencies.append((time.perf_counter() - start) * 1000)
+                similarities = 1 - np.array([row[4] for row in rows], dtype=np.float64)
+                recalls.append(min(self.k, int((similarities >= threshold).sum())) / self.k)
+            results.append(
+                {
+                    "kind": kind,
+                    "size": size,
+                    "build_options": options,
+                    "build_seconds": round(build_seconds, 3),
+                    "search_params": {name: value},
+                    f"recall_at_{self.k}": round(float(np.mean(recalls)), 4),
+                    "latency_ms": {
+                        "mean": round(float(np.mean(latencies)), 3),
+                        "p50": round(float(np.percentile(latencies, 50)), 3),
+                        "p95": round(float(np.percentile(latencies, 95)), 3),
+                        "p99": round(float(np.percentile(latencies, 99)), 3),
+                    },
+                }
+            )
+            print(json.dumps(results[-1]))
+        vec_client.drop_embedding_index()
+        return results
+
+    def run(
+        self,
+        sizes: List[int],
+        num_queries: int,
+        kinds: List[str],
+        sweeps: Dict[str, Dict[str, List[int]]],
+        keep_tables: bool = False,
+    ) -> dict:
+        """Run the benchmark for every corpus size and index type."""
+        report = {
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "k": self.k,
+            "num_queries": num_queries,
+            "dimensions": self.dimensions,
+            "runs": [],
+        }
+        for size in sizes:
+            corpus, queries, source = self.load_data(size, num_queries)
+            start = time.perf_counter()
+            _, truth_scores = exact_top_k(corpus, queries, self.k)
+            ground_truth_seconds = time.perf_counter() - start
+
+            table_name = f"bench_{self.source_table}_{size}"
+            self.create_table(table_name, corpus)
+            run = {
+                "size": size,
+                "source": source,
+                "ground_truth_seconds": round(ground_truth_seconds, 3),
+                "results": [],
+            }
+            for kind in kinds:
+                run["results"] += self.run_kind(
+                    kind, table_name, size, queries, truth_scores, sweeps[kind]
+                )
+            report["runs"].append(run)
+            if not keep_tables:
+                with self._connect() as conn, conn.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        return report
+
+
+def main():
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", nargs="+", choices=list(DEFAULT_SWEEPS), default=list(DEFAULT_SWEEPS))
+    parser.add_argument("--probes", type=int, nargs="+", default=DEFAULT_SWEEPS["ivfflat"]["probes"])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=DEFAULT_SWEEPS["hnsw"]["ef_search"])
+    parser.add_argument(
+        "--search-list-size", type=int, nargs="+", default=DEFAULT_SWEEPS["diskann"]["search_list_size"]
+    )
+    parser.add_argument("--source-table", default=settings.vector_store.table_name)
+    parser.add_argument("--dimensions", type=int, default=settings.vector_store.embedding_dimensions)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-tables", action="store_true")
+    parser.add_argument("--output", type=Path, default=Path("index_recall_report.json"))
+    args = parser.parse_args()
+
+    benchmark = IndexBenchmark(
+        settings.database.service_url, args.source_table, args.dimensions, args.k, args.seed
+    )
+    report = benchmark.run(
+        args.sizes,
+        args.queries,
+        args.kinds,
+        {
+            "ivfflat": {"probes": args.probes},
+            "hnsw": {"ef_search": args.ef_search},
+            "diskann": {"search_list_size": args.search_list_size},
+        },
+        keep_tables=args.keep_tables,
+    )
+    args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Compare disk size, latency and recall@k of the embedding storage modes.
+
+For every storage mode ("vector", "halfvec" and "binary") a benchmark table
+is filled with the same corpus, an HNSW index is built for it (over the full
+embedding and over each truncated prefix given with --index-dimensions) and
+the queries run through the same SQL the application uses. Table, index and
+total relation sizes are reported next to latency percentiles and recall
+against exact brute-force neighbours. halfvec and binary quantization need
+pgvector 0.7 or newer; modes the server cannot build are reported with
+their error.
+
+Run with:
+    python -m mealprep.benchmarks.vector_storage --size 100000 --index-dimensions 0 256 --output report.json
+"""
+
+import argparse
+import json
+import platform
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from mealprep.benchmarks.index_recall import IndexBenchmark, exact_top_k
+from mealprep.config.settings import get_settings
+from mealprep.db.bulk_loader import BulkLoader
+from mealprep.db.index_tuning import index_options
+from mealprep.db.search_queries import (
+    COLUMN_TYPES,
+    column_type,
+    create_index_query,
+    reranks,
+    search_query,
+)
+from timescale_vector import client
+
+
+class StorageBenchmark(IndexBenchmark):
+    """Runs the storage benchmark against one database."""
+
+    def create_storage_table(self, table_name: str, storage: str, corpus: np.ndarray) -> None:
+        """Create and fill a benchmark table using the column type of a storage mode."""
+        vector_type = column_type(storage)
+        ids = [uuid.uuid4() for _ in range(len(corpus))]
+        with self._connect() as conn, conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+            cursor.execute(
+                f"""CREATE TABLE {table_name} (
+                    id UUID PRIMARY KEY,
+                    metadata JSONB,
+                    contents TEXT,
+                    embedding {vector_type}({self.dimensions})
+                )"""
+            )
+        vec_client = client.Sync(self.service_url, table_name, self.dimensions)
+        loader = BulkLoader(vec_client, table_name, self.dimensions, vector_type=vector_type)
+        for start in range(0, len(corpus), 50_000):
+            chunk = corpus[start : start + 50_000]
+            loader.copy(
+                pd.DataFrame(
+                    {
+                        "id": ids[start : start + len(chunk)],
+                        "metadata": ["{}"] * len(chunk),
+                        "contents": [""] * len(chunk),
+                        "embedding": list(chunk),
+                    }
+                )
+            )
+        with self._connect() as conn, conn.cursor() as cursor:
+            cursor.execute(f"ANALYZE {table_name}")
+
+    def run_storage(
+        self,
+        storage: str,
+        size: int,
+        corpus: np.ndarray,
+        queries: np.ndarray,
+        truth_scores: np.ndarray,
+        ef_search: int,
+        rerank_factor: int,
+        index_dimensions: List[Optional[int]],
+    ) -> List[dict]:
+        """Load one storage mode and measure each of its indexes."""
+        table_name = f"bench_storage_{storage}_{size}"
+        try:
+            start = time.perf_counter()
+            self.create_storage_table(table_name, storage, corpus)
+            load_seconds = round(time.perf_counter() - start, 3)
+        except psycopg2.Error as e:
+            # e.g. halfvec before pgvector 0.7
+            result = {"storage": storage, "size": size, "error": str(e).strip().splitlines()[0]}
+            print(json.dumps(result))
+            return [result]
+        results = []
+        for dimensions in index_dimensions:
+            if storage == "binary" and dimensions:
+                continue
+            result = self.run_index(
+                storage, table_name, size, queries, truth_scores, ef_search, rerank_factor, dimensions
+            )
+            result["load_seconds"] = load_seconds
+            results.append(result)
+        return results
+
+    def run_index(
+        self,
+        storage: str,
+        table_name: str,
+        size: int,
+        queries: np.ndarray,
+        truth_scores: np.ndarray,
+        ef_search: int,
+        rerank_factor: int,
+        index_dimensions: Optional[int],
+    ) -> dict:
+        """Build one index and measure its size, latency and recall."""
+        index_name = f"{table_name}_embedding_idx"
+        options = index_options("hnsw", size)
+        result = {
+            "storage": storage,
+            "size": size,
+            "index_dimensions": index_dimensions or self.dimensions,
+            "build_options": options,
+        }
+        try:
+            start = time.perf_counter()
+            with self._connect() as conn, conn.cursor() as cursor:
+                cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+                cursor.execute(
+                    create_index_query(
+                        "hnsw",
+                        options,
+                        storage,
+                        table_name,
+                        index_name,
+                        self.dimensions,
+                        index_dimensions=index_dimensions,
+                    )
+                )
+            result["build_seconds"] = round(time.perf_counter() - start, 3)
+        except psycopg2.Error as e:
+            # e.g. binary_quantize before pgvector 0.7
+            result["error"] = str(e).strip().splitlines()[0]
+            print(json.dumps(result))
+            return result
+
+        with self._connect() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_table_size(%s), pg_relation_size(%s), pg_total_relation_size(%s)",
+                (table_name, index_name, table_name),
+            )
+            table_bytes, index_bytes, total_bytes = cursor.fetchone()
+        result["table_bytes"] = table_bytes
+        result["index_bytes"] = index_bytes
+        result["total_bytes"] = total_bytes
+
+        # The application's query, with the embedding as a text parameter
+        query = search_query(
+            table_name,
+            self.dimensions,
+            storage,
+            self.k,
+            rerank_factor=rerank_factor,
+            index_dimensions=index_dimensions,
+        ).replace("$1", "%(embedding)s")
+        thresholds = truth_scores[:, -1] - 1e-4
+        latencies, recalls = [], []
+        with self._connect() as conn, conn.cursor() as cursor:
+            candidates = self.k * rerank_factor if reranks(storage, index_dimensions) else self.k
+            cursor.execute(f"SET hnsw.ef_search = {max(ef_search, candidates)}")
+            for vector, threshold in zip(queries, thresholds):
+                embedding = "[" + ",".join(map(str, vector.tolist())) + "]"
+                start = time.perf_counter()
+                cursor.execute(query, {"embedding": embedding})
+                rows = cursor.fetchall()
+                latencies.append((time.perf_counter() - start) * 1000)
+                similarities = 1 - np.array([row[4] for row in rows], dtype=np.float64)
+                recalls.append(min(self.k, int((similarities >= threshold).sum())) / self.k)
+        result[f"recall_at_{self.k}"] = round(float(np.mean(recalls)), 4)
+        result["latency_ms"] = {
+            "mean": round(float(np.mean(latencies)), 3),
+            "p50": round(float(np.percentile(latencies, 50)), 3),
+            "p95": round(float(np.percentile(latencies, 95)), 3),
+            "p99": round(float(np.percentile(latencies, 99)), 3),
+        }
+        print(json.dumps(result))
+        return result
+
+    def drop_table(self, table_name: str) -> None:
+        with self._connect() as conn, conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+
+    def run_storages(
+        self,
+        size: int,
+        num_queries: int,
+        storages: List[str],
+        ef_search: int,
+        rerank_factor: int,
+        index_dimensions: List[Optional[int]] = (None,),
+        keep_tables: bool = False,
+    ) -> dict:
+        """Run the benchmark for every storage mode on one corpus."""
+        corpus, queries, source = self.load_data(size, num_queries)
+        _, truth_scores = exact_top_k(corpus, queries, self.k)
+        report = {
+            "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "host": platform.node(),
+            "k": self.k,
+            "num_queries": num_queries,
+            "dimensions": self.dimensions,
+            "size": size,
+            "source": source,
+            "ef_search": ef_search,
+            "rerank_factor": rerank_factor,
+            "results": [],
+        }
+        for storage in storages:
+            report["results"] += self.run_storage(
+                storage,
+                size,
+                corpus,
+                queries,
+                truth_scores,
+                ef_search,
+                rerank_factor,
+                index_dimensions,
+            )
+            if not keep_tables:
+                self.drop_table(f"bench_storage_{storage}_{size}")
+        return report
+
+
+def main():
+    settings = get_settings()
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--storages", nargs="+", choices=list(COLUMN_TYPES), default=list(COLUMN_TYPES))
+    parser.add_argument("--ef-search", type=int, default=40)
+    # 0 indexes the full embedding
+    parser.add_argument("--index-dimensions", type=int, nargs="+", default=[0])
+    parser.add_argument("--rerank-factor", type=int, default=settings.vector_store.rerank_factor)
+    parser.add_argument("--source-table", default=settings.vector_store.table_name)
+    parser.add_argument("--dimensions", type=int, default=settings.vector_store.embedding_dimensions)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-tables", action="store_true")
+    parser.add_argument("--output", type=Path, default=Path("vector_storage_report.json"))
+    args = parser.parse_args()
+
+    benchmark = StorageBenchmark(
+        settings.database.service_url, args.source_table, args.dimensions, args.k, args.seed
+    )
+    report = benchmark.run_storages(
+        args.size,
+        args.queries,
+        args.storages,
+        args.ef_search,
+        args.rerank_factor,
+        index_dimensions=[dimensions or None for dimensions in args.index_dimensions],
+        keep_tables=args.keep_tables,
+    )
+    args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ import logging
 import os
 from datetime import timedelta
 from functools import lru_cache
-from typing import Optional
+from typing import List, Literal, Optional
 
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
@@ -31,12 +31,30 @@ class OpenAISettings(LLMSettings):
     api_key: str = Field(default_factory=lambda: os.getenv("OPENAI_API_KEY"))
     default_model: str = Field(default="gpt-5-mini")
     embedding_model: str = Field(default="text-embedding-3-small")
+    # Limits used to pack texts into embeddings.create requests
+    embedding_batch_size: int = 2048
+    embedding_batch_max_tokens: int = 300_000
+    embedding_max_input_tokens: int = 8191
 
 
 class DatabaseSettings(BaseModel):
     """Database connection settings."""
 
     service_url: str = Field(default_factory=lambda: os.getenv("DATABASE_URL"))
+    # Connection pool of MealDatabase (see ConnectionPool)
+    pool_min_size: int = 1
+    pool_max_size: int = Field(default_factory=lambda: int(os.getenv("DB_POOL_MAX_SIZE", 10)))
+    # Seconds to wait for a free connection before failing
+    pool_timeout: float = 30.0
+    # Idle connections are pinged before reuse after this many seconds
+    pool_check_after_seconds: float = 30.0
+    # Per-statement time limit in milliseconds, 0 for none
+    statement_timeout_ms: int = Field(
+        default_factory=lambda: int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30_000))
+    )
+    connect_retries: int = 3
+    # Wait before the first reconnection attempt, doubled after each
+    connect_backoff_seconds: float = 0.5
 
 
 class VectorStoreSettings(BaseModel):
@@ -45,6 +63,115 @@ class VectorStoreSettings(BaseModel):
     table_name: str = "recipes"
     embedding_dimensions: int = 1536
     time_partition_interval: timedelta = timedelta(days=7)
+    # Embedding storage: "vector" (float32), "halfvec" (float16, half the
+    # size) or "binary" (float32 column with a 1-bit quantized index whose
+    # candidates are re-ranked at full precision). The compact modes are
+    # experimental and need pgvector 0.7+
+    storage: Literal["vector", "halfvec", "binary"] = Field(
+        default_factory=lambda: os.getenv("VECTOR_STORAGE", "vector")
+    )
+    # Index only this many leading dimensions (e.g. 256 for text-embedding-3
+    # models, whose embeddings can be shortened) and re-rank the candidates
+    # it returns with the full embedding
+    index_dimensions: Optional[int] = Field(
+        default_factory=lambda: int(os.getenv("VECTOR_INDEX_DIMENSIONS", 0)) or None
+    )
+    # Candidates fetched per result before re-ranking with binary storage or
+    # truncated index dimensions
+    rerank_factor: int = 4
+    # Candidates fetched per result when re-ranking for diversity (mmr_lambda)
+    mmr_fetch_factor: int = 4
+    # Hybrid search: candidates taken from each of the full-text and vector
+    # searches, and the rank offset of their reciprocal rank fusion
+    hybrid_candidates: int = 50
+    rrf_k: int = 60
+    # "mmap" searches an in-process copy of the table exported with
+    # VectorStore.export_local_index instead of querying Postgres
+    engine: Literal["postgres", "mmap"] = Field(
+        default_factory=lambda: os.getenv("VECTOR_ENGINE", "postgres")
+    )
+    local_index_path: str = Field(
+        default_factory=lambda: os.getenv("LOCAL_INDEX_PATH", "data/vector_index")
+    )
+    local_index_dtype: Literal["float32", "float16"] = "float32"
+
+
+class IndexSettings(BaseModel):
+    """Settings for the embedding index and its search parameters."""
+
+    # "diskann" needs the vectorscale extension, the others only pgvector
+    kind: Literal["ivfflat", "hnsw", "diskann"] = "hnsw"
+    # Build parameters; None sizes them from the row count
+    ivfflat_lists: Optional[int] = None
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construction: Optional[int] = None
+    # Search parameters trading recall for latency; None uses the defaults
+    ivfflat_probes: Optional[int] = None
+    hnsw_ef_search: Optional[int] = None
+    diskann_search_list_size: Optional[int] = None
+    diskann_rescore: Optional[int] = None
+    # Diets that get a partial index over their recipes, so that filtered
+    # searches stay on an index; pescetarian covers nearly every recipe since
+    # the ingest drops those with meat, so the full index serves it
+    diet_indexes: List[Literal["vegan", "vegetarian", "pescetarian"]] = ["vegan", "vegetarian"]
+    # pgvector 0.8+ iterative index scans for filtered searches without a
+    # partial index ("relaxed_order" or "strict_order"); None leaves them off
+    iterative_scan: Optional[Literal["relaxed_order", "strict_order"]] = None
+
+
+class EmbeddingSettings(BaseModel):
+    """Settings for the embedding provider."""
+
+    provider: Literal["openai", "hashing"] = Field(
+        default_factory=lambda: os.getenv("EMBEDDING_PROVIDER", "openai")
+    )
+    # Vector length of the CPU-only hashing provider
+    hashing_dimensions: int = 1024
+    # Vector table of the provider; defaults to "recipes" for openai and
+    # "recipes_<provider>" otherwise, since embedding spaces cannot be mixed
+    table_name: Optional[str] = None
+
+
+class EmbeddingCacheSettings(BaseModel):
+    """Settings for the persistent embedding cache."""
+
+    enabled: bool = True
+    path: str = Field(
+        default_factory=lambda: os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite")
+    )
+    # About 6 KB per 1536-dimensional embedding
+    max_entries: int = 200_000
+    # In-process cache of canonicalized query embeddings
+    query_cache_size: int = 1024
+    query_cache_ttl_seconds: float = 3600
+
+
+class ResponseCacheSettings(BaseModel):
+    """Settings for the shared cache of LLM suggestions and plans (see ResponseCache)."""
+
+    enabled: bool = Field(
+        default_factory=lambda: os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() != "false"
+    )
+    table_name: str = "response_cache"
+    # A response is reused for identical requests for this long
+    ttl_seconds: float = 6 * 3600
+    # and for requests with similar ingredients for this long
+    semantic_ttl_seconds: float = 3600
+    # Minimum cosine similarity of the ingredient embeddings for a semantic hit
+    similarity_threshold: float = 0.92
+
+
+class IngestSettings(BaseModel):
+    """Settings for loading the recipe dataset into the VectorStore."""
+
+    chunk_size: int = 50_000
+    sample_size: Optional[int] = 10_000
+    sampling: Literal["reservoir", "stratified"] = "reservoir"
+    # Embedding request concurrency and the API quota to stay within
+    max_in_flight: int = 8
+    requests_per_minute: int = 3000
+    tokens_per_minute: int = 1_000_000
+    max_retries: int = 8
 
 
 class Settings(BaseModel):
@@ -53,6 +180,11 @@ class Settings(BaseModel):
     openai: OpenAISettings = Field(default_factory=OpenAISettings)
     database: DatabaseSettings = Field(default_factory=DatabaseSettings)
     vector_store: VectorStoreSettings = Field(default_factory=VectorStoreSettings)
+    index: IndexSettings = Field(default_factory=IndexSettings)
+    embeddings: EmbeddingSettings = Field(default_factory=EmbeddingSettings)
+    embedding_cache: EmbeddingCacheSettings = Field(default_factory=EmbeddingCacheSettings)
+    ingest: IngestSettings = Field(default_factory=IngestSettings)
+    response_cache: ResponseCacheSettings = Field(default_factory=ResponseCacheSettings)
 
 
 @lru_cache()
@@ -63,6 +195,22 @@ def get_settings() -> Settings:
     return settings
 
 
+def get_vector_table_name(settings: Settings = None) -> str:
+    """
+    Return the vector table of the configured embedding provider.
+
+    embeddings.table_name wins when set; otherwise openai embeddings live in
+    vector_store.table_name and other providers in "<table>_<provider>",
+    since embedding spaces cannot be mixed.
+    """
+    settings = settings or get_settings()
+    if settings.embeddings.table_name:
+        return settings.embeddings.table_name
+    if settings.embeddings.provider == "openai":
+        return settings.vector_store.table_name
+    return f"{settings.vector_store.table_name}_{settings.embeddings.provider}"
+
+
 def get_api_key(var_name: str) -> str:
     key = os.getenv(var_name)
     if not key:
@@ -0,0 +1,207 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Optional
+
+import asyncpg
+import pandas as pd
+from mealprep.config.settings import get_db_url, get_settings, get_vector_table_name
+from mealprep.db.database import SAMPLE_ATTEMPTS, cluster_contents
+from mealprep.db.search_queries import (
+    cluster_sample_query,
+    clusters_table_name,
+    diet_column,
+    numbered_query,
+    sample_query,
+)
+from mealprep.helpers.utils import parse_diet
+
+
+class AsyncMealDatabase:
+    """
+    Asynchronous counterpart of MealDatabase, backed by an asyncpg pool.
+
+    Every operation checks out its own connection, so concurrent callers on
+    one event loop overlap their queries instead of queueing behind a shared
+    connection. Queries are the same as MealDatabase's.
+    """
+
+    def __init__(self, db_url: str = None):
+        """
+        Initialize AsyncMealDatabase; the pool is opened on first use.
+
+        Pool sizing and the statement timeout come from the database
+        settings, as for MealDatabase.
+
+        Args:
+            db_url: PostgreSQL connection string (defaults to DATABASE_URL env var)
+        """
+        self.db_url = db_url or get_db_url()
+        if not self.db_url:
+            raise ValueError("DATABASE_URL not provided and not found in environment")
+        self.settings = get_settings().database
+        self.recipes_table = get_vector_table_name()
+        self.clusters_table = clusters_table_name(self.recipes_table)
+        self.pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+
+    async def connect(self) -> asyncpg.Pool:
+        """Open the connection pool if needed and return it."""
+        async with self._pool_lock:
+            if self.pool is None:
+                try:
+                    self.pool = await asyncpg.create_pool(
+                        self.db_url,
+                        min_size=self.settings.pool_min_size,
+                        max_size=self.settings.pool_max_size,
+                        server_settings={
+                            "statement_timeout": str(self.settings.statement_timeout_ms)
+                        },
+                    )
+                except (OSError, asyncpg.PostgresError) as e:
+                    raise ConnectionError(f"Failed to connect to database: {e}")
+        return self.pool
+
+    async def get_meals_from_days_back(self, days_back: int = 14) -> list[str]:
+        """
+        Get meal names from the last N days.
+
+        Args:
+            days_back: Number of days to look back
+
+        Returns:
+            List of meal names
+        """
+        date_threshold = datetime.now() - timedelta(days=days_back)
+        pool = await self.connect()
+        rows = await pool.fetch(
+            "SELECT meal_name FROM meals WHERE date > $1 ORDER BY date DESC", date_threshold
+        )
+        return [row[0] for row in rows]
+
+    async def add_meal(self, ingredients: str, meal: str, recipe: str, date: datetime) -> int:
+        """
+        Add a meal to the database.
+
+        Args:
+            ingredients: Comma-separated string of ingredients
+            meal: Name of the meal
+            recipe: Recipe steps (newline-separated string)
+            date: Datetime object
+
+        Returns:
+            ID of the inserted meal
+        """
+        pool = await self.connect()
+        return await pool.fetchval(
+            "INSERT INTO meals (ingredients, meal_name, recipe, date) VALUES ($1, $2, $3, $4) RETURNING id",
+            ingredients,
+            meal,
+            recipe,
+            date,
+        )
+
+    async def update_meal_feedback(self, meal_id: int, feedback: str) -> None:
+        """
+        Update feedback for a meal.
+
+        Args:
+            meal_id: ID of the meal
+            feedback: Feedback text
+        """
+        pool = await self.connect()
+        await pool.execute("UPDATE meals SET feedback = $1 WHERE id = $2", feedback, meal_id)
+
+    async def get_diverse_recipes(
+        self, limit: int = 10, dietary_preferences: str = None
+    ) -> pd.DataFrame:
+        """
+        Get diverse recipes (random sampling), see MealDatabase.get_diverse_recipes.
+
+        Args:
+            limit: Number of recipes to return
+            dietary_preferences: Free-text dietary preferences
+
+        Returns:
+            DataFrame with a contents column, at most limit rows
+        """
+        diet = parse_diet(dietary_preferences)
+        query = sample_query(self.recipes_table, diet_column(diet) if diet else "TRUE")
+        contents: list[str] = []
+        pool = await self.connect()
+        for _ in range(SAMPLE_ATTEMPTS):
+            missing = limit - len(contents)
+            if missing <= 0:
+                break
+            keys = [random.random() for _ in range(missing * 2)]
+            sql, params = numbered_query(query, {"keys": keys})
+            rows = await pool.fetch(sql, *params)
+            seen = set(contents)
+            contents += [
+                row["contents"] for row in rows if row["contents"] not in seen
+            ][:missing]
+        return pd.DataFrame({"contents": contents[:limit]})
+
+    async def get_clustered_recipes(
+        self, num_clusters: int, per_cluster: int = 3, dietary_preferences: str = None
+    ) -> pd.DataFrame:
+        """
+        Get random recipes from distinct recipe clusters, see MealDatabase.get_clustered_recipes.
+
+        Args:
+            num_clusters: Number of distinct clusters to draw from
+            per_cluster: Recipes drawn from each cluster
+            dietary_preferences: Free-text dietary preferences
+
+        Returns:
+            DataFrame with a contents column, num_clusters * per_cluster rows at most
+        """
+        limit = num_clusters * per_cluster
+        diet = parse_diet(dietary_preferences)
+        pool = await self.connect()
+        clusters = await pool.fetchval(
+            "SELECT to_regclass(quote_ident($1))::text", self.clusters_table
+        )
+        if clusters is None:
+            return await self.get_diverse_recipes(limit, dietary_preferences)
+        # Some clusters may hold no recipe fitting the diet, draw from extra ones
+        query, params = numbered_query(
+            cluster_sample_query(
+                self.recipes_table, self.clusters_table, diet_column(diet) if diet else "TRUE"
+            ),
+            {"clusters": num_clusters * 2, "per_cluster": per_cluster},
+        )
+        rows = await pool.fetch(query, *params)
+        contents = cluster_contents([tuple(row) for row in rows], num_clusters)
+        if len(contents) < limit:
+            extra = await self.get_diverse_recipes(limit - len(contents), dietary_preferences)
+            contents += [c for c in extra.get("contents", []) if c not in contents]
+        return pd.DataFrame({"contents": contents[:limit]})
+
+    async def get_latest_meal_plan(self) -> Optional[dict]:
+        """Get the most recent meal plan with all its meals."""
+        pool = await self.connect()
+        async with pool.acquire() as conn:
+            plan = await conn.fetchrow("SELECT * FROM meal_plans ORDER BY created_at DESC LIMIT 1")
+
+            if not plan:
+                return None
+
+            meals = await conn.fetch(
+                "SELECT * FROM meals WHERE meal_plan_id = $1 ORDER BY day_number", plan["id"]
+            )
+            return {"plan": dict(plan), "meals": [dict(row) for row in meals]}
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def __aenter__(self):
+        """Async context manager entry."""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit."""
+        await self.close()
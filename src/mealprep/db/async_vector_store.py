@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+from mealprep.db.search_queries import result_columns, text_search_terms
+from mealprep.db.vector_store import SearchHit, VectorStore
+from timescale_vector import client
+
+
+class AsyncVectorStore:
+    """
+    Asynchronous searches over a VectorStore, built on timescale_vector's client.Async.
+
+    Queries are built by VectorStore.build_search, whose $n placeholders
+    asyncpg takes as they are, and run on client.Async's pool, which decodes
+    embeddings and metadata like the synchronous client. Query embeddings
+    go through the VectorStore's thread-safe caches in a worker thread, as
+    do searches of the mmap engine, which run in-process.
+    """
+
+    def __init__(self, vec: VectorStore = None, max_connections: Optional[int] = None):
+        """
+        Initialize AsyncVectorStore; the pool is opened on first use.
+
+        Args:
+            vec: VectorStore providing the settings, embeddings and queries
+            max_connections: Maximum number of pooled connections (defaults
+                to the pool_max_size database setting)
+        """
+        self.vec = vec or VectorStore()
+        database_settings = self.vec.settings.database
+        self.vec_client = client.Async(
+            database_settings.service_url,
+            self.vec.table_name,
+            self.vec.dimensions,
+            time_partition_interval=None,
+            max_db_connections=max_connections or database_settings.pool_max_size,
+        )
+        # Serializes the one-time setup of concurrent first searches
+        self._setup_lock = asyncio.Lock()
+        self._ready = False
+
+    async def embed_queries(self, queries: List[Union[str, List[str]]]) -> List[List[float]]:
+        """Embed search queries (see VectorStore.embed_queries) without blocking the event loop."""
+        return await asyncio.to_thread(self.vec.embed_queries, queries)
+
+    async def search(
+        self,
+        query_text: Union[str, List[str]],
+        limit: int = 5,
+        metadata_filter: Union[dict, List[dict]] = None,
+        predicates: Optional[client.Predicates] = None,
+        return_dataframe: bool = True,
+        diet: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        hybrid: bool = False,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Union[List[SearchHit], pd.DataFrame]:
+        """
+        Query the vector database for similar embeddings based on input text.
+
+        Takes the same arguments and returns the same results as
+        VectorStore.search.
+        """
+        [results] = await self.search_many(
+            [query_text],
+            limit,
+            metadata_filter,
+            predicates,
+            return_dataframe,
+            diet,
+            mmr_lambda,
+            hybrid,
+            columns,
+        )
+        return results
+
+    async def search_many(
+        self,
+        query_texts: List[Union[str, List[str]]],
+        limit: int = 5,
+        metadata_filter: Union[dict, List[dict]] = None,
+        predicates: Optional[client.Predicates] = None,
+        return_dataframe: bool = True,
+        diet: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        hybrid: bool = False,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Union[List[SearchHit], pd.DataFrame]]:
+        """
+        Run several similarity searches concurrently, embedding all queries in one batch.
+
+        Takes the same arguments and returns the same results as
+        VectorStore.search_many.
+        """
+        if self.vec.vector_settings.engine == "mmap":
+            return await asyncio.to_thread(
+                self.vec.search_many,
+                query_texts,
+                limit,
+                metadata_filter,
+                predicates,
+                return_dataframe,
+                diet,
+                mmr_lambda,
+                hybrid,
+                columns,
+            )
+        query_embeddings = await self.embed_queries(query_texts)
+        await self._setup()
+        return await asyncio.gather(
+            *(
+                self._search_by_embedding(
+                    embedding,
+                    limit,
+                    metadata_filter,
+                    predicates,
+                    return_dataframe,
+                    diet,
+                    mmr_lambda,
+                    text_search_terms(query_text) if hybrid else None,
+                    columns,
+                )
+                for query_text, embedding in zip(query_texts, query_embeddings)
+            )
+        )
+
+    async def _setup(self) -> None:
+        """Read the index description and open the pool, once."""
+        if self._ready:
+            return
+        async with self._setup_lock:
+            if self._ready:
+                return
+            # Cached by the VectorStore from then on; the synchronous client
+            # is not safe to open from several threads at once
+            await asyncio.to_thread(self.vec.index_info)
+            if self.vec_client.pool is None:
+                # connect() creates the pool and hands back an unused acquire context
+                await self.vec_client.connect()
+            self._ready = True
+
+    async def _search_by_embedding(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        metadata_filter: Union[dict, List[dict]],
+        predicates: Optional[client.Predicates],
+        return_dataframe: bool,
+        diet: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        text_query: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Union[List[SearchHit], pd.DataFrame]:
+        """Query the vector database with an already computed embedding."""
+        start_time = time.time()
+        fetch_limit = self.vec._fetch_limit(limit, mmr_lambda)
+        columns = result_columns(columns)
+        # Re-ranking for diversity needs the embeddings of the candidates
+        fetch_columns = columns + ("embedding",) if mmr_lambda is not None else columns
+        statements, query, params = self.vec.build_search(
+            query_embedding, fetch_limit, metadata_filter, predicates, diet, fetch_columns, text_query
+        )
+        results = await self._fetch(statements, query, params)
+        logging.info(
+            f"{'Hybrid' if text_query else 'Vector'} search completed in "
+            f"{time.time() - start_time:.3f} seconds"
+        )
+        return self.vec._format_results(
+            self.vec._rerank(query_embedding, results, limit, mmr_lambda), return_dataframe, columns
+        )
+
+    async def _fetch(
+        self, statements: List[str], query: str, params: List[Any]
+    ) -> List[Tuple[Any, ...]]:
+        """Run the SET LOCAL statements and the query in one transaction."""
+        async with await self.vec_client.connect() as conn:
+            async with conn.transaction():
+                for statement in statements:
+                    await conn.execute(statement)
+                rows = await conn.fetch(query, *params)
+        return [tuple(row) for row in rows]
+
+    async def close(self) -> None:
+        """Close the connection pool; a later search opens a new one."""
+        await self.vec_client.close()
+        # client.Async keeps the closed pool, which would fail the next acquire
+        self.vec_client.pool = None
+        self._ready = False
@@ -0,0 +1,299 @@
+import io
+import json
+import logging
+import re
+import struct
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+
+# Binary COPY framing, see https://www.postgresql.org/docs/current/sql-copy.html
+COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+JSONB_VERSION = b"\x01"
+
+COPY_COLUMNS = ["id", "metadata", "contents", "embedding"]
+
+
+class _ByteStream(io.RawIOBase):
+    """File-like reader over an iterator of byte strings, as consumed by copy_expert."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def _field(data: Optional[bytes]) -> bytes:
+    """Frame one field of a binary COPY tuple."""
+    if data is None:
+        return struct.pack("!i", -1)
+    return struct.pack("!i", len(data)) + data
+
+
+def encode_records(
+    df: pd.DataFrame, dimensions: int, vector_type: str = "vector"
+) -> Iterator[bytes]:
+    """
+    Encode records as a binary COPY stream.
+
+    Embeddings are written in pgvector's binary representation (dimension
+    count, an unused flag, then big-endian float32 values, or float16 values
+    for halfvec), which avoids formatting every float as text.
+
+    Args:
+        df: DataFrame with id, metadata, contents and embedding columns
+        dimensions: Expected embedding dimensions
+        vector_type: Type of the embedding column ("vector" or "halfvec")
+
+    Yields:
+        Chunks of the COPY stream, one per record plus header and trailer
+    """
+    yield COPY_HEADER
+
+    embeddings = np.asarray(
+        df["embedding"].tolist(), dtype=">f2" if vector_type == "halfvec" else ">f4"
+    )
+    if len(df) and embeddings.shape[1] != dimensions:
+        raise ValueError(
+            f"Expected {dimensions}-dimensional embeddings, got {embeddings.shape[1]}"
+        )
+    vector_header = struct.pack("!hh", dimensions, 0)
+    tuple_header = struct.pack("!h", len(COPY_COLUMNS))
+
+    for record_id, metadata, contents, embedding in zip(
+        df["id"], df["metadata"], df["contents"], embeddings
+    ):
+        if not isinstance(metadata, str):
+            metadata = json.dumps(metadata)
+        yield b"".join(
+            (
+                tuple_header,
+                _field(uuid.UUID(str(record_id)).bytes),
+                _field(JSONB_VERSION + metadata.encode("utf-8")),
+                _field(contents.encode("utf-8")),
+                _field(vector_header + embedding.tobytes()),
+            )
+        )
+
+    yield COPY_TRAILER
+
+
+class BulkLoader:
+    """Loads records into the vector table with binary COPY."""
+
+    def __init__(
+        self, vec_client, table_name: str, dimensions: int, vector_type: str = "vector"
+    ):
+        """
+        Initialize BulkLoader.
+
+        Args:
+            vec_client: timescale_vector Sync client providing connections
+            table_name: Table to load into
+            dimensions: Embedding dimensions of the table
+            vector_type: Type of the embedding column ("vector" or "halfvec")
+        """
+        self.vec_client = vec_client
+        self.table_name = table_name
+        self.dimensions = dimensions
+        self.vector_type = vector_type
+
+    def copy(self, df: pd.DataFrame, table_name: str = None) -> int:
+        """
+        Stream records into a table with COPY ... FROM STDIN (FORMAT binary).
+
+        Unlike upsert, COPY does not skip existing ids, so the records must not
+        be stored yet.
+
+        Args:
+            df: DataFrame with id, metadata, contents and embedding columns
+            table_name: Target table (defaults to the vector table)
+
+        Returns:
+            Number of records loaded
+        """
+        if df.empty:
+            return 0
+        query = sql.SQL("COPY {table} ({columns}) FROM STDIN WITH (FORMAT binary)").format(
+            table=sql.Identifier(table_name or self.table_name),
+            columns=sql.SQL(", ").join(map(sql.Identifier, COPY_COLUMNS)),
+        )
+
+        start_time = time.time()
+        with self.vec_client.connect() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    stream = _ByteStream(encode_records(df, self.dimensions, self.vector_type))
+                    cursor.copy_expert(query.as_string(conn), stream, size=1 << 20)
+            except Exception:
+                conn.rollback()
+                raise
+        elapsed_time = time.time() - start_time
+        logging.info(
+            f"Copied {len(df)} records into {table_name or self.table_name} "
+            f"in {elapsed_time:.3f} seconds"
+        )
+        return len(df)
+
+    @contextmanager
+    def staging(self, reset: bool = False) -> Iterator["StagingTable"]:
+        """
+        Load into a staging table and swap it with the live table on success.
+
+        The live table keeps serving queries during the load. The staging table
+        is created without indexes, which are only built once all rows are in.
+        If loading fails, the staging table is kept so a rerun can continue
+        filling it.
+
+        Args:
+            reset: Drop rows left in the staging table by a failed run
+
+        Example:
+            with loader.staging() as staging:
+                for df in frames:
+                    staging.copy(df)
+        """
+        staging = StagingTable(self)
+        if reset:
+            staging.drop()
+        staging.create()
+        yield staging
+        staging.swap()
+
+
+class StagingTable:
+    """A staging copy of the vector table that replaces it once loaded."""
+
+    def __init__(self, loader: BulkLoader):
+        self.loader = loader
+        self.live_name = loader.table_name
+        self.table_name = f"{loader.table_name}_staging"
+
+    def create(self) -> None:
+        """Create the staging table with the live table's columns, defaults and generated columns."""
+        with self.loader.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    sql.SQL(
+                        "CREATE TABLE IF NOT EXISTS {staging} "
+                        "(LIKE {live} INCLUDING DEFAULTS INCLUDING GENERATED)"
+                    ).format(
+                        staging=sql.Identifier(self.table_name),
+                        live=sql.Identifier(self.live_name),
+                    )
+                )
+
+    def drop(self) -> None:
+        """Drop the staging table if it exists."""
+        with self.loader.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    sql.SQL("DROP TABLE IF EXISTS {staging}").format(
+                        staging=sql.Identifier(self.table_name)
+                    )
+                )
+
+    def copy(self, df: pd.DataFrame) -> int:
+        """Load records into the staging table."""
+        return self.loader.copy(df, table_name=self.table_name)
+
+    def _live_indexes(self, cursor) -> List[tuple]:
+        cursor.execute(
+            """SELECT i.indexname, i.indexdef, c.contype IS NOT NULL
+            FROM pg_indexes i
+            LEFT JOIN pg_constraint c
+                ON c.conname = i.indexname
+                AND c.conrelid = quote_ident(i.tablename)::regclass
+                AND c.contype = 'p'
+            WHERE i.schemaname = current_schema() AND i.tablename = %s""",
+            (self.live_name,),
+        )
+        return cursor.fetchall()
+
+    def swap(self) -> None:
+        """
+        Build the live table's indexes on the staging table and swap the tables.
+
+        The rename happens in a single transaction, so readers see either the
+        old or the new table.
+        """
+        staging = sql.Identifier(self.table_name)
+        live = sql.Identifier(self.live_name)
+        old = sql.Identifier(f"{self.live_name}_old")
+
+        with self.loader.vec_client.connect() as conn:
+            try:
+                with conn.cursor() as cursor:
+                    indexes = self._live_indexes(cursor)
+                    renames = []
+                    primary_key = None
+                    for name, definition, is_primary_key in indexes:
+                        if is_primary_key:
+                            primary_key = name
+                            cursor.execute(
+                                sql.SQL("ALTER TABLE {staging} ADD PRIMARY KEY (id)").format(
+                                    staging=staging
+                                )
+                            )
+                            continue
+                        staged_name = f"{name}_staging"
+                        cursor.execute(
+                            re.sub(
+                                r"^CREATE (UNIQUE )?INDEX \S+ ON \S+ ",
+                                lambda m: f"CREATE {m.group(1) or ''}INDEX "
+                                f'"{staged_name}" ON "{self.table_name}" ',
+                                definition,
+                            )
+                        )
+                        renames.append((staged_name, name))
+                    logging.info(f"Built {len(indexes)} indexes on {self.table_name}")
+
+                    cursor.execute(
+                        sql.SQL("ALTER TABLE {live} RENAME TO {old}").format(
+                            live=live, old=old
+                        )
+                    )
+                    cursor.execute(
+                        sql.SQL("ALTER TABLE {staging} RENAME TO {live}").format(
+                            staging=staging, live=live
+                        )
+                    )
+                    cursor.execute(sql.SQL("DROP TABLE {old}").format(old=old))
+                    for staged_name, name in renames:
+                        cursor.execute(
+                            sql.SQL("ALTER INDEX {staged} RENAME TO {name}").format(
+                                staged=sql.Identifier(staged_name),
+                                name=sql.Identifier(name),
+                            )
+                        )
+                    if primary_key:
+                        cursor.execute(
+                            sql.SQL("ALTER TABLE {live} RENAME CONSTRAINT {staged} TO {name}").format(
+                                live=live,
+                                staged=sql.Identifier(f"{self.table_name}_pkey"),
+                                name=sql.Identifier(primary_key),
+                            )
+                        )
+            except Exception:
+                conn.rollback()
+                raise
+        logging.info(f"Swapped {self.table_name} into {self.live_name}")
@@ -0,0 +1,180 @@
+import logging
+import time
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from mealprep.db.vector_store import VectorStore
+from mealprep.db.search_queries import clusters_table_name
+from mealprep.helpers.clustering import MiniBatchKMeans
+from psycopg2.extras import execute_values
+
+
+class RecipeClusters:
+    """
+    Clusters of the recipe embeddings, used to draw varied recipes.
+
+    Centroids live in a small "<table>_clusters" table and every recipe
+    carries the id of its cluster in its cluster_id column. Clustering runs
+    offline with mini-batch k-means over batches streamed from the table;
+    recipes loaded later are assigned to the nearest centroid, which also
+    moves the centroids like any further mini-batch, so the clustering does
+    not have to be rebuilt after every load.
+    """
+
+    def __init__(self, vec: VectorStore):
+        """
+        Initialize RecipeClusters.
+
+        Args:
+            vec: VectorStore of the recipes to cluster
+        """
+        self.vec = vec
+        self.table_name = vec.table_name
+        self.clusters_table = clusters_table_name(vec.table_name)
+
+    def create_tables(self) -> None:
+        """Create the centroid table and the cluster_id column with its index."""
+        with self.vec.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""CREATE TABLE IF NOT EXISTS "{self.clusters_table}" (
+                        cluster_id INTEGER PRIMARY KEY,
+                        centroid vector({self.vec.dimensions}) NOT NULL,
+                        size BIGINT NOT NULL,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )"""
+                )
+                cursor.execute(
+                    f'ALTER TABLE "{self.table_name}" ADD COLUMN IF NOT EXISTS cluster_id INTEGER'
+                )
+                # Random recipes of one cluster are read in random_key order
+                cursor.execute(
+                    f"""CREATE INDEX IF NOT EXISTS "{self.table_name}_cluster_id_idx"
+                    ON "{self.table_name}" (cluster_id, random_key)"""
+                )
+
+    def _batches(
+        self, batch_size: int, unassigned_only: bool = False
+    ) -> Iterator[Tuple[list, np.ndarray]]:
+        """Stream (ids, embeddings) batches with a server-side cursor."""
+        where = "WHERE cluster_id IS NULL" if unassigned_only else ""
+        with self.vec.vec_client.connect() as conn:
+            with conn.cursor(name="recipe_clusters") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(f'SELECT id, embedding FROM "{self.table_name}" {where}')
+                while rows := cursor.fetchmany(batch_size):
+                    # Depending on the pgvector version these are arrays or Vector objects
+                    embeddings = np.stack(
+                        [e.to_numpy() if hasattr(e, "to_numpy") else np.asarray(e) for _, e in rows]
+                    )
+                    yield [str(row[0]) for row in rows], embeddings
+
+    def load_model(self) -> Optional[MiniBatchKMeans]:
+        """Read the stored centroids, or None if the recipes were never clustered."""
+        with self.vec.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT to_regclass(quote_ident(%s))", (self.clusters_table,))
+                if cursor.fetchone()[0] is None:
+                    return None
+                cursor.execute(
+                    f'SELECT centroid, size FROM "{self.clusters_table}" ORDER BY cluster_id'
+                )
+                rows = cursor.fetchall()
+        if not rows:
+            return None
+        centroids = np.stack(
+            [c.to_numpy() if hasattr(c, "to_numpy") else np.asarray(c) for c, _ in rows]
+        )
+        return MiniBatchKMeans.from_centroids(centroids, [size for _, size in rows])
+
+    def _save_model(self, cursor, model: MiniBatchKMeans, replace: bool = False) -> None:
+        if replace:
+            cursor.execute(f'TRUNCATE "{self.clusters_table}"')
+        execute_values(
+            cursor,
+            f"""INSERT INTO "{self.clusters_table}" (cluster_id, centroid, size) VALUES %s
+            ON CONFLICT (cluster_id) DO UPDATE SET centroid = EXCLUDED.centroid,
+                size = EXCLUDED.size, updated_at = CURRENT_TIMESTAMP""",
+            [
+                (i, centroid.tolist(), int(count))
+                for i, (centroid, count) in enumerate(zip(model.centroids, model.counts))
+            ],
+            template="(%s, %s::vector, %s)",
+        )
+
+    def _write_labels(self, cursor, ids: list, labels: np.ndarray) -> None:
+        execute_values(
+            cursor,
+            f"""UPDATE "{self.table_name}" AS t SET cluster_id = v.cluster_id
+            FROM (VALUES %s) AS v(id, cluster_id) WHERE t.id = v.id::uuid""",
+            list(zip(ids, labels.tolist())),
+        )
+
+    def fit(
+        self, n_clusters: int, batch_size: int = 10_000, epochs: int = 3, seed: int = None
+    ) -> MiniBatchKMeans:
+        """
+        Cluster every recipe from scratch and store centroids and assignments.
+
+        Args:
+            n_clusters: Number of clusters
+            batch_size: Recipes per mini-batch (and per round trip)
+            epochs: Passes over the table to train the centroids
+            seed: Seed for the initialization
+
+        Returns:
+            The fitted model
+        """
+        self.create_tables()
+        start_time = time.time()
+        model = MiniBatchKMeans(n_clusters, np.random.default_rng(seed))
+        for epoch in range(epochs):
+            for _, embeddings in self._batches(batch_size):
+                model.partial_fit(embeddings)
+            logging.info(f"Clustering epoch {epoch + 1}/{epochs} done")
+
+        # Final assignment with the trained centroids; sizes become exact counts
+        model.counts = np.zeros(n_clusters, dtype=np.int64)
+        assigned = 0
+        with self.vec.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                for ids, embeddings in self._batches(batch_size):
+                    labels = model.predict(embeddings)
+                    model.counts += np.bincount(labels, minlength=n_clusters)
+                    self._write_labels(cursor, ids, labels)
+                    assigned += len(ids)
+                self._save_model(cursor, model, replace=True)
+        logging.info(
+            f"Clustered {assigned} recipes of {self.table_name} into {n_clusters} clusters "
+            f"in {time.time() - start_time:.1f} seconds"
+        )
+        return model
+
+    def assign_new(self, batch_size: int = 10_000) -> int:
+        """
+        Assign the recipes without a cluster to their nearest centroid.
+
+        Each batch also updates the centroids as a mini-batch, so they follow
+        the data as recipes are added. Does nothing if the recipes were never
+        clustered.
+
+        Args:
+            batch_size: Recipes per mini-batch
+
+        Returns:
+            Number of recipes assigned
+        """
+        model = self.load_model()
+        if model is None:
+            return 0
+        self.create_tables()
+        assigned = 0
+        with self.vec.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                for ids, embeddings in self._batches(batch_size, unassigned_only=True):
+                    self._write_labels(cursor, ids, model.partial_fit(embeddings))
+                    assigned += len(ids)
+                if assigned:
+                    self._save_model(cursor, model)
+        logging.info(f"Assigned {assigned} new recipes of {self.table_name} to clusters")
+        return assigned
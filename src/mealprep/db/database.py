@@ -1,10 +1,31 @@
 import os
+import random
 import pandas as pd
-import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime, timedelta
 from typing import Optional
-from mealprep.config.settings import get_db_url
+from mealprep.config.settings import get_db_url, get_settings, get_vector_table_name
+from mealprep.db.pool import ConnectionPool
+from mealprep.db.search_queries import (
+    cluster_sample_query,
+    clusters_table_name,
+    diet_column,
+    sample_query,
+)
+from mealprep.helpers.utils import parse_diet
+
+# Sampling rounds before returning fewer recipes than asked for
+SAMPLE_ATTEMPTS = 3
+
+
+def cluster_contents(rows: list, num_clusters: int) -> list[str]:
+    """Contents of (cluster_id, contents) sample rows from the first num_clusters clusters."""
+    clusters: dict[int, list[str]] = {}
+    for cluster_id, contents in rows:
+        recipes = clusters.setdefault(cluster_id, [])
+        if contents not in recipes:
+            recipes.append(contents)
+    return [c for recipes in list(clusters.values())[:num_clusters] for c in recipes]
 
 
 class MealDatabase:
@@ -12,7 +33,13 @@ class MealDatabase:
 
     def __init__(self, db_url: str = None):
         """
-        Initialize MealDatabase with PostgreSQL connection.
+        Initialize MealDatabase with a PostgreSQL connection pool.
+
+        Every operation checks out its own connection and transaction (see
+        ConnectionPool), so one instance can be shared between threads, such
+        as concurrent Streamlit sessions. Pool sizing and timeouts come from
+        the database settings. Recipes are sampled from the vector table of
+        the configured embedding provider, like VectorStore searches them.
 
         Args:
             db_url: PostgreSQL connection string (defaults to DATABASE_URL env var)
@@ -21,16 +48,13 @@ class MealDatabase:
         if not self.db_url:
             raise ValueError("DATABASE_URL not provided and not found in environment")
 
-        self.conn = None
-        self._connect()
+        self.pool = ConnectionPool.from_settings(self.db_url, get_settings().database)
+        self.recipes_table = get_vector_table_name()
+        self.clusters_table = clusters_table_name(self.recipes_table)
 
-    def _connect(self):
-        """Establish database connection."""
-        try:
-            self.conn = psycopg2.connect(self.db_url)
-            self.conn.autocommit = False  # Use transactions
-        except psycopg2.Error as e:
-            raise ConnectionError(f"Failed to connect to database: {e}")
+    def pool_stats(self) -> dict:
+        """Return the connection pool metrics (see ConnectionPool.stats)."""
+        return self.pool.stats()
 
     def get_meals_from_days_back(self, days_back: int = 14) -> list[str]:
         """
@@ -44,7 +68,7 @@ class MealDatabase:
         """
         date_threshold = datetime.now() - timedelta(days=days_back)
 
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute(
                 "SELECT meal_name FROM meals WHERE date > %s ORDER BY date DESC",
                 (date_threshold,),
@@ -64,13 +88,12 @@ class MealDatabase:
         Returns:
             ID of the inserted meal
         """
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute(
                 "INSERT INTO meals (ingredients, meal_name, recipe, date) VALUES (%s, %s, %s, %s) RETURNING id",
                 (ingredients, meal, recipe, date),
             )
             meal_id = cursor.fetchone()[0]
-            self.conn.commit()
             return meal_id
 
     def update_meal_feedback(self, meal_id: int, feedback: str) -> None:
@@ -81,11 +104,10 @@ class MealDatabase:
             meal_id: ID of the meal
             feedback: Feedback text
         """
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute(
                 "UPDATE meals SET feedback = %s WHERE id = %s", (feedback, meal_id)
             )
-            self.conn.commit()
 
     def get_meal_by_id(self, meal_id: int) -> Optional[dict]:
         """
@@ -97,7 +119,10 @@ class MealDatabase:
         Returns:
             Meal record as dictionary or None
         """
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        with (
+            self.pool.connection() as conn,
+            conn.cursor(cursor_factory=RealDictCursor) as cursor,
+        ):
             cursor.execute("SELECT * FROM meals WHERE id = %s", (meal_id,))
             result = cursor.fetchone()
             return dict(result) if result else None
@@ -112,7 +137,10 @@ class MealDatabase:
         Returns:
             List of meal records
         """
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        with (
+            self.pool.connection() as conn,
+            conn.cursor(cursor_factory=RealDictCursor) as cursor,
+        ):
             cursor.execute("SELECT * FROM meals ORDER BY date DESC LIMIT %s", (limit,))
             return [dict(row) for row in cursor.fetchall()]
 
@@ -126,24 +154,92 @@ class MealDatabase:
         Returns:
             List of meal records as dictionaries (can be multiple with same name)
         """
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        with (
+            self.pool.connection() as conn,
+            conn.cursor(cursor_factory=RealDictCursor) as cursor,
+        ):
             cursor.execute("SELECT * FROM meals WHERE meal = %s", (meal_name,))
             return [dict(row) for row in cursor.fetchall()]
 
     def get_diverse_recipes(
         self, limit: int = 10, dietary_preferences: str = None
     ) -> pd.DataFrame:
-        """Get diverse recipes (random sampling)."""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute(
-                "SELECT contents FROM recipes WHERE contents ILIKE %s ORDER BY RANDOM() LIMIT %s",
-                (
-                    f"%{dietary_preferences}%",
-                    limit,
-                ),
-            )
-            rows = cursor.fetchall()
-            return pd.DataFrame([dict(row) for row in rows])
+        """
+        Get diverse recipes (random sampling).
+
+        Recipes are sampled through the random_key index, so the cost grows
+        with the number of recipes returned rather than with the table size.
+        Dietary preferences naming a diet (see parse_diet) restrict the sample
+        to the recipes fitting it; other preferences do not filter.
+
+        Args:
+            limit: Number of recipes to return
+            dietary_preferences: Free-text dietary preferences
+
+        Returns:
+            DataFrame with a contents column, at most limit rows
+        """
+        diet = parse_diet(dietary_preferences)
+        query = sample_query(self.recipes_table, diet_column(diet) if diet else "TRUE")
+        contents: list[str] = []
+        with (
+            self.pool.connection() as conn,
+            conn.cursor(cursor_factory=RealDictCursor) as cursor,
+        ):
+            # Keys past the last random_key or hitting an already sampled
+            # recipe come back empty, so top up a few times
+            for _ in range(SAMPLE_ATTEMPTS):
+                missing = limit - len(contents)
+                if missing <= 0:
+                    break
+                keys = [random.random() for _ in range(missing * 2)]
+                cursor.execute(query, {"keys": keys})
+                seen = set(contents)
+                contents += [
+                    row["contents"] for row in cursor.fetchall() if row["contents"] not in seen
+                ][:missing]
+        return pd.DataFrame({"contents": contents[:limit]})
+
+    def get_clustered_recipes(
+        self, num_clusters: int, per_cluster: int = 3, dietary_preferences: str = None
+    ) -> pd.DataFrame:
+        """
+        Get random recipes from distinct recipe clusters, for varied meal plans.
+
+        Falls back to get_diverse_recipes when the recipes have not been
+        clustered, and tops up with it when the clusters hold too few recipes
+        fitting the diet.
+
+        Args:
+            num_clusters: Number of distinct clusters to draw from
+            per_cluster: Recipes drawn from each cluster
+            dietary_preferences: Free-text dietary preferences
+
+        Returns:
+            DataFrame with a contents column, num_clusters * per_cluster rows at most
+        """
+        limit = num_clusters * per_cluster
+        diet = parse_diet(dietary_preferences)
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(quote_ident(%s))", (self.clusters_table,))
+            clustered = cursor.fetchone()[0] is not None
+            if clustered:
+                # Some clusters may hold no recipe fitting the diet, draw from extra ones
+                cursor.execute(
+                    cluster_sample_query(
+                        self.recipes_table, self.clusters_table, diet_column(diet) if diet else "TRUE"
+                    ),
+                    {"clusters": num_clusters * 2, "per_cluster": per_cluster},
+                )
+                rows = cursor.fetchall()
+        # Fall back outside the block, so that only one connection is held at a time
+        if not clustered:
+            return self.get_diverse_recipes(limit, dietary_preferences)
+        contents = cluster_contents(rows, num_clusters)
+        if len(contents) < limit:
+            extra = self.get_diverse_recipes(limit - len(contents), dietary_preferences)
+            contents += [c for c in extra.get("contents", []) if c not in contents]
+        return pd.DataFrame({"contents": contents[:limit]})
 
     def save_meal_plan(
         self,
@@ -153,14 +249,13 @@ class MealDatabase:
         name: str = None,
     ) -> int:
         """Save a meal plan and return its ID."""
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute(
                 """INSERT INTO meal_plans (name, num_days, num_people, dietary_preferences) 
                 VALUES (%s, %s, %s, %s) RETURNING id""",
                 (name, num_days, num_people, dietary_preferences),
             )
             plan_id = cursor.fetchone()[0]
-            self.conn.commit()
             return plan_id
 
     def add_meal_to_plan(
@@ -173,7 +268,7 @@ class MealDatabase:
         accepted: bool = False,
     ) -> int:
         """Add a meal to a specific meal plan."""
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute(
                 """INSERT INTO meals (meal_plan_id, day_number, ingredients, meal_name, recipe, date, accepted) 
                 VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
@@ -188,12 +283,14 @@ class MealDatabase:
                 ),
             )
             meal_id = cursor.fetchone()[0]
-            self.conn.commit()
             return meal_id
 
     def get_latest_meal_plan(self) -> dict:
         """Get the most recent meal plan with all its meals."""
-        with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        with (
+            self.pool.connection() as conn,
+            conn.cursor(cursor_factory=RealDictCursor) as cursor,
+        ):
             # Get latest plan
             cursor.execute("SELECT * FROM meal_plans ORDER BY created_at DESC LIMIT 1")
             plan = cursor.fetchone()
@@ -214,15 +311,14 @@ class MealDatabase:
 
     def update_meal_acceptance(self, meal_id: int, accepted: bool) -> None:
         """Update whether a meal in a plan is accepted."""
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             cursor.execute(
                 "UPDATE meals SET accepted = %s WHERE id = %s", (accepted, meal_id)
             )
-            self.conn.commit()
 
     def replace_meal_in_plan(self, old_meal_id: int, new_meal_data: dict) -> int:
         """Replace a rejected meal with a new one."""
-        with self.conn.cursor() as cursor:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
             # Get the old meal's plan info
             cursor.execute(
                 "SELECT meal_plan_id, day_number FROM meals WHERE id = %s",
@@ -253,14 +349,12 @@ class MealDatabase:
                 ),
             )
             new_meal_id = cursor.fetchone()[0]
-            self.conn.commit()
 
             return new_meal_id
 
     def close(self):
-        """Close database connection."""
-        if self.conn:
-            self.conn.close()
+        """Close the database connections."""
+        self.pool.close()
 
     def __enter__(self):
         """Context manager entry."""
@@ -0,0 +1,278 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a text for cache lookups by collapsing whitespace."""
+    return " ".join(text.split())
+
+
+def cache_key(model: str, text: str) -> bytes:
+    """Hash a (model, normalized text) pair into a cache key."""
+    return hashlib.sha256(f"{model}\x1f{normalize_text(text)}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache backed by SQLite.
+
+    Embeddings are stored as float32 blobs keyed by the hash of the model and
+    the normalized text. When the cache grows past its size limit, the least
+    recently used entries are evicted. The cache is safe to share between
+    threads, and between processes using the same file.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        """
+        Initialize EmbeddingCache.
+
+        Args:
+            path: SQLite database file, created if missing
+            max_entries: Number of embeddings kept before evicting the least
+                recently used ones
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key BLOB PRIMARY KEY,
+                embedding BLOB NOT NULL,
+                last_access REAL NOT NULL
+            ) WITHOUT ROWID"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_access_idx ON embeddings (last_access)"
+        )
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, List[float]]:
+        """
+        Look up embeddings and mark the found ones as recently used.
+
+        Args:
+            keys: Cache keys from cache_key
+
+        Returns:
+            Mapping of the keys found to their embeddings
+        """
+        unique = list(dict.fromkeys(keys))
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            # Stay under SQLite's limit on bound parameters
+            for start in range(0, len(unique), 500):
+                batch = unique[start : start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+            hits = sum(key in found for key in keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def get(self, key: bytes) -> Optional[List[float]]:
+        """Look up a single embedding."""
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[bytes, List[float]]) -> None:
+        """
+        Store embeddings, evicting the least recently used entries if needed.
+
+        Args:
+            items: Mapping of cache keys to embeddings
+        """
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (key, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for key, embedding in items.items()
+        ]
+        with self._lock:
+            # Take the write lock up front, so other processes cannot change
+            # the entry count between counting and evicting
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, embedding, last_access) VALUES (?, ?, ?)",
+                    rows,
+                )
+                # Counted rather than tracked, as other processes may share
+                # the file; the count scans the small last_access index
+                size = self._count()
+                if size > self.max_entries:
+                    self._evict(size)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+
+    def _evict(self, size: int) -> None:
+        """Drop the least recently used entries down to 90% of the limit."""
+        excess = size - int(self.max_entries * 0.9)
+        self._conn.execute(
+            """DELETE FROM embeddings WHERE key IN (
+                SELECT key FROM embeddings ORDER BY last_access LIMIT ?
+            )""",
+            (excess,),
+        )
+        logging.info(f"Evicted {excess} embeddings from the cache at {self.path}")
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the number of cached embeddings."""
+        with self._lock:
+            entries = self._count()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+
+def singularize(word: str) -> str:
+    """Reduce a plural English noun to its singular with simple suffix rules."""
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def canonical_query(query: Union[str, List[str]]) -> str:
+    """
+    Canonicalize a search query so equivalent queries share a cache key.
+
+    Ingredient lists are lowercased, trimmed, singularized, deduplicated and
+    sorted, so ["Rice ", "salmon"] and ["salmons", "rice", "rice"] become "rice, salmon".
+    Free-text queries keep their word order and are only lowercased with
+    whitespace collapsed. The suffix rules of singularize can mangle words
+    (pies becomes py), so the result is only a key; the text that is
+    embedded is query_text.
+
+    Args:
+        query: A free-text query or a list of ingredients
+
+    Returns:
+        The canonical query, used as a cache key
+    """
+    if isinstance(query, str):
+        return normalize_text(query).lower()
+    items = set()
+    for ingredient in query:
+        words = ingredient.lower().split()
+        if words:
+            items.add(" ".join(words[:-1] + [singularize(words[-1])]))
+    return ", ".join(sorted(items))
+
+
+def query_text(query: Union[str, List[str]]) -> str:
+    """
+    Text embedded for a search query.
+
+    Like canonical_query, but ingredients keep the words they were given
+    with, so ["Pies", "rice", "rice"] becomes "pies, rice".
+
+    Args:
+        query: A free-text query or a list of ingredients
+
+    Returns:
+        The query text that is embedded
+    """
+    if isinstance(query, str):
+        return normalize_text(query).lower()
+    items = {normalize_text(ingredient).lower() for ingredient in query}
+    return ", ".join(sorted(item for item in items if item))
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU cache with a TTL for query embeddings.
+
+    Sits in front of the persistent EmbeddingCache so that repeated queries
+    skip both the API and SQLite. Safe to share between threads.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        """
+        Initialize QueryEmbeddingCache.
+
+        Args:
+            max_entries: Number of queries kept before evicting the least
+                recently used one
+            ttl_seconds: Seconds after which a cached embedding expires
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[List[float]]:
+        """Return the cached embedding of a canonical query, if fresh."""
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[query]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(query)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query: str, embedding: List[float]) -> None:
+        """Cache the embedding of a canonical query."""
+        with self._lock:
+            self._entries[query] = (time.monotonic(), embedding)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return the hit and miss counters and the number of cached queries."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
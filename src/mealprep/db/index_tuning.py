@@ -0,0 +1,95 @@
+import math
+from typing import Dict, Optional, Union
+
+from timescale_vector import client
+
+IndexOptions = Dict[str, Union[int, float, str]]
+
+
+def ivfflat_lists(num_rows: int) -> int:
+    """
+    Number of ivfflat lists for a table size, following the pgvector guidance:
+    rows / 1000 up to 1M rows and sqrt(rows) beyond. Small tables get at
+    least 10 lists, but never more lists than rows to train them on.
+    """
+    if num_rows > 1_000_000:
+        return int(math.sqrt(num_rows))
+    return max(1, min(num_rows, max(10, num_rows // 1000)))
+
+
+def ivfflat_probes(lists: int) -> int:
+    """Default number of lists to probe, sqrt(lists) as recommended by pgvector."""
+    return max(1, round(math.sqrt(lists)))
+
+
+def index_options(kind: str, num_rows: int) -> IndexOptions:
+    """
+    Build parameters for an embedding index sized to the table.
+
+    Args:
+        kind: Index type ("ivfflat", "hnsw" or "diskann")
+        num_rows: Number of rows the index will cover
+
+    Returns:
+        The index storage parameters
+    """
+    if kind == "ivfflat":
+        return {"lists": ivfflat_lists(num_rows)}
+    if kind == "hnsw":
+        # pgvector defaults up to 100k rows, denser graphs for larger tables
+        # to hold recall at a given ef_search
+        if num_rows < 100_000:
+            return {"m": 16, "ef_construction": 64}
+        if num_rows < 1_000_000:
+            return {"m": 16, "ef_construction": 128}
+        return {"m": 24, "ef_construction": 200}
+    if kind == "diskann":
+        if num_rows < 1_000_000:
+            return {"num_neighbors": 50, "search_list_size": 100}
+        return {"num_neighbors": 64, "search_list_size": 128}
+    raise ValueError(f"Unknown index type: {kind}")
+
+
+def build_index(kind: str, options: IndexOptions) -> client.BaseIndex:
+    """Create the timescale_vector index definition for the given parameters."""
+    if kind == "ivfflat":
+        return client.IvfflatIndex(num_lists=options["lists"])
+    if kind == "hnsw":
+        return client.HNSWIndex(m=options.get("m"), ef_construction=options.get("ef_construction"))
+    if kind == "diskann":
+        return client.DiskAnnIndex(**options)
+    raise ValueError(f"Unknown index type: {kind}")
+
+
+def query_params(
+    kind: Optional[str],
+    options: IndexOptions,
+    limit: int,
+    probes: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    search_list_size: Optional[int] = None,
+    rescore: Optional[int] = None,
+) -> Optional[client.QueryParams]:
+    """
+    Build the per-query search parameters for an index.
+
+    Args:
+        kind: Type of the existing index (None if there is none)
+        options: Storage parameters of the existing index
+        limit: Number of results requested
+        probes: ivfflat lists to probe (defaults to sqrt(lists))
+        ef_search: HNSW candidate list size (defaults to pgvector's 40, and
+            at least limit so that enough results come back)
+        search_list_size: DiskANN candidate list size
+        rescore: DiskANN number of candidates rescored with full vectors
+
+    Returns:
+        Query parameters, or None to keep the server defaults
+    """
+    if kind == "ivfflat":
+        return client.IvfflatIndexParams(probes or ivfflat_probes(int(options.get("lists", 100))))
+    if kind == "hnsw":
+        return client.HNSWIndexParams(max(ef_search or 40, limit))
+    if kind == "diskann" and (search_list_size or rescore):
+        return client.DiskAnnIndexParams(search_list_size, rescore)
+    return None
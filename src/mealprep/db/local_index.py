@@ -0,0 +1,316 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from mealprep.helpers.utils import FLAG_COLUMNS
+
+EMBEDDINGS_FILE = "embeddings.npy"
+NORMS_FILE = "norms.npy"
+IDS_FILE = "ids.npy"
+RECORDS_FILE = "records.jsonl"
+OFFSETS_FILE = "offsets.npy"
+# Metadata columns that filters are evaluated on without reading the records
+DIET_PREFS_FILE = "diet_prefs.npy"
+FLAGS_FILE = "flags.npy"
+
+# Values of the flag columns: 1 (true), 0 (false) or MISSING_FLAG (not in the metadata)
+MISSING_FLAG = -1
+
+# Rows scored per matrix multiply, bounding the temporary score matrix
+BLOCK_ROWS = 65_536
+
+
+def contains(value: Any, pattern: Any) -> bool:
+    """
+    Postgres jsonb containment (value @> pattern) for decoded JSON values.
+
+    Objects contain an object if every key of the pattern is contained,
+    arrays contain an array if every element of the pattern is contained in
+    some element, and scalars must be equal and of the same JSON type. Only
+    a top-level array contains a scalar, if it is one of its elements.
+    """
+    if isinstance(value, list) and not isinstance(pattern, (dict, list)):
+        return any(_contains(element, pattern) for element in value)
+    return _contains(value, pattern)
+
+
+def _contains(value: Any, pattern: Any) -> bool:
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(
+            key in value and _contains(value[key], item) for key, item in pattern.items()
+        )
+    if isinstance(pattern, list):
+        if not isinstance(value, list):
+            return False
+        return all(any(_contains(element, item) for element in value) for item in pattern)
+    if isinstance(value, (dict, list)):
+        return False
+    # True == 1 in Python, but not in JSON
+    return isinstance(value, bool) == isinstance(pattern, bool) and value == pattern
+
+
+class MmapIndexWriter:
+    """Writes the files of an MmapVectorIndex, one DataFrame of records at a time."""
+
+    def __init__(self, directory: Path, num_rows: int, dimensions: int, dtype: str = "float32"):
+        """
+        Initialize MmapIndexWriter.
+
+        Args:
+            directory: Directory to write the index files into
+            num_rows: Number of records that will be written
+            dimensions: Embedding dimensions
+            dtype: Storage type of the embeddings ("float32" or "float16")
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.num_rows = num_rows
+        self.embeddings = np.lib.format.open_memmap(
+            self.directory / EMBEDDINGS_FILE, mode="w+", dtype=dtype, shape=(num_rows, dimensions)
+        )
+        self.norms = np.zeros(num_rows, dtype=np.float32)
+        self.ids = np.zeros(num_rows, dtype="S36")
+        self.offsets = np.zeros(num_rows + 1, dtype=np.int64)
+        self.diet_prefs = np.zeros(num_rows, dtype="S16")
+        self.flags = np.full((num_rows, len(FLAG_COLUMNS)), MISSING_FLAG, dtype=np.int8)
+        self._records = open(self.directory / RECORDS_FILE, "wb")
+        self._position = 0
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        Append records.
+
+        Args:
+            df: DataFrame with id, metadata, contents and embedding columns
+        """
+        end = self._position + len(df)
+        if end > self.num_rows:
+            raise ValueError(f"More than the announced {self.num_rows} records were written")
+        embeddings = np.asarray(df["embedding"].tolist(), dtype=np.float32)
+        self.embeddings[self._position : end] = embeddings
+        self.norms[self._position : end] = np.linalg.norm(embeddings, axis=1)
+        for i, (record_id, metadata, contents) in enumerate(
+            zip(df["id"], df["metadata"], df["contents"]), start=self._position
+        ):
+            if isinstance(metadata, str):
+                metadata = json.loads(metadata)
+            self.ids[i] = str(record_id).encode("ascii")
+            self.diet_prefs[i] = str(metadata.get("diet_pref", "")).encode("utf-8")
+            for column, flag in enumerate(FLAG_COLUMNS):
+                if isinstance(metadata.get(flag), bool):
+                    self.flags[i, column] = metadata[flag]
+            line = json.dumps({"metadata": metadata, "contents": contents}).encode("utf-8") + b"\n"
+            self._records.write(line)
+            self.offsets[i + 1] = self.offsets[i] + len(line)
+        self._position = end
+
+    def close(self) -> None:
+        """Flush all files. The index is only complete once every record is written."""
+        if self._position != self.num_rows:
+            raise ValueError(f"Wrote {self._position} of {self.num_rows} records")
+        self.embeddings.flush()
+        del self.embeddings
+        self._records.close()
+        np.save(self.directory / NORMS_FILE, self.norms)
+        np.save(self.directory / IDS_FILE, self.ids)
+        np.save(self.directory / OFFSETS_FILE, self.offsets)
+        np.save(self.directory / DIET_PREFS_FILE, self.diet_prefs)
+        np.save(self.directory / FLAGS_FILE, self.flags)
+
+
+class MmapVectorIndex:
+    """
+    In-process exact vector search over memory-mapped NumPy files.
+
+    The embedding matrix is opened read-only with mmap, so worker processes
+    that open the same directory share the operating system's page cache
+    instead of each holding a copy. Search scores the matrix block by block
+    with a matrix multiply and selects the top k with argpartition. Metadata
+    and contents live in a JSON lines sidecar, read only for the returned
+    rows. diet_pref and the dietary flags are also kept as memory-mapped
+    columns, so that diet and flag filters are evaluated without loading the
+    metadata; only filters on other keys read every record.
+    """
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+        Initialize MmapVectorIndex.
+
+        Args:
+            directory: Directory written by MmapIndexWriter
+        """
+        self.directory = Path(directory)
+        self.embeddings = np.load(self.directory / EMBEDDINGS_FILE, mmap_mode="r")
+        self.norms = np.load(self.directory / NORMS_FILE, mmap_mode="r")
+        self.ids = np.load(self.directory / IDS_FILE, mmap_mode="r")
+        self.offsets = np.load(self.directory / OFFSETS_FILE, mmap_mode="r")
+        # Indexes exported before the filter columns existed only have the records
+        if (self.directory / FLAGS_FILE).exists():
+            self.diet_prefs = np.load(self.directory / DIET_PREFS_FILE, mmap_mode="r")
+            self.flags = np.load(self.directory / FLAGS_FILE, mmap_mode="r")
+        else:
+            self.diet_prefs = self.flags = None
+        self._metadata: Optional[List[dict]] = None
+        self._filter_masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    @classmethod
+    def writer(
+        cls, directory: Union[str, Path], num_rows: int, dimensions: int, dtype: str = "float32"
+    ) -> MmapIndexWriter:
+        """Create a writer for a new index in the given directory."""
+        return MmapIndexWriter(Path(directory), num_rows, dimensions, dtype)
+
+    def _read_record(self, position: int) -> dict:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        with open(self.directory / RECORDS_FILE, "rb") as f:
+            f.seek(start)
+            return json.loads(f.read(end - start))
+
+    def metadata(self) -> List[dict]:
+        """Metadata of every record, loaded on first use."""
+        with self._lock:
+            if self._metadata is None:
+                with open(self.directory / RECORDS_FILE, "rb") as f:
+                    self._metadata = [json.loads(line)["metadata"] for line in f]
+            return self._metadata
+
+    def filter_mask(self, metadata_filter: Union[dict, List[dict]]) -> np.ndarray:
+        """
+        Rows matching a metadata filter, with the semantics of timescale_vector:
+        a dict must be contained in the metadata, a list matches if any of its
+        dicts is contained.
+        """
+        key = json.dumps(metadata_filter, sort_keys=True)
+        with self._lock:
+            if key in self._filter_masks:
+                self._filter_masks.move_to_end(key)
+                return self._filter_masks[key]
+        patterns = metadata_filter if isinstance(metadata_filter, list) else [metadata_filter]
+        mask = np.zeros(len(self), dtype=bool)
+        scanned = []
+        for pattern in patterns:
+            column_mask = self._column_mask(pattern)
+            if column_mask is None:
+                scanned.append(pattern)
+            else:
+                mask |= column_mask
+        if scanned:
+            mask |= np.fromiter(
+                (any(contains(metadata, pattern) for pattern in scanned) for metadata in self.metadata()),
+                dtype=bool,
+                count=len(self),
+            )
+        with self._lock:
+            self._filter_masks[key] = mask
+            if len(self._filter_masks) > 64:
+                self._filter_masks.popitem(last=False)
+        return mask
+
+    def _column_mask(self, pattern: Any) -> Optional[np.ndarray]:
+        """
+        Rows containing a filter dict, from the filter columns alone.
+
+        Returns:
+            The mask, or None if the pattern involves other keys or values
+            than a string diet_pref and boolean flags
+        """
+        if self.flags is None or not isinstance(pattern, dict):
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for key, value in pattern.items():
+            if key == "diet_pref" and isinstance(value, str) and value:
+                mask &= self.diet_prefs == value.encode("utf-8")
+            elif key in FLAG_COLUMNS and isinstance(value, bool):
+                mask &= self.flags[:, FLAG_COLUMNS.index(key)] == value
+            else:
+                return None
+        return mask
+
+    def search(
+        self,
+        query_embeddings: np.ndarray,
+        limit: int = 5,
+        metadata_filter: Union[dict, List[dict]] = None,
+    ) -> List[List[Tuple[Any, ...]]]:
+        """
+        Find the nearest records by cosine distance for a batch of queries.
+
+        Args:
+            query_embeddings: (q, d) query embeddings
+            limit: The maximum number of results per query
+            metadata_filter: A dictionary or list of dictionaries for equality-based metadata filtering
+
+        Returns:
+            Per query, a list of (id, metadata, contents, embedding, distance)
+            tuples ordered by distance, like timescale_vector's search
+        """
+        start_time = time.time()
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        mask = self.filter_mask(metadata_filter) if metadata_filter else None
+
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self), BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, len(self))
+            scores = queries @ np.asarray(self.embeddings[start:end], dtype=np.float32).T
+            scores /= np.maximum(self.norms[start:end], 1e-12)
+            if mask is not None:
+                scores[:, ~mask[start:end]] = -np.inf
+            scores = np.hstack([best_scores, scores])
+            rows = np.hstack(
+                [best_rows, np.broadcast_to(np.arange(start, end), (len(queries), end - start))]
+            )
+            keep = min(limit, scores.shape[1])
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            result = []
+            for score, row in zip(scores[order], rows[order]):
+                if not np.isfinite(score):
+                    break
+                record = self._read_record(row)
+                result.append(
+                    (
+                        uuid.UUID(self.ids[row].decode("ascii")),
+                        record["metadata"],
+                        record["contents"],
+                        np.asarray(self.embeddings[row], dtype=np.float32),
+                        float(1 - score),
+                    )
+                )
+            results.append(result)
+        logging.info(
+            f"Local search of {len(queries)} queries over {len(self)} vectors "
+            f"completed in {time.time() - start_time:.3f} seconds"
+        )
+        return results
+
+
+def replace_directory(staging: Path, target: Path) -> None:
+    """Move a freshly written index into place, replacing the previous one."""
+    old = target.with_name(target.name + ".old")
+    if old.exists():
+        shutil.rmtree(old)
+    if target.exists():
+        os.rename(target, old)
+    os.rename(staging, target)
+    if old.exists():
+        shutil.rmtree(old)
@@ -0,0 +1,266 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import psycopg2
+from psycopg2.extensions import connection as Connection
+
+
+class PoolTimeout(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of psycopg2 connections with health checks.
+
+    Connections are checked out for one operation at a time with
+    connection(), which commits when the operation succeeds and rolls back
+    when it fails, so a failed statement never leaves an aborted
+    transaction behind for the next caller. Connections idle for longer than
+    check_after_seconds are pinged before reuse, and broken ones are
+    replaced, reconnecting with exponential backoff. When all max_size
+    connections are in use, callers wait up to timeout seconds.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        check_after_seconds: float = 30.0,
+        statement_timeout_ms: int = 30_000,
+        connect_retries: int = 3,
+        backoff_seconds: float = 0.5,
+    ):
+        """
+        Initialize ConnectionPool and open its first min_size connections.
+
+        Args:
+            dsn: PostgreSQL connection string
+            min_size: Connections opened upfront and kept when idle
+            max_size: Maximum number of open connections
+            timeout: Seconds to wait for a free connection
+            check_after_seconds: Idle time after which a connection is
+                pinged before it is handed out
+            statement_timeout_ms: Per-statement time limit, 0 for none
+            connect_retries: Attempts to open a connection before giving up
+            backoff_seconds: Wait before the first retry, doubled after each
+        """
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError(f"Invalid pool size: min {min_size}, max {max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after_seconds = check_after_seconds
+        self.statement_timeout_ms = statement_timeout_ms
+        self.connect_retries = connect_retries
+        self.backoff_seconds = backoff_seconds
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        # (connection, time it was returned), most recently returned last
+        self._idle: deque = deque()
+        self._size = 0
+        self._closed = False
+
+        self.waiters = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.reconnects = 0
+        self.discarded = 0
+        self._checkout_seconds = 0.0
+        self._max_checkout_seconds = 0.0
+
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append((self._connect(), time.monotonic()))
+
+    @classmethod
+    def from_settings(cls, dsn: str, settings, **overrides) -> "ConnectionPool":
+        """
+        Create a pool sized and configured by the database settings.
+
+        Args:
+            dsn: PostgreSQL connection string
+            settings: DatabaseSettings
+            **overrides: Arguments to use instead of the settings
+
+        Returns:
+            The connection pool
+        """
+        options = {
+            "min_size": settings.pool_min_size,
+            "max_size": settings.pool_max_size,
+            "timeout": settings.pool_timeout,
+            "check_after_seconds": settings.pool_check_after_seconds,
+            "statement_timeout_ms": settings.statement_timeout_ms,
+            "connect_retries": settings.connect_retries,
+            "backoff_seconds": settings.connect_backoff_seconds,
+        }
+        options.update(overrides)
+        return cls(dsn, **options)
+
+    def _connect(self) -> Connection:
+        """Open a connection, retrying with exponential backoff."""
+        options = f"-c statement_timeout={int(self.statement_timeout_ms)}"
+        delay = self.backoff_seconds
+        for attempt in range(1, self.connect_retries + 1):
+            try:
+                conn = psycopg2.connect(self.dsn, options=options)
+                conn.autocommit = False  # Use transactions
+                return conn
+            except psycopg2.OperationalError as e:
+                if attempt == self.connect_retries:
+                    raise ConnectionError(f"Failed to connect to database: {e}")
+                logging.warning(
+                    f"Database connection attempt {attempt} failed, retrying in {delay:.1f}s: {e}"
+                )
+                time.sleep(delay)
+                delay *= 2
+
+    def _is_alive(self, conn: Connection) -> bool:
+        """Ping a connection."""
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn: Connection) -> None:
+        """Close a connection and free its slot."""
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._available:
+            self._size -= 1
+            self.discarded += 1
+            self._available.notify()
+
+    def _checkout(self) -> Connection:
+        start = time.monotonic()
+        deadline = start + self.timeout
+        while True:
+            with self._available:
+                if self._closed:
+                    raise RuntimeError("The connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                elif self._size < self.max_size:
+                    conn, returned_at = None, None
+                    self._size += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {self.timeout:.1f}s "
+                            f"({self.max_size} in use)"
+                        )
+                    self.waiters += 1
+                    try:
+                        self._available.wait(remaining)
+                    finally:
+                        self.waiters -= 1
+                    continue
+
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._available:
+                        self._size -= 1
+                        self._available.notify()
+                    raise
+            elif conn.closed or (
+                time.monotonic() - returned_at > self.check_after_seconds
+                and not self._is_alive(conn)
+            ):
+                logging.warning("Replacing a broken database connection")
+                self._discard(conn)
+                with self._available:
+                    self.reconnects += 1
+                continue
+
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.checkouts += 1
+                self._checkout_seconds += elapsed
+                self._max_checkout_seconds = max(self._max_checkout_seconds, elapsed)
+            return conn
+
+    def _checkin(self, conn: Connection) -> None:
+        with self._available:
+            if self._closed:
+                conn.close()
+                self._size -= 1
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """
+        Check out a connection for one operation.
+
+        The transaction is committed when the block exits normally and rolled
+        back when it raises. Connections that broke during the block are
+        closed instead of being returned to the pool.
+
+        Raises:
+            PoolTimeout: If no connection became available in time
+        """
+        conn = self._checkout()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+            if conn.closed:
+                self._discard(conn)
+            else:
+                self._checkin(conn)
+            raise
+        if conn.closed:
+            self._discard(conn)
+        else:
+            self._checkin(conn)
+
+    def stats(self) -> dict:
+        """Return the pool size, usage and checkout latency counters."""
+        with self._lock:
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiters": self.waiters,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "reconnects": self.reconnects,
+                "discarded": self.discarded,
+                "checkout_ms": {
+                    "mean": self._checkout_seconds / self.checkouts * 1000 if self.checkouts else 0.0,
+                    "max": self._max_checkout_seconds * 1000,
+                },
+            }
+
+    def close(self) -> None:
+        """Close the idle connections; connections in use are closed when returned."""
+        with self._available:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+                self._size -= 1
+            self._available.notify_all()
@@ -0,0 +1,322 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, List, NamedTuple, Optional, Sequence
+
+import psycopg2
+from psycopg2.extras import Json
+from mealprep.config.settings import get_db_url, get_settings
+from mealprep.db.pool import ConnectionPool, PoolTimeout
+
+
+class ResponseRequest(NamedTuple):
+    """What a cached LLM response answers; responses are reused only for equal fields."""
+
+    # "suggestion" or "plan"
+    kind: str
+    # Canonical ingredient list (see canonical_query), empty when none were given
+    ingredients: str
+    # Normalized dietary preferences (see normalize_preferences)
+    preferences: str
+    num_people: int
+    # Days of a plan, 1 for a suggestion
+    num_days: int = 1
+
+    def key(self) -> str:
+        """Hash of all fields, the key of the exact tier."""
+        text = "\x1f".join(str(field) for field in self)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_preferences(text: Optional[str]) -> str:
+    """Lowercase free-text dietary preferences and sort their comma-separated parts."""
+    if not text:
+        return ""
+    parts = {" ".join(part.lower().split()) for part in text.split(",")}
+    return ", ".join(sorted(part for part in parts if part))
+
+
+def normalize_meal_name(name: str) -> str:
+    """Meal name as compared against the exclusion list."""
+    return " ".join(name.lower().split())
+
+
+def response_meal_names(response: Any) -> List[str]:
+    """Normalized names of the meals in a suggestion (dict) or plan (list of dicts)."""
+    meals = response if isinstance(response, list) else [response]
+    return [
+        normalize_meal_name(meal["meal_name"])
+        for meal in meals
+        if isinstance(meal, dict) and meal.get("meal_name")
+    ]
+
+
+class ResponseCache:
+    """
+    Cache of LLM meal suggestions and plans shared through PostgreSQL.
+
+    Responses are looked up in two tiers: the exact tier reuses a response to
+    an identical request (see ResponseRequest) while it is younger than
+    ttl_seconds; the semantic tier reuses a response to a request with the
+    same preferences and party size whose ingredients embed with a cosine
+    similarity of at least similarity_threshold, while it is younger than
+    semantic_ttl_seconds. A response is never reused when one of its meals
+    is on the caller's exclusion list (recent or rejected meals).
+
+    Every app instance connected to the database shares the cache. Database
+    errors are logged and treated as misses, so the cache never fails a
+    request. Safe to share between threads.
+    """
+
+    def __init__(self, pool: ConnectionPool = None, settings=None):
+        """
+        Initialize ResponseCache; its table is created on first use.
+
+        Args:
+            pool: Connection pool to use (defaults to a pool of its own on DATABASE_URL)
+            settings: ResponseCacheSettings (defaults to the application settings)
+        """
+        self.settings = settings or get_settings().response_cache
+        self._owns_pool = pool is None
+        if pool is None:
+            db_url = get_db_url()
+            if not db_url:
+                raise ValueError("DATABASE_URL not provided and not found in environment")
+            pool = ConnectionPool.from_settings(db_url, get_settings().database, min_size=0)
+        self.pool = pool
+        self.table_name = self.settings.table_name
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+        # Generation time of the responses served from the cache
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+        self._lock = threading.Lock()
+        self._table_ready = False
+
+    def create_table(self) -> None:
+        """Create the cache table and its indexes if they do not exist."""
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                f"""CREATE TABLE IF NOT EXISTS "{self.table_name}" (
+                    id BIGSERIAL PRIMARY KEY,
+                    request_key TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    ingredients TEXT NOT NULL,
+                    preferences TEXT NOT NULL,
+                    num_people INTEGER NOT NULL,
+                    num_days INTEGER NOT NULL,
+                    embedding_model TEXT,
+                    embedding vector,
+                    response JSONB NOT NULL,
+                    meal_names TEXT[] NOT NULL,
+                    latency_ms DOUBLE PRECISION NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )"""
+            )
+            cursor.execute(
+                f"""CREATE INDEX IF NOT EXISTS "{self.table_name}_request_key_idx"
+                ON "{self.table_name}" (request_key, created_at)"""
+            )
+            cursor.execute(
+                f"""CREATE INDEX IF NOT EXISTS "{self.table_name}_semantic_idx"
+                ON "{self.table_name}" (kind, num_people, num_days, preferences, created_at)
+                WHERE embedding IS NOT NULL"""
+            )
+        self._table_ready = True
+
+    def _ensure_table(self) -> None:
+        if not self._table_ready:
+            self.create_table()
+
+    def lookup(
+        self,
+        request: ResponseRequest,
+        excluded: Sequence[str] = (),
+        embedding: Optional[List[float]] = None,
+        embedding_model: Optional[str] = None,
+    ) -> Optional[Any]:
+        """
+        Find a cached response for a request.
+
+        Args:
+            request: The request to answer
+            excluded: Meal names the response must not contain
+            embedding: Embedding of the request's ingredients, enables the semantic tier
+            embedding_model: Model that produced the embedding
+
+        Returns:
+            The cached response as it was stored, or None on a miss
+        """
+        start_time = time.perf_counter()
+        params = {
+            "request_key": request.key(),
+            "excluded": [normalize_meal_name(name) for name in excluded],
+            "ttl": self.settings.ttl_seconds,
+        }
+        try:
+            self._ensure_table()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    f"""SELECT id, response, latency_ms FROM "{self.table_name}"
+                    WHERE request_key = %(request_key)s
+                        AND created_at > now() - make_interval(secs => %(ttl)s)
+                        AND NOT meal_names && %(excluded)s::text[]
+                    ORDER BY created_at DESC LIMIT 1""",
+                    params,
+                )
+                row = cursor.fetchone()
+                tier = "exact"
+                if row is None and embedding is not None and request.ingredients:
+                    row = self._semantic_match(cursor, request, params, embedding, embedding_model)
+                    tier = "semantic"
+                if row is not None:
+                    cursor.execute(
+                        f'UPDATE "{self.table_name}" SET hits = hits + 1 WHERE id = %s', (row[0],)
+                    )
+        except (psycopg2.Error, ConnectionError, PoolTimeout) as e:
+            logging.warning(f"Response cache lookup failed: {e}")
+            with self._lock:
+                self.errors += 1
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.lookup_seconds += time.perf_counter() - start_time
+            if row is None:
+                self.misses += 1
+                return None
+            if tier == "exact":
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+            self.saved_seconds += row[2] / 1000
+        logging.info(f"Response cache {tier} hit for a {request.kind}")
+        return row[1]
+
+    def _semantic_match(
+        self,
+        cursor,
+        request: ResponseRequest,
+        params: dict,
+        embedding: List[float],
+        embedding_model: Optional[str],
+    ) -> Optional[tuple]:
+        """Most similar cached response to a request with other ingredients, if similar enough."""
+        # Only rows passing the filters are compared, so embeddings of
+        # another model (and length) are never measured against this one
+        cursor.execute(
+            f"""SELECT id, response, latency_ms, embedding <=> %(embedding)s::vector AS distance
+            FROM "{self.table_name}"
+            WHERE embedding IS NOT NULL
+                AND embedding_model IS NOT DISTINCT FROM %(embedding_model)s
+                AND kind = %(kind)s AND num_people = %(num_people)s
+                AND num_days = %(num_days)s AND preferences = %(preferences)s
+                AND created_at > now() - make_interval(secs => %(semantic_ttl)s)
+                AND NOT meal_names && %(excluded)s::text[]
+            ORDER BY distance LIMIT 1""",
+            {
+                **params,
+                **request._asdict(),
+                "embedding": list(embedding),
+                "embedding_model": embedding_model,
+                "semantic_ttl": self.settings.semantic_ttl_seconds,
+            },
+        )
+        row = cursor.fetchone()
+        if row is None or 1 - row[3] < self.settings.similarity_threshold:
+            return None
+        return row[:3]
+
+    def store(
+        self,
+        request: ResponseRequest,
+        response: Any,
+        latency_seconds: float,
+        embedding: Optional[List[float]] = None,
+        embedding_model: Optional[str] = None,
+    ) -> None:
+        """
+        Cache the response to a request, and drop expired responses.
+
+        Args:
+            request: The request that was answered
+            response: JSON-serializable response (a suggestion dict or a plan list)
+            latency_seconds: Time it took to generate the response
+            embedding: Embedding of the request's ingredients, for the semantic tier
+            embedding_model: Model that produced the embedding
+        """
+        meal_names = response_meal_names(response)
+        if not meal_names:
+            # Failed or malformed responses are not worth reusing
+            return
+        try:
+            self._ensure_table()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    f"""INSERT INTO "{self.table_name}" (request_key, kind, ingredients,
+                        preferences, num_people, num_days, embedding_model, embedding,
+                        response, meal_names, latency_ms)
+                    VALUES (%(request_key)s, %(kind)s, %(ingredients)s, %(preferences)s,
+                        %(num_people)s, %(num_days)s, %(embedding_model)s,
+                        %(embedding)s::vector, %(response)s, %(meal_names)s, %(latency_ms)s)""",
+                    {
+                        **request._asdict(),
+                        "request_key": request.key(),
+                        "embedding_model": embedding_model if embedding is not None else None,
+                        "embedding": list(embedding) if embedding is not None else None,
+                        "response": Json(response),
+                        "meal_names": meal_names,
+                        "latency_ms": latency_seconds * 1000,
+                    },
+                )
+                cursor.execute(
+                    f"""DELETE FROM "{self.table_name}"
+                    WHERE created_at < now() - make_interval(secs => %s)""",
+                    (max(self.settings.ttl_seconds, self.settings.semantic_ttl_seconds),),
+                )
+        except (psycopg2.Error, ConnectionError, PoolTimeout) as e:
+            logging.warning(f"Response cache store failed: {e}")
+            with self._lock:
+                self.errors += 1
+            return
+        with self._lock:
+            self.stores += 1
+
+    def stats(self) -> dict:
+        """Return hit, miss and saved-latency counters of this process."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "errors": self.errors,
+                "saved_seconds": self.saved_seconds,
+                "lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+            }
+
+    def shared_stats(self) -> dict:
+        """Return entry, hit and saved-latency totals of the cache table, across all instances."""
+        self._ensure_table()
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                f"""SELECT count(*), coalesce(sum(hits), 0),
+                    coalesce(sum(hits * latency_ms), 0) / 1000
+                FROM "{self.table_name}" """
+            )
+            entries, hits, saved_seconds = cursor.fetchone()
+        return {"entries": entries, "hits": int(hits), "saved_seconds": float(saved_seconds)}
+
+    def close(self) -> None:
+        """Close the connection pool, unless it was given by the caller."""
+        if self._owns_pool:
+            self.pool.close()
@@ -0,0 +1,390 @@
+import re
+from typing import List, Optional, Sequence, Tuple, Union
+
+from mealprep.helpers.utils import DIET_MEMBERS
+
+# Text search configuration of the generated contents_tsv column
+TEXT_SEARCH_CONFIG = "english"
+
+# Column type used by each storage mode of the embedding column
+COLUMN_TYPES = {"vector": "vector", "halfvec": "halfvec", "binary": "vector"}
+
+# Columns of a search result row, in order
+RESULT_COLUMNS = ("id", "metadata", "contents", "embedding", "distance")
+
+# Result columns returned by the search queries by default: all but the embedding
+SEARCH_COLUMNS = ("id", "metadata", "contents", "distance")
+
+
+def column_type(storage: str) -> str:
+    """Postgres type of the embedding column for a storage mode."""
+    try:
+        return COLUMN_TYPES[storage]
+    except KeyError:
+        raise ValueError(f"Unknown vector storage: {storage}")
+
+
+def diet_column(diet: str) -> str:
+    """Name of the generated boolean column marking the recipes that fit a diet."""
+    if diet not in DIET_MEMBERS:
+        raise ValueError(f"Unknown diet: {diet}")
+    return f"is_{diet}"
+
+
+def result_columns(columns: Optional[Sequence[str]] = None) -> Tuple[str, ...]:
+    """
+    Validate requested result columns, in result row order.
+
+    None requests every column. The distance is always returned, since
+    results are ordered by it.
+    """
+    if columns is None:
+        return RESULT_COLUMNS
+    unknown = set(columns) - set(RESULT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown result columns: {', '.join(sorted(unknown))}")
+    return tuple(name for name in RESULT_COLUMNS if name in columns or name == "distance")
+
+
+def select_list(columns: Sequence[str], distance: str, alias: str = "") -> str:
+    """
+    Select list of a search result row.
+
+    Every result column keeps its position, so rows always have the shape
+    of RESULT_COLUMNS, but the columns that were not requested are NULL and
+    cost nothing on the wire.
+    """
+    return ", ".join(
+        f"{distance} AS distance"
+        if name == "distance"
+        else f"{alias}{name}"
+        if name in columns
+        else f"NULL AS {name}"
+        for name in RESULT_COLUMNS
+    )
+
+
+def prefix(value: str, storage: str, index_dimensions: int) -> str:
+    """
+    SQL expression for the first index_dimensions values of a vector.
+
+    Embeddings of Matryoshka-trained models such as text-embedding-3 keep
+    most of their meaning in their leading dimensions. Casting through real[]
+    keeps the expression immutable, so it can be indexed, on any pgvector
+    version.
+    """
+    vector_type = column_type(storage)
+    return f"((({value})::real[])[1:{int(index_dimensions)}]::{vector_type}({int(index_dimensions)}))"
+
+
+def index_target(
+    storage: str, dimensions: int, index_dimensions: Optional[int] = None
+) -> Tuple[str, str]:
+    """
+    Indexed expression and operator class for a storage mode.
+
+    Binary storage keeps the full-precision column and indexes its 1-bit
+    quantization (about 32 times smaller than float32), which is then used
+    to pick candidates that are re-ranked at full precision. With
+    index_dimensions only that many leading dimensions are indexed, and
+    candidates are likewise re-ranked with the full embedding.
+
+    Returns:
+        (indexed expression, operator class)
+    """
+    if storage == "binary":
+        if index_dimensions:
+            raise ValueError("Truncated index dimensions are not supported with binary storage")
+        return f"(binary_quantize(embedding)::bit({dimensions}))", "bit_hamming_ops"
+    expression = prefix("embedding", storage, index_dimensions) if index_dimensions else "embedding"
+    return expression, f"{column_type(storage)}_cosine_ops"
+
+
+def index_column_type(storage: str, dimensions: int, index_dimensions: Optional[int] = None) -> str:
+    """Type of the indexed value, as reported by format_type for the index column."""
+    if storage == "binary":
+        return f"bit({dimensions})"
+    return f"{column_type(storage)}({index_dimensions or dimensions})"
+
+
+def create_index_query(
+    kind: str,
+    options: dict,
+    storage: str,
+    table_name: str,
+    index_name: str,
+    dimensions: int,
+    concurrently: bool = False,
+    index_dimensions: Optional[int] = None,
+    where: Optional[str] = None,
+) -> str:
+    """
+    Build the CREATE INDEX statement of the embedding index.
+
+    Args:
+        kind: Index type ("ivfflat", "hnsw" or "diskann")
+        options: Index storage parameters
+        storage: Storage mode of the embedding column
+        table_name: Table to index
+        index_name: Name of the new index
+        dimensions: Embedding dimensions
+        concurrently: Build without blocking writes
+        index_dimensions: Index only this many leading dimensions
+        where: Condition of a partial index
+
+    Returns:
+        The SQL statement
+    """
+    if kind == "diskann" and storage != "vector":
+        raise ValueError("DiskANN indexes only support vector storage")
+    expression, opclass = index_target(storage, dimensions, index_dimensions)
+    if kind == "diskann":
+        # vectorscale's own default operator class is cosine
+        opclass = ""
+    with_clause = ""
+    if options:
+        with_clause = " WITH (" + ", ".join(f"{key} = {value}" for key, value in options.items()) + ")"
+    return (
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}\"{index_name}\" "
+        f"ON \"{table_name}\" USING {kind} ({expression} {opclass}){with_clause}"
+        + (f" WHERE {where}" if where else "")
+    )
+
+
+def reranks(storage: str, index_dimensions: Optional[int] = None) -> bool:
+    """Whether searches fetch rerank_factor candidates per result from the index (see search_query)."""
+    return storage == "binary" or bool(index_dimensions)
+
+
+def search_query(
+    table_name: str,
+    dimensions: int,
+    storage: str,
+    limit: int,
+    where: str = "TRUE",
+    rerank_factor: int = 4,
+    index_dimensions: Optional[int] = None,
+    columns: Sequence[str] = SEARCH_COLUMNS,
+) -> str:
+    """
+    Build a nearest-neighbour query by cosine distance.
+
+    The query embedding is parameter $1 and filters use the following $n
+    parameters, as produced by timescale_vector's query builder. Rows have
+    the RESULT_COLUMNS shape, with only the requested columns filled in (see
+    select_list); by default everything but the embedding.
+
+    With binary storage, limit * rerank_factor candidates are fetched by
+    Hamming distance through the quantized index and re-ranked by their
+    full-precision cosine distance. With index_dimensions they are fetched
+    by the cosine distance of the leading dimensions instead.
+
+    Args:
+        table_name: Vector table
+        dimensions: Embedding dimensions
+        storage: Storage mode of the embedding column
+        limit: Number of results
+        where: SQL condition restricting the searched rows
+        rerank_factor: Candidates fetched per result before re-ranking
+        index_dimensions: Leading dimensions covered by the index
+        columns: Result columns to return
+
+    Returns:
+        The SQL query
+    """
+    query_vector = f"$1::{column_type(storage)}({dimensions})"
+    select = select_list(columns, f"embedding <=> {query_vector}")
+    if not reranks(storage, index_dimensions):
+        order_by = None
+    elif storage == "binary":
+        order_by = (
+            f"(binary_quantize(embedding)::bit({dimensions})) <~> binary_quantize({query_vector})"
+        )
+    elif index_dimensions:
+        order_by = (
+            f"{prefix('embedding', storage, index_dimensions)} "
+            f"<=> {prefix(query_vector, storage, index_dimensions)}"
+        )
+    if order_by:
+        return f"""WITH candidates AS (
+            SELECT id, metadata, contents, embedding FROM "{table_name}"
+            WHERE {where}
+            ORDER BY {order_by}
+            LIMIT {int(limit) * int(rerank_factor)}
+        )
+        SELECT {select}
+        FROM candidates ORDER BY distance LIMIT {int(limit)}"""
+    return f"""SELECT {select}
+        FROM "{table_name}" WHERE {where}
+        ORDER BY distance LIMIT {int(limit)}"""
+
+
+def text_search_terms(query: Union[str, List[str]]) -> str:
+    """
+    Turn a search query into websearch_to_tsquery input matching any of its terms.
+
+    Ingredient lists match any ingredient (each one as a phrase of its
+    words), and free text any of its words, so that rare exact terms such
+    as "gochujang" can surface recipes on their own.
+    """
+    terms = query if isinstance(query, list) else re.findall(r"[^\W_]+", query)
+    phrases = (term.replace('"', " ").strip() for term in terms)
+    return " or ".join(f'"{phrase}"' for phrase in phrases if phrase)
+
+
+def hybrid_search_query(
+    table_name: str,
+    dimensions: int,
+    storage: str,
+    limit: int,
+    candidates: int,
+    where: str = "TRUE",
+    rerank_factor: int = 4,
+    index_dimensions: Optional[int] = None,
+    columns: Sequence[str] = SEARCH_COLUMNS,
+    rrf_k: int = 60,
+) -> str:
+    """
+    Build a hybrid full-text and vector query fused by reciprocal rank fusion.
+
+    The nearest candidates by embedding (the same query as search_query) and
+    the best candidates by full-text rank on the contents_tsv column (GIN
+    index) are retrieved in one statement, and every row is scored by
+    sum(1 / (rrf_k + rank)) over the lists it appears in. The query
+    embedding is parameter $1, the websearch_to_tsquery text $2, and filters
+    use the following $n parameters.
+
+    Args:
+        table_name: Vector table
+        dimensions: Embedding dimensions
+        storage: Storage mode of the embedding column
+        limit: Number of results
+        candidates: Candidates retrieved by each of the two searches
+        where: SQL condition restricting the searched rows
+        rerank_factor: Candidates fetched per result by the compact storage modes
+        index_dimensions: Leading dimensions covered by the index
+        columns: Result columns to return
+        rrf_k: Rank offset of reciprocal rank fusion, damping the top ranks
+
+    Returns:
+        The SQL query, returning rows like search_query ordered by fused score
+    """
+    semantic = search_query(
+        table_name,
+        dimensions,
+        storage,
+        candidates,
+        where=where,
+        rerank_factor=rerank_factor,
+        index_dimensions=index_dimensions,
+        columns=("id",),
+    )
+    query_vector = f"$1::{column_type(storage)}({dimensions})"
+    return f"""WITH semantic AS (
+            SELECT id, row_number() OVER (ORDER BY distance) AS rank FROM ({semantic}) s
+        ),
+        lexical AS (
+            SELECT id, row_number() OVER (ORDER BY score DESC) AS rank FROM (
+                SELECT id, ts_rank_cd(contents_tsv, text_query) AS score
+                FROM "{table_name}", websearch_to_tsquery('{TEXT_SEARCH_CONFIG}', $2) AS text_query
+                WHERE contents_tsv @@ text_query AND {where}
+                ORDER BY score DESC LIMIT {int(candidates)}
+            ) l
+        ),
+        fused AS (
+            SELECT id, sum(1.0 / ({int(rrf_k)} + rank)) AS score
+            FROM (SELECT id, rank FROM semantic UNION ALL SELECT id, rank FROM lexical) ranked
+            GROUP BY id ORDER BY score DESC LIMIT {int(limit)}
+        )
+        SELECT {select_list(columns, f"t.embedding <=> {query_vector}", alias="t.")}
+        FROM fused JOIN "{table_name}" t ON t.id = fused.id
+        ORDER BY fused.score DESC"""
+
+
+def numbered_query(query: str, params: dict) -> Tuple[str, list]:
+    """
+    Convert a query with %(name)s parameters to $n placeholders, for asyncpg.
+
+    Args:
+        query: SQL query with named pyformat parameters
+        params: Values of the named parameters
+
+    Returns:
+        (query with $n placeholders, positional parameters)
+    """
+    names: List[str] = []
+
+    def placeholder(match: re.Match) -> str:
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
+
+    return re.sub(r"%\((\w+)\)s", placeholder, query), [params[name] for name in names]
+
+
+def sample_query(table_name: str, where: str = "TRUE") -> str:
+    """
+    Build a query sampling random rows through the random_key index.
+
+    Each random key in the array parameter %(keys)s picks the first row at or
+    after it in random_key order, one index probe per key instead of sorting
+    the whole table by random(). Keys landing on the same row return it once,
+    and keys beyond the largest random_key return nothing, so callers ask for
+    a few more keys than rows.
+
+    Args:
+        table_name: Table with a random_key column
+        where: SQL condition restricting the sampled rows
+
+    Returns:
+        The SQL query, returning the contents of the sampled rows in random order
+    """
+    return f"""SELECT contents FROM (
+            SELECT DISTINCT ON (r.id) r.contents, k.key
+            FROM unnest(%(keys)s::float8[]) AS k(key)
+            CROSS JOIN LATERAL (
+                SELECT id, contents FROM "{table_name}"
+                WHERE {where} AND random_key >= k.key
+                ORDER BY random_key LIMIT 1
+            ) r
+            ORDER BY r.id
+        ) sampled
+        ORDER BY key"""
+
+
+def clusters_table_name(table_name: str) -> str:
+    """Name of the centroid table of a vector table's clusters (see RecipeClusters)."""
+    return f"{table_name}_clusters"
+
+
+def cluster_sample_query(table_name: str, clusters_table: str, where: str = "TRUE") -> str:
+    """
+    Build a query drawing random rows from distinct random clusters.
+
+    %(clusters)s clusters are picked at random from the small centroid table,
+    then %(per_cluster)s rows of each are read from the (cluster_id,
+    random_key) index, starting at a random key and wrapping around to the
+    start of the cluster when fewer rows follow it. The wrapped part stops
+    before the start key, so a cluster with fewer rows than %(per_cluster)s
+    returns each of them once.
+
+    Args:
+        table_name: Table with cluster_id and random_key columns
+        clusters_table: Centroid table of the clusters
+        where: SQL condition restricting the sampled rows
+
+    Returns:
+        The SQL query, returning (cluster_id, contents) rows
+    """
+    rows = f"""SELECT contents FROM "{table_name}"
+                WHERE cluster_id = c.cluster_id AND {where}"""
+    return f"""SELECT c.cluster_id, r.contents FROM (
+            SELECT cluster_id, random() AS key FROM "{clusters_table}"
+            WHERE size > 0 ORDER BY random() LIMIT %(clusters)s
+        ) c
+        CROSS JOIN LATERAL (
+            ({rows} AND random_key >= c.key ORDER BY random_key LIMIT %(per_cluster)s)
+            UNION ALL
+            ({rows} AND random_key < c.key ORDER BY random_key LIMIT %(per_cluster)s)
+            LIMIT %(per_cluster)s
+        ) r"""
@@ -1,32 +1,110 @@
+import json
 import logging
+import re
 import time
-from typing import Any, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 from datetime import datetime
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
-from mealprep.config.settings import get_settings
-from openai import OpenAI
+from mealprep.config.settings import get_settings, get_vector_table_name
+from mealprep.db.bulk_loader import BulkLoader
+from mealprep.db.local_index import MmapVectorIndex, replace_directory
+from mealprep.db.index_tuning import index_options, query_params
+from mealprep.db.search_queries import (
+    RESULT_COLUMNS,
+    TEXT_SEARCH_CONFIG,
+    column_type,
+    create_index_query,
+    diet_column,
+    hybrid_search_query,
+    index_column_type,
+    reranks,
+    result_columns,
+    search_query,
+    text_search_terms,
+)
+from mealprep.helpers.mmr import mmr_select
+from mealprep.helpers.utils import DIET_MEMBERS, diet_metadata, get_classifier
+from mealprep.llm.embeddings import EmbeddingProvider, get_embedding_provider
+from mealprep.db.embedding_cache import (
+    EmbeddingCache,
+    QueryEmbeddingCache,
+    cache_key,
+    canonical_query,
+    query_text,
+)
 from timescale_vector import client
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
+
+# Conservative characters-per-token ratio used to size embedding requests
+CHARS_PER_TOKEN = 3
+
+# First pgvector version with halfvec and binary_quantize
+COMPACT_STORAGE_PGVECTOR = (0, 7, 0)
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text without a tokenizer."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def diet_filter(diet: str, metadata_filter: Union[dict, List[dict], None]) -> List[dict]:
+    """Combine a diet with a metadata filter into an equivalent metadata filter."""
+    patterns = metadata_filter if isinstance(metadata_filter, list) else [metadata_filter or {}]
+    return [
+        {**pattern, "diet_pref": diet_pref}
+        for pattern in patterns
+        for diet_pref in DIET_MEMBERS[diet]
+    ]
+
+
+class SearchHit(NamedTuple):
+    """One search result; the columns that were not requested are None."""
+
+    id: Optional[str]
+    metadata: Optional[dict]
+    contents: Optional[str]
+    embedding: Optional[np.ndarray]
+    distance: float
 
 
 class VectorStore:
     """A class for managing vector operations and database interactions."""
 
     def __init__(self):
-        """Initialize the VectorStore with settings, OpenAI client, and Timescale Vector client."""
+        """Initialize the VectorStore with settings, embedding provider, and Timescale Vector client."""
         self.settings = get_settings()
 
-        self.openai_client = OpenAI(api_key=self.settings.openai.api_key)
-        self.embedding_model = self.settings.openai.embedding_model
+        self.embedding_provider = get_embedding_provider(self.settings)
+        self.embedding_model = self.embedding_provider.model
         self.vector_settings = self.settings.vector_store
+        self.table_name, self.dimensions = self._table_for_provider()
+        cache_settings = self.settings.embedding_cache
+        self.embedding_cache = (
+            EmbeddingCache(cache_settings.path, cache_settings.max_entries)
+            if cache_settings.enabled and self.embedding_provider.cacheable
+            else None
+        )
+        self.query_cache = QueryEmbeddingCache(
+            cache_settings.query_cache_size, cache_settings.query_cache_ttl_seconds
+        )
         self.vec_client = client.Sync(
             self.settings.database.service_url,
-            self.vector_settings.table_name,
-            self.vector_settings.embedding_dimensions,
+            self.table_name,
+            self.dimensions,
             # time_partition_interval=self.vector_settings.time_partition_interval,
             time_partition_interval=None,
         )
+        # Embedding index description, read lazily by index_info
+        self._index_info: Optional[dict] = None
+        self._index_loaded = False
+        self._local_index: Optional[MmapVectorIndex] = None
+
+    def _table_for_provider(self) -> Tuple[str, int]:
+        """Resolve the vector table and its dimensions for the embedding provider."""
+        return get_vector_table_name(self.settings), self.embedding_provider.dimensions
 
     def get_embedding(self, text: str) -> List[float]:
         """
@@ -38,39 +116,596 @@ class VectorStore:
         Returns:
             A list of floats representing the embedding.
         """
+        return self.get_embeddings([text])[0]
+
+    def get_embeddings(
+        self,
+        texts: List[Union[str, List[str]]],
+        provider: Optional[EmbeddingProvider] = None,
+        before_request: Optional[Callable[[List[str]], None]] = None,
+    ) -> List[List[float]]:
+        """
+        Generate embeddings for many texts with as few API requests as possible.
+
+        Texts found in the embedding cache are not sent again, and identical
+        texts are only embedded once. The rest are packed into requests bounded
+        by the item and token limits from the OpenAI settings. Results are
+        returned in the same order as the input.
+
+        Args:
+            texts: The input texts (or ingredient lists) to embed.
+            provider: Provider to send the requests through instead of the
+                store's own, for the same model (e.g. with other client options).
+            before_request: Called with the texts of each request before it
+                is sent, e.g. to wait for rate-limit capacity; texts served
+                from the cache never reach it.
+
+        Returns:
+            A list of embeddings, one per input text.
+        """
+        provider = provider or self.embedding_provider
+        prepared = [self._prepare_text(text) for text in texts]
+        keys = [cache_key(self.embedding_model, text) for text in prepared]
+        cached = self.embedding_cache.get_many(keys) if self.embedding_cache else {}
+
+        # First position of every text that still needs an embedding
+        missing: dict = {}
+        for i, key in enumerate(keys):
+            if key not in cached:
+                missing.setdefault(key, i)
+        pending = list(missing.values())
+        pending_texts = [prepared[i] for i in pending]
+
+        start_time = time.time()
+        num_requests = 0
+        generated = {}
+        for batch in self.batch_indices(pending_texts):
+            request_texts = [pending_texts[i] for i in batch]
+            if before_request:
+                before_request(request_texts)
+            batch_embeddings = provider.embed(request_texts)
+            for i, embedding in zip(batch, batch_embeddings):
+                generated[keys[pending[i]]] = embedding
+            num_requests += 1
+        elapsed_time = time.time() - start_time
+        logging.info(
+            f"{len(generated)} embeddings generated in {elapsed_time:.3f} seconds "
+            f"({num_requests} requests, {len(prepared) - len(pending)} reused from the cache or the input)"
+        )
+
+        if self.embedding_cache:
+            self.embedding_cache.put_many(generated)
+        cached.update(generated)
+        return [cached[key] for key in keys]
+
+    def embed_queries(self, queries: List[Union[str, List[str]]]) -> List[List[float]]:
+        """
+        Embed search queries through the in-process query cache.
+
+        Queries are cached under their canonical form (see canonical_query),
+        so ingredient lists that only differ in case, order, plurals or
+        duplicates share one embedding. Queries not in the cache are embedded
+        in one batch, as their query_text.
+
+        Args:
+            queries: Free-text queries or ingredient lists.
+
+        Returns:
+            A list of embeddings, one per query.
+        """
+        canonical = [canonical_query(query) for query in queries]
+        embeddings = [self.query_cache.get(query) for query in canonical]
+        # The text of the first query with each missing key is embedded
+        missing: Dict[str, str] = {}
+        for query, key, embedding in zip(queries, canonical, embeddings):
+            if embedding is None:
+                missing.setdefault(key, query_text(query))
+        if missing:
+            generated = dict(zip(missing, self.get_embeddings(list(missing.values()))))
+            for query, embedding in generated.items():
+                self.query_cache.put(query, embedding)
+            embeddings = [e if e is not None else generated[q] for q, e in zip(canonical, embeddings)]
+        return embeddings
+
+    def cache_stats(self) -> dict:
+        """Return hit rates of the query cache and the persistent embedding cache."""
+        return {
+            "query": self.query_cache.stats(),
+            "embedding": self.embedding_cache.stats() if self.embedding_cache else None,
+        }
+
+    def _prepare_text(self, text: Union[str, List[str]]) -> str:
+        """Normalize an input for the embeddings endpoint."""
         # Handle both strings and lists
         if isinstance(text, list):
             text = ", ".join(text)
         text = text.replace("\n", " ")
-        start_time = time.time()
-        embedding = (
-            self.openai_client.embeddings.create(
-                input=[text],
-                model=self.embedding_model,
+        max_chars = self.settings.openai.embedding_max_input_tokens * CHARS_PER_TOKEN
+        if len(text) > max_chars:
+            logging.warning(
+                f"Truncating embedding input from {len(text)} to {max_chars} characters"
             )
-            .data[0]
-            .embedding
-        )
-        elapsed_time = time.time() - start_time
-        logging.info(f"Embedding generated in {elapsed_time:.3f} seconds")
-        return embedding
+            text = text[:max_chars]
+        return text
+
+    def batch_indices(self, texts: List[str]) -> Iterator[List[int]]:
+        """
+        Split texts into request-sized batches of input positions.
+
+        Token counts are estimated from the text length, which keeps batching
+        free of a tokenizer dependency while staying under the API limits.
+        """
+        max_items = self.settings.openai.embedding_batch_size
+        max_tokens = self.settings.openai.embedding_batch_max_tokens
+
+        batch: List[int] = []
+        batch_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(i)
+            batch_tokens += tokens
+        if batch:
+            yield batch
 
     def create_tables(self) -> None:
         """Create the necessary tablesin the database"""
         self.vec_client.create_tables()
+        self.create_diet_columns()
+        self.create_random_key()
+        self.create_text_search()
+        if self.storage_type() != column_type(self.vector_settings.storage):
+            if self.count_rows(exact=True):
+                raise RuntimeError(
+                    f"{self.table_name}.embedding is stored as {self.storage_type()}, "
+                    f"run VectorStore.migrate_storage() to switch to "
+                    f"{self.vector_settings.storage} storage"
+                )
+            self.migrate_storage()
+
+    def create_diet_columns(self) -> None:
+        """
+        Add the typed diet columns, generated from the metadata written at ingest.
+
+        diet_pref holds the recipe's classification and is_vegan, is_vegetarian
+        and is_pescetarian whether it fits each diet, so that filtered searches
+        can use plain boolean conditions and the partial indexes built on them.
+        """
+        columns = [("diet_pref", "text", "metadata->>'diet_pref'")] + [
+            (
+                diet_column(diet),
+                "boolean",
+                "metadata->>'diet_pref' IN ({})".format(", ".join(f"'{m}'" for m in members)),
+            )
+            for diet, members in DIET_MEMBERS.items()
+        ]
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                for name, column_type, expression in columns:
+                    cursor.execute(
+                        f"""ALTER TABLE "{self.table_name}" ADD COLUMN IF NOT EXISTS {name}
+                        {column_type} GENERATED ALWAYS AS ({expression}) STORED"""
+                    )
+
+    def create_random_key(self) -> None:
+        """
+        Add the random_key column and its indexes, used to sample random recipes.
+
+        Every row gets a uniform random key when it is inserted (existing rows
+        once, when the column is added). Sampling probes the index at random
+        positions instead of sorting the table by random(); the partial
+        indexes do the same within each diet.
+        """
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""ALTER TABLE "{self.table_name}" ADD COLUMN IF NOT EXISTS random_key
+                    double precision NOT NULL DEFAULT random()"""
+                )
+                cursor.execute(
+                    f"""CREATE INDEX IF NOT EXISTS "{self.table_name}_random_key_idx"
+                    ON "{self.table_name}" (random_key)"""
+                )
+                for diet in DIET_MEMBERS:
+                    cursor.execute(
+                        f"""CREATE INDEX IF NOT EXISTS "{self.table_name}_random_key_{diet}_idx"
+                        ON "{self.table_name}" (random_key) WHERE {diet_column(diet)}"""
+                    )
+
+    def create_text_search(self) -> None:
+        """
+        Add the contents_tsv column and its GIN index, used by hybrid search.
+
+        The column holds the stemmed lexemes of the contents, generated on
+        insert, so that exact ingredient and dish names can be matched by
+        full-text search next to the embedding search.
+        """
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"""ALTER TABLE "{self.table_name}" ADD COLUMN IF NOT EXISTS contents_tsv
+                    tsvector GENERATED ALWAYS AS
+                    (to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(contents, ''))) STORED"""
+                )
+                cursor.execute(
+                    f"""CREATE INDEX IF NOT EXISTS "{self.table_name}_contents_tsv_idx"
+                    ON "{self.table_name}" USING gin (contents_tsv)"""
+                )
+
+    def backfill_diets(self, batch_size: int = 10_000) -> int:
+        """
+        Classify the stored recipes whose metadata has no diet yet.
+
+        Recipes loaded before the diet was written to the metadata only carry
+        it in their contents. Their title and ingredients are read back from
+        the contents and classified again, which also restores the individual
+        dietary flags, and the generated diet columns follow.
+
+        Args:
+            batch_size: Number of recipes updated per transaction
+
+        Returns:
+            Number of recipes updated
+        """
+        classifier = get_classifier()
+        updated = 0
+        last_id = None
+        start_time = time.time()
+        while True:
+            with self.vec_client.connect() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""SELECT id, contents FROM "{self.table_name}"
+                        WHERE NOT metadata ? 'diet_pref' AND (%s::uuid IS NULL OR id > %s::uuid)
+                        ORDER BY id LIMIT %s""",
+                        (last_id, last_id, batch_size),
+                    )
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    df = pd.DataFrame(rows, columns=["id", "contents"])
+                    df["title"] = df["contents"].str.extract(r"^Title: (.*)$", flags=re.M)[0]
+                    df["ingredients"] = df["contents"].str.extract(
+                        r"^Ingredients: (.*)$", flags=re.M
+                    )[0]
+                    df = classifier.classify(df.fillna({"title": "", "ingredients": ""}))
+                    execute_values(
+                        cursor,
+                        f"""UPDATE "{self.table_name}" AS t
+                        SET metadata = coalesce(t.metadata, '{{}}'::jsonb) || v.patch::jsonb
+                        FROM (VALUES %s) AS v(id, patch) WHERE t.id = v.id::uuid""",
+                        [
+                            (str(row.id), json.dumps(diet_metadata(row._asdict())))
+                            for row in df.itertuples(index=False)
+                        ],
+                    )
+            updated += len(rows)
+            last_id = str(rows[-1][0])
+            logging.info(f"Backfilled diets of {updated} recipes")
+        if updated:
+            # Row estimates of the diet columns decide between the partial indexes
+            with self.vec_client.connect() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(f'ANALYZE "{self.table_name}"')
+        logging.info(
+            f"Backfilled diets of {updated} recipes in {time.time() - start_time:.1f} seconds"
+        )
+        return updated
+
+    def storage_type(self) -> str:
+        """Return the Postgres type of the embedding column ("vector" or "halfvec")."""
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """SELECT t.typname FROM pg_attribute a JOIN pg_type t ON t.oid = a.atttypid
+                    WHERE a.attrelid = to_regclass(quote_ident(%s)) AND a.attname = 'embedding'""",
+                    (self.table_name,),
+                )
+                return cursor.fetchone()[0]
+
+    def pgvector_version(self) -> Tuple[int, ...]:
+        """Return the version of the installed pgvector extension, e.g. (0, 7, 4)."""
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+                row = cursor.fetchone()
+        if row is None:
+            return ()
+        return tuple(int(part) for part in row[0].split(".") if part.isdigit())
+
+    def migrate_storage(self) -> None:
+        """
+        Convert the embedding column and index to the configured vector storage.
+
+        Switching between vector and halfvec rewrites the table (converting
+        to halfvec loses precision, converting back does not restore it), and
+        binary storage only needs its quantized index. The embedding index is
+        dropped first and rebuilt for the new storage afterwards.
+
+        Raises:
+            RuntimeError: If a compact storage mode is configured and pgvector
+                is older than 0.7
+        """
+        storage = self.vector_settings.storage
+        if storage != "vector" and self.pgvector_version() < COMPACT_STORAGE_PGVECTOR:
+            raise RuntimeError(
+                f"{storage} storage needs pgvector "
+                f"{'.'.join(map(str, COMPACT_STORAGE_PGVECTOR))} or later"
+            )
+        target = column_type(storage)
+        start_time = time.time()
+        self.drop_index()
+        if self.storage_type() != target:
+            with self.vec_client.connect() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        f"""ALTER TABLE "{self.table_name}" ALTER COLUMN embedding
+                        TYPE {target}({self.dimensions}) USING embedding::{target}({self.dimensions})"""
+                    )
+        if self.count_rows(exact=True):
+            self.create_index()
+        logging.info(
+            f"Migrated {self.table_name} to {storage} storage "
+            f"in {time.time() - start_time:.1f} seconds"
+        )
+
+    @property
+    def index_name(self) -> str:
+        """Name timescale_vector gives the embedding index."""
+        return f"{self.table_name}_embedding_idx"
+
+    def diet_index_name(self, diet: str) -> str:
+        """Name of the partial embedding index over the recipes fitting a diet."""
+        return f"{self.index_name}_{diet}"
+
+    def count_rows(self, exact: bool = False, diet: Optional[str] = None) -> int:
+        """
+        Count the rows of the vector table.
+
+        Args:
+            exact: Run count(*) instead of reading the planner estimate, which
+                is only refreshed by VACUUM/ANALYZE
+            diet: Only count the recipes fitting this diet (always exact)
+
+        Returns:
+            Number of rows
+        """
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                if diet:
+                    cursor.execute(
+                        f'SELECT count(*) FROM "{self.table_name}" WHERE {diet_column(diet)}'
+                    )
+                    return cursor.fetchone()[0]
+                if not exact:
+                    cursor.execute(
+                        "SELECT reltuples::bigint FROM pg_class"
+                        " WHERE oid = to_regclass(quote_ident(%s))",
+                        (self.table_name,),
+                    )
+                    row = cursor.fetchone()
+                    if row and row[0] >= 0:
+                        return row[0]
+                cursor.execute(f'SELECT count(*) FROM "{self.table_name}"')
+                return cursor.fetchone()[0]
+
+    def index_info(self, refresh: bool = False) -> Optional[dict]:
+        """
+        Describe the current embedding index.
+
+        Args:
+            refresh: Read it from the database instead of the cached value
+
+        Returns:
+            {"kind": ..., "options": {...}, "column_type": ...} or None if
+            there is no index; column_type is the type of the indexed values
+        """
+        if refresh or not self._index_loaded:
+            self._index_info = self._describe_index(self.index_name)
+            self._index_loaded = True
+        return self._index_info
+
+    def _describe_index(self, index_name: str) -> Optional[dict]:
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """SELECT am.amname, c.reloptions, format_type(a.atttypid, a.atttypmod)
+                    FROM pg_class c
+                    JOIN pg_am am ON am.oid = c.relam
+                    JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum = 1
+                    WHERE c.oid = to_regclass(quote_ident(%s))""",
+                    (index_name,),
+                )
+                row = cursor.fetchone()
+        if not row:
+            return None
+        options = dict(option.split("=", 1) for option in row[1] or [])
+        return {"kind": row[0], "options": options, "column_type": row[2]}
+
+    def plan_index(self, num_rows: Optional[int] = None) -> Tuple[str, dict]:
+        """
+        Choose the index type and parameters for the current table size.
+
+        Parameters set explicitly in the index settings win over the sized ones.
+
+        Args:
+            num_rows: Row count to size for (defaults to the table's)
+
+        Returns:
+            (index type, index parameters)
+        """
+        index_settings = self.settings.index
+        if num_rows is None:
+            num_rows = self.count_rows(exact=True)
+        options = index_options(index_settings.kind, num_rows)
+        overrides = {
+            "lists": index_settings.ivfflat_lists,
+            "m": index_settings.hnsw_m,
+            "ef_construction": index_settings.hnsw_ef_construction,
+        }
+        options.update(
+            {key: value for key, value in overrides.items() if key in options and value}
+        )
+        return index_settings.kind, options
+
+    def create_index(self, num_rows: Optional[int] = None, diet: Optional[str] = None) -> None:
+        """
+        Build the embedding index configured in the index settings.
+
+        Build it after bulk loading: ivfflat trains its lists on the rows present
+        at build time, and all index types load far faster without one.
+
+        Args:
+            num_rows: Row count to size the index for (defaults to the table's)
+            diet: Build the partial index over the recipes fitting this diet
+        """
+        if num_rows is None and diet:
+            num_rows = self.count_rows(diet=diet)
+        kind, options = self.plan_index(num_rows)
+        index_name = self.diet_index_name(diet) if diet else self.index_name
+        start_time = time.time()
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(self._create_index_query(kind, options, index_name, diet=diet))
+        self._index_info = None
+        self._index_loaded = False
+        logging.info(
+            f"Created {kind} index {options} on {self.table_name}"
+            f"{f' for {diet} recipes' if diet else ''} in {time.time() - start_time:.1f} seconds"
+        )
+
+    def rebuild_index(self, num_rows: Optional[int] = None, diet: Optional[str] = None) -> None:
+        """
+        Rebuild the embedding index without blocking reads or writes.
+
+        A new index is built with CREATE INDEX CONCURRENTLY under a temporary
+        name while the old one keeps serving queries, then swapped in with a
+        short transaction.
+
+        Args:
+            num_rows: Row count to size the index for (defaults to the table's)
+            diet: Rebuild the partial index over the recipes fitting this diet
+        """
+        if num_rows is None and diet:
+            num_rows = self.count_rows(diet=diet)
+        kind, options = self.plan_index(num_rows)
+        index_name = self.diet_index_name(diet) if diet else self.index_name
+        new_name = f"{index_name}_new"
+        query = self._create_index_query(kind, options, new_name, concurrently=True, diet=diet)
+
+        start_time = time.time()
+        with self.vec_client.connect() as conn:
+            # CONCURRENTLY cannot run inside a transaction block
+            conn.commit()
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cursor:
+                    # Leftover of an interrupted rebuild (invalid index)
+                    cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{new_name}"')
+                    cursor.execute(query)
+            finally:
+                conn.autocommit = False
+            with conn.cursor() as cursor:
+                cursor.execute(f'DROP INDEX IF EXISTS "{index_name}"')
+                cursor.execute(f'ALTER INDEX "{new_name}" RENAME TO "{index_name}"')
+        self._index_info = None
+        self._index_loaded = False
+        logging.info(
+            f"Rebuilt {kind} index {options} on {self.table_name}"
+            f"{f' for {diet} recipes' if diet else ''} in {time.time() - start_time:.1f} seconds"
+        )
+
+    def _create_index_query(
+        self,
+        kind: str,
+        options: dict,
+        index_name: str,
+        concurrently: bool = False,
+        diet: Optional[str] = None,
+    ) -> str:
+        return create_index_query(
+            kind,
+            options,
+            self.vector_settings.storage,
+            self.table_name,
+            index_name,
+            self.dimensions,
+            concurrently=concurrently,
+            index_dimensions=self.vector_settings.index_dimensions,
+            where=diet_column(diet) if diet else None,
+        )
+
+    def ensure_index(self) -> None:
+        """
+        Create the embedding index, or rebuild it if it no longer fits the data.
+
+        Meant to run after every load: the index is rebuilt concurrently when
+        its type, parameters or indexed vectors (storage mode, truncated
+        dimensions) differ from what the settings and current row count call
+        for, and left alone otherwise. The partial indexes of the diets listed
+        in the index settings are maintained the same way.
+        """
+        self._ensure_index()
+        for diet in self.settings.index.diet_indexes:
+            self._ensure_index(diet)
 
-    def create_index(self) -> None:
-        """Create the StreamingDiskANN index to spseed up similarity search"""
-        self.vec_client.create_embedding_index(client.DiskAnnIndex())
+    def _ensure_index(self, diet: Optional[str] = None) -> None:
+        index_name = self.diet_index_name(diet) if diet else self.index_name
+        num_rows = self.count_rows(exact=True, diet=diet)
+        if diet and not num_rows:
+            logging.info(f"No {diet} recipes in {self.table_name}, skipping their index")
+            return
+        current = self._describe_index(index_name)
+        if current is None:
+            self.create_index(num_rows, diet=diet)
+            return
+        kind, options = self.plan_index(num_rows)
+        planned = {key: str(value) for key, value in options.items()}
+        indexed_type = index_column_type(
+            self.vector_settings.storage, self.dimensions, self.vector_settings.index_dimensions
+        )
+        if (
+            current["kind"] != kind
+            or current["column_type"] != indexed_type
+            or any(current["options"].get(key) != value for key, value in planned.items())
+        ):
+            self.rebuild_index(num_rows, diet=diet)
+        else:
+            logging.info(f"{kind} index {index_name} is up to date")
 
     def drop_index(self) -> None:
-        """Drop the StreamingDiskANN index in the database"""
+        """Drop the embedding index and the partial indexes of every diet."""
         self.vec_client.drop_embedding_index()
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                for diet in DIET_MEMBERS:
+                    cursor.execute(f'DROP INDEX IF EXISTS "{self.diet_index_name(diet)}"')
+        self._index_info = None
+
+    def _query_params(self, limit: int) -> Optional[client.QueryParams]:
+        """Search parameters for the current index, from the index settings."""
+        info = self.index_info()
+        if info is None:
+            return None
+        index_settings = self.settings.index
+        return query_params(
+            info["kind"],
+            info["options"],
+            limit,
+            probes=index_settings.ivfflat_probes,
+            ef_search=index_settings.hnsw_ef_search,
+            search_list_size=index_settings.diskann_search_list_size,
+            rescore=index_settings.diskann_rescore,
+        )
 
     def upsert(self, df: pd.DataFrame) -> None:
         """
         Insert or update records in the database from a pandas DataFrame.
 
+        Meant for small writes; use bulk_load for large loads.
+
         Args:
             df: A pandas DataFrame containing the data to insert or update.
                 Expected columns: id, metadata, contents, embedding
@@ -78,17 +713,62 @@ class VectorStore:
         records = df.to_records(index=False)
         self.vec_client.upsert(list(records))
         logging.info(
-            f"Inserted {len(df)} records into {self.vector_settings.table_name}"
+            f"Inserted {len(df)} records into {self.table_name}"
+        )
+
+    def bulk_loader(self) -> BulkLoader:
+        """Create a binary COPY loader for the vector table."""
+        return BulkLoader(
+            self.vec_client,
+            self.table_name,
+            self.dimensions,
+            vector_type=column_type(self.vector_settings.storage),
         )
 
+    def bulk_load(self, df: pd.DataFrame) -> None:
+        """
+        Insert new records with binary COPY, for loads too large for upsert.
+
+        Args:
+            df: A pandas DataFrame containing the data to insert.
+                Expected columns: id, metadata, contents, embedding
+                The ids must not be stored yet.
+        """
+        self.bulk_loader().copy(df)
+
+    def existing_ids(self, ids: List[str], table_name: str = None) -> set[str]:
+        """
+        Return which of the given record IDs are already stored.
+
+        Args:
+            ids: Record IDs to look up.
+            table_name: Table to look in (defaults to the vector table).
+
+        Returns:
+            The subset of ids present in the table.
+        """
+        if not ids:
+            return set()
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT id::text FROM {table_name or self.table_name} WHERE id = ANY(%s::uuid[])",
+                    (list(ids),),
+                )
+                return {row[0] for row in cursor.fetchall()}
+
     def search(
         self,
-        query_text: str,
+        query_text: Union[str, List[str]],
         limit: int = 5,
         metadata_filter: Union[dict, List[dict]] = None,
         predicates: Optional[client.Predicates] = None,
         return_dataframe: bool = True,
-    ) -> Union[List[Tuple[Any, ...]], pd.DataFrame]:
+        diet: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        hybrid: bool = False,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Union[List[SearchHit], pd.DataFrame]:
         """
         Query the vector database for similar embeddings based on input text.
 
@@ -96,7 +776,7 @@ class VectorStore:
             https://github.com/timescale/docs/blob/latest/ai/python-interface-for-pgvector-and-timescale-vector.md
 
         Args:
-            query_text: The input text to search for.
+            query_text: The input text (or ingredient list) to search for.
             limit: The maximum number of results to return.
             metadata_filter: A dictionary or list of dictionaries for equality-based metadata filtering.
             predicates: A Predicates object for complex metadata filtering.
@@ -104,16 +784,38 @@ class VectorStore:
                 - Operators: ==, !=, >, >=, <, <=
                 - & is used to combine multiple predicates with AND operator.
                 - | is used to combine multiple predicates with OR operator.
-            return_dataframe: Whether to return results as a DataFrame (default: True).
+            return_dataframe: Whether to return results as a DataFrame (default: True)
+                or as SearchHit rows.
+            diet: Only return recipes fitting this diet ("vegan", "vegetarian"
+                or "pescetarian"), using its partial index if there is one.
+            mmr_lambda: Re-rank limit * mmr_fetch_factor candidates by maximal
+                marginal relevance, trading relevance (1) for diversity (0),
+                so that the results are not near-duplicates of each other.
+            hybrid: Also match the words of query_text (or each ingredient)
+                by full-text search and fuse both rankings in one query, so
+                that rare exact terms are not lost in the embedding.
+            columns: Only fetch these of "id", "metadata", "contents",
+                "embedding" and "distance" (always returned); the others are
+                None in the rows and left out of the DataFrame. Defaults to
+                all. Embeddings make up most of a row, so leave them out
+                unless they are needed.
 
         Returns:
-            Either a list of tuples or a pandas DataFrame containing the search results.
+            Either a list of SearchHit rows or a pandas DataFrame containing the search results.
 
         Basic Examples:
             Basic search:
                 vector_store.search("What are your shipping options?")
             Search with metadata filter:
                 vector_store.search("Shipping options", metadata_filter={"category": "Shipping"})
+            Search vegetarian recipes:
+                vector_store.search(["rice", "beans"], diet="vegetarian")
+            Search diverse recipes:
+                vector_store.search(["rice", "beans"], mmr_lambda=0.5)
+            Search matching exact ingredient names too:
+                vector_store.search(["tahini", "gochujang"], hybrid=True)
+            Fetch only the recipe texts, without building a DataFrame:
+                vector_store.search(["rice", "beans"], return_dataframe=False, columns=["contents"])
         
         Predicates Examples:
             Search with predicates:
@@ -127,8 +829,163 @@ class VectorStore:
             Search with time range:
                 vector_store.search("Recent updates", time_range=(datetime(2024, 1, 1), datetime(2024, 1, 31)))
         """
-        query_embedding = self.get_embedding(query_text)
+        query_embedding = self.embed_queries([query_text])[0]
+        return self._search_by_embedding(
+            query_embedding,
+            limit,
+            metadata_filter,
+            predicates,
+            return_dataframe,
+            diet,
+            mmr_lambda,
+            text_search_terms(query_text) if hybrid else None,
+            columns,
+        )
+
+    def search_many(
+        self,
+        query_texts: List[Union[str, List[str]]],
+        limit: int = 5,
+        metadata_filter: Union[dict, List[dict]] = None,
+        predicates: Optional[client.Predicates] = None,
+        return_dataframe: bool = True,
+        diet: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        hybrid: bool = False,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[Union[List[SearchHit], pd.DataFrame]]:
+        """
+        Run several similarity searches, embedding all queries in one batch.
+
+        Args:
+            query_texts: The input texts (or ingredient lists) to search for.
+            limit: The maximum number of results to return per query.
+            metadata_filter: A dictionary or list of dictionaries for equality-based metadata filtering.
+            predicates: A Predicates object for complex metadata filtering.
+            return_dataframe: Whether to return results as DataFrames (default: True)
+                or as SearchHit rows.
+            diet: Only return recipes fitting this diet.
+            mmr_lambda: Re-rank the results of each query for diversity (see search).
+            hybrid: Fuse full-text and vector search (see search).
+            columns: Result columns to fetch (see search).
 
+        Returns:
+            One result set per query, in the same order as query_texts.
+        """
+        query_embeddings = self.embed_queries(query_texts)
+        if self.vector_settings.engine == "mmap":
+            if hybrid:
+                logging.info("Hybrid search needs Postgres, the mmap engine searches by embedding only")
+            batch = self._search_local(
+                query_embeddings, self._fetch_limit(limit, mmr_lambda), metadata_filter, predicates, diet
+            )
+            return [
+                self._format_results(
+                    self._rerank(embedding, results, limit, mmr_lambda),
+                    return_dataframe,
+                    result_columns(columns),
+                )
+                for embedding, results in zip(query_embeddings, batch)
+            ]
+        return [
+            self._search_by_embedding(
+                embedding,
+                limit,
+                metadata_filter,
+                predicates,
+                return_dataframe,
+                diet,
+                mmr_lambda,
+                text_search_terms(query_text) if hybrid else None,
+                columns,
+            )
+            for query_text, embedding in zip(query_texts, query_embeddings)
+        ]
+
+    def _search_by_embedding(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        metadata_filter: Union[dict, List[dict]],
+        predicates: Optional[client.Predicates],
+        return_dataframe: bool,
+        diet: Optional[str] = None,
+        mmr_lambda: Optional[float] = None,
+        text_query: Optional[str] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> Union[List[SearchHit], pd.DataFrame]:
+        """
+        Query the vector database with an already computed embedding.
+
+        text_query is websearch_to_tsquery input (see text_search_terms) for
+        a hybrid search.
+        """
+        fetch_limit = self._fetch_limit(limit, mmr_lambda)
+        columns = result_columns(columns)
+        # Re-ranking for diversity needs the embeddings of the candidates
+        fetch_columns = columns + ("embedding",) if mmr_lambda is not None else columns
+        if self.vector_settings.engine == "mmap":
+            if text_query:
+                logging.info("Hybrid search needs Postgres, the mmap engine searches by embedding only")
+            [results] = self._search_local(
+                [query_embedding], fetch_limit, metadata_filter, predicates, diet
+            )
+        elif (
+            diet
+            or text_query
+            or self.vector_settings.storage != "vector"
+            or self.vector_settings.index_dimensions
+            or fetch_columns != RESULT_COLUMNS
+        ):
+            results = self._search_sql(
+                query_embedding,
+                fetch_limit,
+                metadata_filter,
+                predicates,
+                diet,
+                columns=fetch_columns,
+                text_query=text_query,
+            )
+        else:
+            results = self._search_timescale(query_embedding, fetch_limit, metadata_filter, predicates)
+        return self._format_results(
+            self._rerank(query_embedding, results, limit, mmr_lambda), return_dataframe, columns
+        )
+
+    def _fetch_limit(self, limit: int, mmr_lambda: Optional[float]) -> int:
+        """Number of candidates to fetch for limit results."""
+        if mmr_lambda is None:
+            return limit
+        return limit * self.vector_settings.mmr_fetch_factor
+
+    def _rerank(
+        self,
+        query_embedding: List[float],
+        results: List[Tuple[Any, ...]],
+        limit: int,
+        mmr_lambda: Optional[float],
+    ) -> List[Tuple[Any, ...]]:
+        """Re-rank over-fetched results by maximal marginal relevance."""
+        if mmr_lambda is None or len(results) <= 1:
+            return results[:limit]
+        embeddings = np.stack(
+            [
+                # pgvector returns NumPy arrays or Vector objects depending on its version
+                row[3].to_numpy() if hasattr(row[3], "to_numpy") else np.asarray(row[3])
+                for row in results
+            ]
+        )
+        selected = mmr_select(np.asarray(query_embedding), embeddings, limit, mmr_lambda)
+        return [results[position] for position in selected]
+
+    def _search_timescale(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        metadata_filter: Union[dict, List[dict]],
+        predicates: Optional[client.Predicates],
+    ) -> List[Tuple[Any, ...]]:
+        """Search through timescale_vector's query builder."""
         start_time = time.time()
 
         search_args = {
@@ -141,41 +998,271 @@ class VectorStore:
         if predicates:
             search_args["predicates"] = predicates
 
+        params = self._query_params(limit)
+        if params:
+            search_args["query_params"] = params
+
         results = self.vec_client.search(query_embedding, **search_args)
         elapsed_time = time.time() - start_time
 
         logging.info(f"Vector search completed in {elapsed_time:.3f} seconds")
+        return results
+
+    def build_search(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        metadata_filter: Union[dict, List[dict]],
+        predicates: Optional[client.Predicates],
+        diet: Optional[str] = None,
+        columns: Sequence[str] = RESULT_COLUMNS,
+        text_query: Optional[str] = None,
+    ) -> Tuple[List[str], str, List[Any]]:
+        """
+        Build the SQL search of the postgres engine.
+
+        Metadata filters and predicates are compiled by timescale_vector's
+        query builder, so they behave exactly as with its search. Filtered
+        searches use iterative index scans when enabled in the index
+        settings, so that a selective filter still returns limit results.
 
+        Args:
+            query_embedding: Query embedding
+            limit: Number of results
+            metadata_filter: Equality-based metadata filter
+            predicates: Predicates on the metadata
+            diet: Only return recipes fitting this diet
+            columns: Result columns to return
+            text_query: websearch_to_tsquery input of a hybrid search
+
+        Returns:
+            (SET LOCAL statements to run first, query with $n placeholders,
+            parameters), shared by the synchronous and asynchronous stores
+        """
+        params: List[Any] = [np.asarray(query_embedding, dtype=np.float32)]
+        if text_query:
+            params.append(text_query)
+        conditions = []
+        if metadata_filter:
+            where, params = self.vec_client.builder._where_clause_for_filter(params, metadata_filter)
+            conditions.append(where)
+        if predicates:
+            where, params = predicates.build_query(params)
+            conditions.append(where)
+        if diet:
+            conditions.append(diet_column(diet))
+        where = " AND ".join(conditions) or "TRUE"
+        if text_query:
+            candidates = max(self.vector_settings.hybrid_candidates, limit)
+            query = hybrid_search_query(
+                self.table_name,
+                self.dimensions,
+                self.vector_settings.storage,
+                limit,
+                candidates,
+                where=where,
+                rerank_factor=self.vector_settings.rerank_factor,
+                index_dimensions=self.vector_settings.index_dimensions,
+                columns=columns,
+                rrf_k=self.vector_settings.rrf_k,
+            )
+        else:
+            candidates = limit
+            query = search_query(
+                self.table_name,
+                self.dimensions,
+                self.vector_settings.storage,
+                limit,
+                where=where,
+                rerank_factor=self.vector_settings.rerank_factor,
+                index_dimensions=self.vector_settings.index_dimensions,
+                columns=columns,
+            )
+
+        if reranks(self.vector_settings.storage, self.vector_settings.index_dimensions):
+            # The index has to return every candidate that is re-ranked
+            candidates *= self.vector_settings.rerank_factor
+        query_params = self._query_params(candidates)
+        statements = query_params.get_statements() if query_params else []
+        iterative_scan = self.settings.index.iterative_scan
+        info = self.index_info()
+        if conditions and iterative_scan and info and info["kind"] in ("hnsw", "ivfflat"):
+            # pgvector 0.8+: keep scanning the index until enough rows pass the filter
+            statements.append(f"SET LOCAL {info['kind']}.iterative_scan = {iterative_scan}")
+        return statements, query, params
+
+    def _search_sql(
+        self,
+        query_embedding: List[float],
+        limit: int,
+        metadata_filter: Union[dict, List[dict]],
+        predicates: Optional[client.Predicates],
+        diet: Optional[str] = None,
+        columns: Sequence[str] = RESULT_COLUMNS,
+        text_query: Optional[str] = None,
+    ) -> List[Tuple[Any, ...]]:
+        """
+        Search with the queries of the compact storage modes and of truncated
+        index dimensions, which re-rank candidates from the index, with a
+        diet, which filters on its generated column, with a text_query,
+        which fuses full-text and vector search, or for only some of the
+        result columns, which are the only ones sent back.
+        """
+        start_time = time.time()
+        statements, query, params = self.build_search(
+            query_embedding, limit, metadata_filter, predicates, diet, columns, text_query
+        )
+        query, params = self.vec_client._translate_to_pyformat(query, params)
+        with self.vec_client.connect() as conn:
+            with conn.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(query, params)
+                results = cursor.fetchall()
+        logging.info(
+            f"{'Hybrid' if text_query else 'Vector'} search completed in "
+            f"{time.time() - start_time:.3f} seconds"
+        )
+        return results
+
+    def _format_results(
+        self,
+        results: List[Tuple[Any, ...]],
+        return_dataframe: bool,
+        columns: Sequence[str] = RESULT_COLUMNS,
+    ) -> Union[List[SearchHit], pd.DataFrame]:
         if return_dataframe:
-            return self._create_dataframe_from_results(results)
+            return self._create_dataframe_from_results(results, columns)
         else:
-            return results
+            return self._create_hits_from_results(results, columns)
+
+    def local_index(self) -> MmapVectorIndex:
+        """Open the memory-mapped index exported by export_local_index (once)."""
+        if self._local_index is None:
+            self._local_index = MmapVectorIndex(self.vector_settings.local_index_path)
+        return self._local_index
+
+    def _search_local(
+        self,
+        query_embeddings: List[List[float]],
+        limit: int,
+        metadata_filter: Union[dict, List[dict]],
+        predicates: Optional[client.Predicates],
+        diet: Optional[str] = None,
+    ) -> List[List[Tuple[Any, ...]]]:
+        """Search the memory-mapped index instead of Postgres."""
+        if predicates:
+            raise ValueError("Predicates are only supported by the postgres engine")
+        if diet:
+            metadata_filter = diet_filter(diet, metadata_filter)
+        return self.local_index().search(np.asarray(query_embeddings), limit, metadata_filter)
+
+    def export_local_index(self, directory: str = None, batch_size: int = 10_000) -> int:
+        """
+        Export the vector table into a memory-mapped index for the mmap engine.
+
+        Rows are streamed with a server-side cursor, and the new index only
+        replaces the previous one once it is complete. The row count and the
+        rows are read from the same REPEATABLE READ snapshot, so concurrent
+        writes cannot make them disagree.
+
+        Args:
+            directory: Target directory (defaults to local_index_path)
+            batch_size: Rows fetched per round trip
+
+        Returns:
+            Number of exported records
+        """
+        target = Path(directory or self.vector_settings.local_index_path)
+        staging = target.with_name(target.name + ".tmp")
+        start_time = time.time()
+        with self.vec_client.connect() as conn:
+            # Start a new transaction, whose first statement fixes its snapshot
+            conn.commit()
+            with conn.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+                cursor.execute(f'SELECT count(*) FROM "{self.table_name}"')
+                num_rows = cursor.fetchone()[0]
+            writer = MmapVectorIndex.writer(
+                staging, num_rows, self.dimensions, self.vector_settings.local_index_dtype
+            )
+            with conn.cursor(name="export_local_index") as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(
+                    f'SELECT id, metadata, contents, embedding FROM "{self.table_name}" ORDER BY id'
+                )
+                while rows := cursor.fetchmany(batch_size):
+                    df = pd.DataFrame(rows, columns=["id", "metadata", "contents", "embedding"])
+                    # Depending on the pgvector version these are arrays or Vector objects
+                    df["embedding"] = [
+                        e.to_numpy() if hasattr(e, "to_numpy") else e for e in df["embedding"]
+                    ]
+                    writer.append(df)
+        writer.close()
+        replace_directory(staging, target)
+        self._local_index = None
+        logging.info(
+            f"Exported {num_rows} records from {self.table_name} to {target} "
+            f"in {time.time() - start_time:.1f} seconds"
+        )
+        return num_rows
+
+    def _create_hits_from_results(
+        self,
+        results: List[Tuple[Any, ...]],
+        columns: Sequence[str] = RESULT_COLUMNS,
+    ) -> List[SearchHit]:
+        """
+        Create SearchHit rows from the search results.
+
+        Args:
+            results: A list of tuples containing the search results.
+            columns: Requested result columns; the others are set to None.
+
+        Returns:
+            A list of SearchHit rows, ids as strings.
+        """
+        keep = [name in columns for name in RESULT_COLUMNS]
+        return [
+            SearchHit(
+                *(
+                    value if wanted else None
+                    for wanted, value in zip(keep, (str(row[0]), *row[1:]))
+                )
+            )
+            for row in results
+        ]
 
     def _create_dataframe_from_results(
         self,
         results: List[Tuple[Any, ...]],
+        columns: Sequence[str] = RESULT_COLUMNS,
     ) -> pd.DataFrame:
         """
         Create a pandas DataFrame from the search results.
 
         Args:
             results: A list of tuples containing the search results.
+            columns: Requested result columns; the others are left out.
 
         Returns:
             A pandas DataFrame containing the formatted search results.
         """
-        # Convert results to DataFrame
-        df = pd.DataFrame(
-            results, columns=["id", "metadata", "contents", "embedding", "distance"]
-        )
-
-        # Expand metadata column
-        df = pd.concat(
-            [df.drop(["metadata"], axis=1), df["metadata"].apply(pd.Series)], axis=1
-        )
+        # Build the frame column by column, with the metadata expanded into
+        # its own columns by one constructor call rather than a Series per row
+        data = {
+            name: [row[position] for row in results]
+            for position, name in enumerate(RESULT_COLUMNS)
+            if name in columns and name != "metadata"
+        }
+        df = pd.DataFrame(data, columns=list(data))
+        if "metadata" in columns:
+            metadata = pd.DataFrame([row[1] or {} for row in results], index=df.index)
+            df = pd.concat([df, metadata], axis=1)
 
         # Convert id to string for better readability
-        df["id"] = df["id"].astype(str)
+        if "id" in df:
+            df["id"] = df["id"].astype(str)
 
         return df
 
@@ -212,14 +1299,18 @@ class VectorStore:
 
         if delete_all:
             self.vec_client.delete_all()
-            logging.info(f"Deleted all records from {self.vector_settings.table_name}")
+            logging.info(f"Deleted all records from {self.table_name}")
         elif ids:
             self.vec_client.delete_by_ids(ids)
             logging.info(
-                f"Deleted {len(ids)} records from {self.vector_settings.table_name}"
+                f"Deleted {len(ids)} records from {self.table_name}"
             )
         elif metadata_filter:
             self.vec_client.delete_by_metadata(metadata_filter)
             logging.info(
-                f"Deleted records matching metadata filter from {self.vector_settings.table_name}"
+                f"Deleted records matching metadata filter from {self.table_name}"
             )
+
+    def close(self) -> None:
+        """Close the connection pool of the Timescale Vector client."""
+        self.vec_client.close()
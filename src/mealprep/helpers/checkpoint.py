@@ -0,0 +1,84 @@
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class IngestCheckpoint:
+    """Tracks the chunks an ingest run has completed so a rerun can resume."""
+
+    def __init__(self, path: Path, params: dict):
+        """
+        Initialize IngestCheckpoint.
+
+        A checkpoint written with different parameters (dataset, chunk size,
+        sampling) describes different chunks, so it is discarded.
+
+        Args:
+            path: Path of the JSON checkpoint file
+            params: Parameters that identify the run
+        """
+        self.path = Path(path)
+        self.params = params
+        self.completed: set[int] = set()
+        self._load()
+
+    @property
+    def _selection_path(self) -> Path:
+        return self.path.with_suffix(".selection.npy")
+
+    def _load(self):
+        """Read the checkpoint from disk if it matches the current run."""
+        if not self.path.exists():
+            return
+        with open(self.path) as f:
+            state = json.load(f)
+        if state.get("params") != self.params:
+            logging.warning(
+                f"Ignoring checkpoint {self.path}: it was written with different parameters"
+            )
+            self.reset()
+            return
+        self.completed = set(state.get("completed_chunks", []))
+        logging.info(f"Resuming ingest: {len(self.completed)} chunks already completed")
+
+    def _save(self):
+        """Write the checkpoint atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"params": self.params, "completed_chunks": sorted(self.completed)}, f
+            )
+        os.replace(tmp_path, self.path)
+
+    def load_selection(self) -> Optional[np.ndarray]:
+        """Return the sampled row positions stored with this checkpoint, if any."""
+        if self.path.exists() and self._selection_path.exists():
+            return np.load(self._selection_path)
+        return None
+
+    def save_selection(self, selected: np.ndarray) -> None:
+        """Store the sampled row positions so a resumed run loads the same sample."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(self._selection_path, selected)
+        self._save()
+
+    def is_done(self, chunk_number: int) -> bool:
+        """Check whether a chunk was fully loaded by a previous run."""
+        return chunk_number in self.completed
+
+    def mark_done(self, chunk_number: int) -> None:
+        """Record a chunk as fully loaded."""
+        self.completed.add(chunk_number)
+        self._save()
+
+    def reset(self) -> None:
+        """Forget all progress."""
+        self.completed = set()
+        for path in (self.path, self._selection_path):
+            if path.exists():
+                path.unlink()
@@ -0,0 +1,95 @@
+from typing import Optional
+
+import numpy as np
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length, leaving zero rows as they are."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class MiniBatchKMeans:
+    """
+    Spherical mini-batch k-means (Sculley, 2010) over unit-normalized vectors.
+
+    Points are assigned to the centroid with the highest cosine similarity,
+    and every centroid moves towards its assigned points with a per-centroid
+    learning rate of 1 / (points seen so far), so the model can keep learning
+    from batches that arrive later without revisiting earlier ones.
+    """
+
+    def __init__(self, n_clusters: int, rng: Optional[np.random.Generator] = None):
+        """
+        Initialize MiniBatchKMeans.
+
+        Args:
+            n_clusters: Number of clusters
+            rng: Random generator for the initialization
+        """
+        self.n_clusters = n_clusters
+        self.rng = rng or np.random.default_rng()
+        self.centroids: Optional[np.ndarray] = None
+        self.counts: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_centroids(cls, centroids: np.ndarray, counts: np.ndarray) -> "MiniBatchKMeans":
+        """Restore a model from stored centroids and their point counts."""
+        model = cls(len(centroids))
+        model.centroids = normalize_rows(centroids)
+        model.counts = np.asarray(counts, dtype=np.int64)
+        return model
+
+    def _init_centroids(self, vectors: np.ndarray) -> None:
+        """k-means++ seeding on the first batch."""
+        if len(vectors) < self.n_clusters:
+            raise ValueError(
+                f"The first batch has {len(vectors)} vectors, fewer than {self.n_clusters} clusters"
+            )
+        centroids = [vectors[self.rng.integers(len(vectors))]]
+        distances = 1 - vectors @ centroids[0]
+        for _ in range(1, self.n_clusters):
+            weights = np.maximum(distances, 0) ** 2
+            total = weights.sum()
+            index = (
+                self.rng.choice(len(vectors), p=weights / total)
+                if total > 0
+                else self.rng.integers(len(vectors))
+            )
+            centroids.append(vectors[index])
+            distances = np.minimum(distances, 1 - vectors @ vectors[index])
+        self.centroids = np.stack(centroids).astype(np.float32)
+        self.counts = np.zeros(self.n_clusters, dtype=np.int64)
+
+    def predict(self, vectors: np.ndarray) -> np.ndarray:
+        """Index of the nearest centroid of every vector."""
+        if self.centroids is None:
+            raise ValueError("The model has not been fitted")
+        return np.argmax(normalize_rows(vectors) @ self.centroids.T, axis=1)
+
+    def partial_fit(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Update the centroids with one batch.
+
+        Args:
+            vectors: (n, d) batch of vectors
+
+        Returns:
+            The cluster of every vector of the batch
+        """
+        vectors = normalize_rows(vectors)
+        if self.centroids is None:
+            self._init_centroids(vectors)
+        labels = np.argmax(vectors @ self.centroids.T, axis=1)
+        batch_counts = np.bincount(labels, minlength=self.n_clusters)
+        sums = np.zeros_like(self.centroids)
+        np.add.at(sums, labels, vectors)
+        updated = batch_counts > 0
+        self.counts += batch_counts
+        # Moving each centroid by 1/count per point, applied to the batch mean
+        rate = (batch_counts[updated] / self.counts[updated])[:, None]
+        means = sums[updated] / batch_counts[updated][:, None]
+        self.centroids[updated] = (1 - rate) * self.centroids[updated] + rate * means
+        self.centroids = normalize_rows(self.centroids)
+        return labels
@@ -0,0 +1,48 @@
+from typing import List
+
+import numpy as np
+
+
+def mmr_select(
+    query_embedding: np.ndarray, candidate_embeddings: np.ndarray, k: int, lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Pick k diverse candidates by maximal marginal relevance.
+
+    Each step takes the candidate maximizing
+    lambda * sim(query, c) - (1 - lambda) * max sim(c, already selected),
+    with cosine similarities. All pairwise similarities come from one matrix
+    product, and the running maximum similarity to the selection is updated
+    with one row per step.
+
+    Args:
+        query_embedding: (d,) query embedding
+        candidate_embeddings: (n, d) candidate embeddings, most relevant first
+        k: Number of candidates to select
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+
+    Returns:
+        Positions of the selected candidates, in selection order
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if len(candidates) == 0 or k <= 0:
+        return []
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected = []
+    for _ in range(min(k, len(candidates))):
+        # Nothing selected yet: the redundancy term is left out
+        penalty = np.where(np.isfinite(redundancy), redundancy, 0.0)
+        scores = lambda_mult * relevance - (1 - lambda_mult) * penalty
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return selected
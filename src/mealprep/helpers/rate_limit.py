@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize TokenBucket.
+
+        Args:
+            per_minute: Refill rate in units per minute
+            capacity: Maximum burst size (defaults to one minute's worth)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, per_minute: float) -> None:
+        """Change the refill rate, keeping the tokens accrued so far."""
+        with self._lock:
+            self._refill()
+            self.rate = per_minute / 60.0
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """
+        Block until `amount` units are available and take them.
+
+        Requests larger than the capacity are allowed once the bucket is full,
+        so they are delayed rather than rejected.
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(amount, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """
+    Request and token rate limiter with adaptive backoff.
+
+    Rates are cut in half whenever the API answers with a rate-limit error and
+    recover additively on every success (AIMD), so the limiter settles just
+    under the quota the API actually grants.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        min_fraction: float = 0.1,
+        recovery: float = 0.02,
+    ):
+        """
+        Initialize RateLimiter.
+
+        Args:
+            requests_per_minute: Maximum requests per minute
+            tokens_per_minute: Maximum tokens per minute
+            min_fraction: Lowest fraction of the configured rates to back off to
+            recovery: Fraction of the configured rates regained per success
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.min_fraction = min_fraction
+        self.recovery = recovery
+        self.fraction = 1.0
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._consecutive_failures = 0
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Wait for capacity to send one request of `tokens` tokens.
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+            waited += pause
+        waited += self.requests.acquire(1)
+        waited += self.tokens.acquire(tokens)
+        return waited
+
+    def on_success(self) -> None:
+        """Slowly raise the rates back towards the configured limits."""
+        with self._lock:
+            self._consecutive_failures = 0
+            if self.fraction < 1.0:
+                self._set_fraction(min(1.0, self.fraction + self.recovery))
+
+    def on_rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """
+        Back off after a rate-limit error.
+
+        All callers are paused, either for the delay suggested by the API or
+        for an exponentially growing delay, and the rates are halved.
+
+        Returns:
+            Seconds every caller will pause
+        """
+        with self._lock:
+            self._consecutive_failures += 1
+            delay = retry_after or min(60.0, 2.0 ** self._consecutive_failures)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            self._set_fraction(max(self.min_fraction, self.fraction / 2))
+            logging.warning(
+                f"Rate limited, pausing {delay:.1f}s and throttling to "
+                f"{self.fraction:.0%} of the configured rates"
+            )
+            return delay
+
+    def _set_fraction(self, fraction: float) -> None:
+        self.fraction = fraction
+        self.requests.set_rate(self.requests_per_minute * fraction)
+        self.tokens.set_rate(self.tokens_per_minute * fraction)
+
+
+class ProgressReporter:
+    """Logs progress, throughput and ETA of a long-running job."""
+
+    def __init__(self, total: Optional[int] = None, label: str = "items", interval: float = 10.0):
+        """
+        Initialize ProgressReporter.
+
+        Args:
+            total: Expected number of items (no ETA is reported when unknown)
+            label: Name of the counted items in log messages
+            interval: Minimum number of seconds between log lines
+        """
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self.tokens = 0
+        self._started = time.monotonic()
+        self._last_report = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, items: int, tokens: int = 0) -> None:
+        """Record completed items and log a progress line if one is due."""
+        with self._lock:
+            self.done += items
+            self.tokens += tokens
+            now = time.monotonic()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                logging.info(self.summary())
+
+    def summary(self) -> str:
+        """Describe the progress so far."""
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        rate = self.done / elapsed
+        message = (
+            f"{self.done} {self.label} in {elapsed:.0f}s "
+            f"({rate:.1f} {self.label}/s, {self.tokens / elapsed * 60:.0f} tokens/min)"
+        )
+        if self.total:
+            remaining = max(self.total - self.done, 0)
+            eta = remaining / rate if rate > 0 else float("inf")
+            message += f", {self.done / self.total:.1%} done, ETA {eta:.0f}s"
+        return message
@@ -0,0 +1,109 @@
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class ReservoirSampler:
+    """Uniform fixed-size sample of row positions drawn from a stream of chunks."""
+
+    def __init__(self, size: int, rng: Optional[np.random.Generator] = None):
+        """
+        Initialize ReservoirSampler.
+
+        Args:
+            size: Number of positions to keep
+            rng: Random generator (a fresh one is created if not provided)
+        """
+        self.size = size
+        self.rng = rng or np.random.default_rng()
+        self.seen = 0
+        self._reservoir = np.empty(size, dtype=np.int64)
+
+    def add(self, positions: np.ndarray) -> None:
+        """
+        Offer a chunk of row positions to the reservoir (Algorithm R).
+
+        Args:
+            positions: Row positions from the current chunk
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+
+        # Fill phase: the first `size` rows are always kept
+        free = max(min(self.size - self.seen, len(positions)), 0)
+        self._reservoir[self.seen : self.seen + free] = positions[:free]
+        self.seen += free
+        positions = positions[free:]
+        if len(positions) == 0:
+            return
+
+        # Replacement phase: the t-th row replaces a random slot with probability size/t
+        counts = self.seen + np.arange(1, len(positions) + 1)
+        slots = (self.rng.random(len(positions)) * counts).astype(np.int64)
+        keep = slots < self.size
+        slots, positions = slots[keep], positions[keep]
+        # When a slot is hit more than once within the chunk, the latest row wins
+        _, last = np.unique(slots[::-1], return_index=True)
+        last = len(slots) - 1 - last
+        self._reservoir[slots[last]] = positions[last]
+        self.seen += len(counts)
+
+    def positions(self) -> np.ndarray:
+        """Return the sampled positions in ascending order."""
+        return np.sort(self._reservoir[: min(self.seen, self.size)])
+
+
+class StratifiedSampler:
+    """Fixed-size sample that keeps each stratum at its share of the stream."""
+
+    def __init__(self, size: int, rng: Optional[np.random.Generator] = None):
+        """
+        Initialize StratifiedSampler.
+
+        Args:
+            size: Total number of positions to keep
+            rng: Random generator (a fresh one is created if not provided)
+        """
+        self.size = size
+        self.rng = rng or np.random.default_rng()
+        self._samplers: Dict[Hashable, ReservoirSampler] = {}
+
+    def add(self, positions: np.ndarray, strata: np.ndarray) -> None:
+        """
+        Offer a chunk of row positions together with their stratum labels.
+
+        Args:
+            positions: Row positions from the current chunk
+            strata: Stratum label (e.g. diet_pref) of each position
+        """
+        groups = pd.Series(np.asarray(positions)).groupby(np.asarray(strata))
+        for stratum, group in groups:
+            if stratum not in self._samplers:
+                # Each stratum could end up owning the whole sample
+                self._samplers[stratum] = ReservoirSampler(self.size, self.rng)
+            self._samplers[stratum].add(group.to_numpy())
+
+    def quotas(self) -> Dict[Hashable, int]:
+        """Allocate the sample size across strata proportionally (largest remainder)."""
+        seen = {stratum: s.seen for stratum, s in self._samplers.items()}
+        total = sum(seen.values())
+        if total <= self.size:
+            return seen
+
+        exact = {stratum: self.size * n / total for stratum, n in seen.items()}
+        quotas = {stratum: int(share) for stratum, share in exact.items()}
+        by_remainder = sorted(exact, key=lambda s: exact[s] - quotas[s], reverse=True)
+        for stratum in by_remainder[: self.size - sum(quotas.values())]:
+            quotas[stratum] += 1
+        return quotas
+
+    def positions(self) -> np.ndarray:
+        """Return the sampled positions of all strata in ascending order."""
+        selected = []
+        for stratum, quota in self.quotas().items():
+            reservoir = self._samplers[stratum].positions()
+            # A uniform subsample of a uniform reservoir is still uniform
+            selected.append(self.rng.choice(reservoir, size=quota, replace=False))
+        if not selected:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(selected))
@@ -1,51 +1,398 @@
+import argparse
+import logging
+import uuid
+from collections import deque
+from contextlib import ExitStack
 from datetime import datetime
+from pathlib import Path
+from typing import Deque, Iterator, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
+from mealprep.config.settings import get_settings
+from mealprep.db.clusters import RecipeClusters
 from mealprep.db.vector_store import VectorStore
-from timescale_vector.client import uuid_from_time
-from pathlib import Path
-from mealprep.helpers.utils import add_dietary_prefs
-
-# Initialize VectorStore
-vec = VectorStore()
-
-# Read the CSV file
+from mealprep.helpers.checkpoint import IngestCheckpoint
+from mealprep.helpers.rate_limit import ProgressReporter
+from mealprep.helpers.sampling import ReservoirSampler, StratifiedSampler
+from mealprep.helpers.utils import FLAG_COLUMNS, add_dietary_prefs, diet_metadata
+from mealprep.services.embedding_executor import READ_AHEAD_CHUNKS, EmbeddingExecutor
 
 # Get the project root (two levels up from this file)
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 DATA_PATH = PROJECT_ROOT / "data" / "recipes_data.csv"
-df = pd.read_csv(DATA_PATH)
-df = add_dietary_prefs(df)
-# Since we only want pescetarial recipes, filter out those with meat
-df.drop(df[df["with_meat"]].index, inplace=True)
+CHECKPOINT_PATH = PROJECT_ROOT / "data" / "ingest_checkpoint.json"
+
+# Namespace of the name-based (version 5) record IDs
+RECIPE_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "mealprep/recipes")
+
+# Columns needed to classify a recipe, and to build its contents
+CLASSIFY_COLUMNS = ["title", "ingredients"]
+CONTENT_COLUMNS = ["title", "ingredients", "directions"]
+
+
+def iter_chunks(
+    path: Path, chunk_size: int, usecols: Optional[List[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream the recipes CSV in bounded chunks.
+
+    The index of every chunk continues where the previous one stopped, so it
+    can be used as the global row position.
+    """
+    with pd.read_csv(path, chunksize=chunk_size, usecols=usecols) as reader:
+        yield from reader
+
+
+def classify(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Add dietary flags to a chunk and drop the recipes containing meat."""
+    chunk = add_dietary_prefs(chunk)
+    # Since we only want pescetarian recipes, filter out those with meat
+    return chunk[~chunk["with_meat"]]
+
+
+def sample_positions(
+    path: Path, chunk_size: int, sample_size: int, sampling: str, seed: int = None
+) -> np.ndarray:
+    """
+    Pick a uniform sample of row positions in one streaming pass.
+
+    Only positions and diet labels are kept, so memory is bounded by the sample
+    size rather than by the dataset size.
+
+    Args:
+        path: Path to the recipes CSV
+        chunk_size: Number of rows read per chunk
+        sample_size: Number of recipes to sample
+        sampling: "reservoir" for a plain uniform sample, "stratified" to keep
+            every diet_pref at its share of the dataset
+        seed: Seed for reproducible samples
+
+    Returns:
+        Sorted array of sampled row positions
+    """
+    rng = np.random.default_rng(seed)
+    if sampling == "stratified":
+        sampler = StratifiedSampler(sample_size, rng)
+    else:
+        sampler = ReservoirSampler(sample_size, rng)
+
+    for chunk in iter_chunks(path, chunk_size, usecols=CLASSIFY_COLUMNS):
+        scanned = chunk.index[-1] + 1
+        chunk = classify(chunk)
+        if sampling == "stratified":
+            sampler.add(chunk.index.to_numpy(), chunk["diet_pref"].to_numpy())
+        else:
+            sampler.add(chunk.index.to_numpy())
+        logging.info(f"Scanned {scanned} rows")
+
+    return sampler.positions()
 
 
 # Prepare data for insertion
-def prepare_record(row):
+def build_content(row) -> str:
     """
-    Prepare a single record for insertion into the vector store.
+    Build the text that is embedded and stored for a single recipe.
     Args:
         row: A row from the DataFrame
     Returns:
-        A dictionary with id, metadata, contents, and embedding
+        The recipe contents as a single string
+    """
+    return f"Title: {row["title"]}\nIngredients: {row['ingredients']}\nRecipe: {row['directions']}\nDietary Preferences: {row['diet_pref']}"
+
+
+def recipe_id(row) -> str:
+    """
+    Derive a deterministic record ID from the recipe content.
+
+    Only the source fields are hashed, so the ID stays stable when the
+    derived dietary classification changes.
+    Args:
+        row: A row from the DataFrame
+    Returns:
+        The record ID as a UUID string
+    """
+    source = "\x1f".join(str(row[column]) for column in CONTENT_COLUMNS)
+    return str(uuid.uuid5(RECIPE_NAMESPACE, source))
+
+
+def build_records(sample: pd.DataFrame, embeddings: List[List[float]]) -> pd.DataFrame:
+    """
+    Prepare records for insertion into the vector store.
+
+    The metadata carries the dietary classification, from which the typed
+    diet columns of the vector table are generated.
+    Args:
+        sample: The recipes to insert, with "id", "contents", "diet_pref" and
+            dietary flag columns
+        embeddings: The embedding of each recipe's contents
+    Returns:
+        A DataFrame with id, metadata, contents, and embedding columns
     """
-    content = f"Title: {row["title"]}\nIngredients: {row['ingredients']}\nRecipe: {row['directions']}\nDietary Preferences: {row['diet_pref']}"
-    embedding = vec.get_embedding(content)
-    return pd.Series(
+    created_at = datetime.now().isoformat()
+    return pd.DataFrame(
         {
-            "id": str(uuid_from_time(datetime.now())),
-            "metadata": {
-                "created_at": datetime.now().isoformat(),
-            },
-            "contents": content,
-            "embedding": embedding,
+            "id": sample["id"].tolist(),
+            "metadata": [
+                {"created_at": created_at, **diet_metadata(recipe)}
+                for recipe in sample[["diet_pref"] + FLAG_COLUMNS].to_dict("records")
+            ],
+            "contents": sample["contents"].tolist(),
+            "embedding": embeddings,
         }
     )
 
 
-records_df = df.sample(n=10000).apply(prepare_record, axis=1)
+def iter_pending_chunks(
+    vec: VectorStore,
+    path: Path,
+    chunk_size: int,
+    selected: Optional[np.ndarray],
+    checkpoint: Optional[IngestCheckpoint],
+    table_name: str = None,
+) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """
+    Yield the chunks that still need to be embedded, with ids and contents.
+
+    Chunks completed by a previous run are skipped, and so are recipes that
+    are already stored in the target table. Chunks left empty are still
+    yielded so they can be checkpointed in order.
+
+    Chunks are read ahead of the one being stored, so the table lookup does
+    not see recipes of the chunks still in flight; recipes repeated in those
+    chunks are dropped with their IDs instead, since COPY fails on a
+    duplicate id. Only the IDs of the last READ_AHEAD_CHUNKS chunks are kept,
+    as earlier chunks are stored by then.
+    """
+    in_flight: Deque[Set[str]] = deque(maxlen=READ_AHEAD_CHUNKS)
+    for chunk_number, chunk in enumerate(
+        iter_chunks(path, chunk_size, usecols=CONTENT_COLUMNS)
+    ):
+        if checkpoint and checkpoint.is_done(chunk_number):
+            continue
+        if selected is not None:
+            start, stop = np.searchsorted(selected, [chunk.index[0], chunk.index[-1] + 1])
+            chunk = chunk.loc[selected[start:stop]]
+        chunk = classify(chunk)
+
+        if not chunk.empty:
+            chunk = chunk.assign(id=chunk.apply(recipe_id, axis=1))
+            chunk = chunk.drop_duplicates("id")
+            existing = vec.existing_ids(chunk["id"].tolist(), table_name)
+            pending = set().union(*in_flight)
+            chunk = chunk[~chunk["id"].isin(existing) & ~chunk["id"].isin(pending)]
+        in_flight.append(set(chunk["id"]) if not chunk.empty else set())
+        if not chunk.empty:
+            chunk = chunk.assign(contents=chunk.apply(build_content, axis=1))
+
+        yield chunk_number, chunk
+
+
+def ingest(
+    vec: VectorStore,
+    path: Path = DATA_PATH,
+    chunk_size: int = 50_000,
+    sample_size: Optional[int] = 10_000,
+    sampling: str = "reservoir",
+    seed: int = None,
+    checkpoint_path: Optional[Path] = CHECKPOINT_PATH,
+    restart: bool = False,
+    executor: Optional[EmbeddingExecutor] = None,
+    loader: str = "copy",
+    swap: bool = False,
+) -> int:
+    """
+    Stream recipes from the CSV into the vector store.
+
+    When a sample size is given, a first pass over the file picks the sampled
+    row positions. A second pass then classifies, embeds and upserts each
+    chunk, reading at most two chunks ahead of the one being stored, so
+    memory stays flat regardless of the dataset size. Embedding requests run
+    concurrently within the configured API quota.
+
+    Record IDs are derived from the recipe content, so recipes that are
+    already stored are skipped before they are embedded. Completed chunks are
+    recorded in a checkpoint, and an interrupted run resumes with the same
+    sample where it stopped; the checkpoint is cleared once the run completes.
+
+    Args:
+        vec: The VectorStore to load into
+        path: Path to the recipes CSV
+        chunk_size: Number of rows read per chunk
+        sample_size: Number of recipes to load (None loads every recipe)
+        sampling: "reservoir" or "stratified" (by diet_pref)
+        seed: Seed for reproducible samples
+        checkpoint_path: Where to record progress (None disables checkpointing)
+        restart: Discard the progress of a previous run
+        executor: Executor for the embedding requests (built from the ingest
+            settings if not provided)
+        loader: "copy" to load with binary COPY, "upsert" to insert through
+            the timescale_vector client
+        swap: Load into a staging table and swap it with the live table once
+            every chunk is loaded, replacing the current recipes
+
+    Returns:
+        Number of recipes inserted
+    """
+    checkpoint = None
+    if checkpoint_path:
+        checkpoint = IngestCheckpoint(
+            checkpoint_path,
+            params={
+                "data_path": str(Path(path).resolve()),
+                "chunk_size": chunk_size,
+                "sample_size": sample_size,
+                "sampling": sampling,
+                "seed": seed,
+            },
+        )
+        if restart:
+            checkpoint.reset()
+
+    selected = None
+    if sample_size:
+        selected = checkpoint.load_selection() if checkpoint else None
+        if selected is None:
+            selected = sample_positions(path, chunk_size, sample_size, sampling, seed)
+            if checkpoint:
+                checkpoint.save_selection(selected)
+        logging.info(f"Sampled {len(selected)} recipes using {sampling} sampling")
+
+    vec.create_tables()
+
+    if executor is None:
+        settings = get_settings().ingest
+        remaining = None
+        if selected is not None:
+            done = list(checkpoint.completed) if checkpoint else []
+            remaining = int(np.isin(selected // chunk_size, done, invert=True).sum())
+        executor = EmbeddingExecutor(
+            vec,
+            max_in_flight=settings.max_in_flight,
+            requests_per_minute=settings.requests_per_minute,
+            tokens_per_minute=settings.tokens_per_minute,
+            max_retries=settings.max_retries,
+            progress=ProgressReporter(total=remaining, label="recipes"),
+        )
+
+    with ExitStack() as stack:
+        table_name = None
+        if swap:
+            staging = stack.enter_context(vec.bulk_loader().staging(reset=restart))
+            write, table_name = staging.copy, staging.table_name
+        elif loader == "copy":
+            write = vec.bulk_load
+        else:
+            write = vec.upsert
+
+        chunks = iter_pending_chunks(
+            vec, path, chunk_size, selected, checkpoint, table_name
+        )
+        inserted = 0
+        for (chunk_number, chunk), embeddings in executor.embed_chunks(
+            ((chunk_number, chunk), [] if chunk.empty else chunk["contents"].tolist())
+            for chunk_number, chunk in chunks
+        ):
+            if not chunk.empty:
+                write(build_records(chunk, embeddings))
+                inserted += len(chunk)
+                logging.info(f"Inserted {inserted} recipes so far")
+
+            if checkpoint:
+                checkpoint.mark_done(chunk_number)
+
+    if checkpoint:
+        # Nothing is left to resume: a rerun starts a new load, which still
+        # skips the recipes that are already stored
+        checkpoint.reset()
+        logging.info(f"Ingest completed, checkpoint {checkpoint.path} cleared")
+    return inserted
+
+
+def main():
+    ingest_settings = get_settings().ingest
+
+    parser = argparse.ArgumentParser(description="Load recipes into the vector store.")
+    parser.add_argument("--data-path", type=Path, default=DATA_PATH)
+    parser.add_argument("--chunk-size", type=int, default=ingest_settings.chunk_size)
+    parser.add_argument(
+        "--sample-size",
+        type=int,
+        default=ingest_settings.sample_size,
+        help="Number of recipes to load (0 loads all of them)",
+    )
+    parser.add_argument(
+        "--sampling",
+        choices=["reservoir", "stratified"],
+        default=ingest_settings.sampling,
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--checkpoint", type=Path, default=CHECKPOINT_PATH)
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore the checkpoint of a previous run and start from scratch",
+    )
+    parser.add_argument(
+        "--loader",
+        choices=["copy", "upsert"],
+        default="copy",
+        help="Load with binary COPY (fast) or through timescale_vector upserts",
+    )
+    parser.add_argument(
+        "--swap",
+        action="store_true",
+        help="Load into a staging table and swap it with the recipes table when done",
+    )
+    parser.add_argument(
+        "--skip-index",
+        action="store_true",
+        help="Do not create or resize the embedding index after loading",
+    )
+    parser.add_argument(
+        "--backfill-diets",
+        action="store_true",
+        help="Classify stored recipes whose metadata has no diet yet",
+    )
+    parser.add_argument(
+        "--cluster",
+        type=int,
+        metavar="N",
+        help="Recluster all recipes into N clusters (new recipes are otherwise "
+        "assigned to the existing clusters)",
+    )
+    parser.add_argument(
+        "--export-local-index",
+        action="store_true",
+        help="Export the table to the memory-mapped index used by the mmap engine",
+    )
+    args = parser.parse_args()
+
+    vec = VectorStore()
+    ingest(
+        vec,
+        path=args.data_path,
+        chunk_size=args.chunk_size,
+        sample_size=args.sample_size,
+        sampling=args.sampling,
+        seed=args.seed,
+        checkpoint_path=args.checkpoint,
+        restart=args.restart,
+        loader=args.loader,
+        swap=args.swap,
+    )
+    if args.backfill_diets:
+        vec.backfill_diets()
+    clusters = RecipeClusters(vec)
+    if args.cluster:
+        clusters.fit(args.cluster, seed=args.seed)
+    else:
+        clusters.assign_new()
+    if not args.skip_index:
+        vec.ensure_index()
+    if args.export_local_index:
+        vec.export_local_index()
 
 
-# Create tables and insert data
-vec.create_tables()
-vec.upsert(records_df)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import copy
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import List
+
+import numpy as np
+from openai import OpenAI
+from mealprep.config.settings import Settings
+from mealprep.db.embedding_cache import singularize
+
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+")
+
+
+class EmbeddingProvider(ABC):
+    """Turns texts into embedding vectors."""
+
+    #: Identifies the embedding space; part of the embedding cache key
+    model: str
+    #: Length of the produced vectors
+    dimensions: int
+    #: Whether results are worth keeping in the persistent embedding cache
+    cacheable: bool = True
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed one request-sized batch of texts.
+
+        Args:
+            texts: Prepared input texts
+
+        Returns:
+            One embedding per text, in input order
+        """
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI embeddings endpoint."""
+
+    def __init__(self, api_key: str, model: str, dimensions: int):
+        """
+        Initialize OpenAIEmbeddingProvider.
+
+        Args:
+            api_key: OpenAI API key
+            model: Embedding model name
+            dimensions: Dimensions returned by the model
+        """
+        self.client = OpenAI(api_key=api_key)
+        self.model = model
+        self.dimensions = dimensions
+
+    def with_options(self, **options) -> "OpenAIEmbeddingProvider":
+        """Return a copy of the provider whose client uses other options (see OpenAI.with_options)."""
+        provider = copy.copy(self)
+        provider.client = self.client.with_options(**options)
+        return provider
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embeddings.create(input=texts, model=self.model)
+        embeddings: List[List[float]] = [None] * len(texts)
+        # The API echoes the position of each input within the request
+        for item in response.data:
+            embeddings[item.index] = item.embedding
+        return embeddings
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    CPU-only bag-of-words embeddings using the hashing trick.
+
+    Words are lowercased and singularized, then words and word pairs are
+    hashed into a fixed number of signed buckets with log-scaled counts, and
+    the vectors are L2-normalized so cosine distance works as with model
+    embeddings. No model download or network access is needed, which makes it
+    suitable for offline use, tests and benchmarks; quality is that of a
+    keyword match rather than a semantic model.
+    """
+
+    cacheable = False
+
+    def __init__(self, dimensions: int = 1024):
+        """
+        Initialize HashingEmbeddingProvider.
+
+        Args:
+            dimensions: Number of hash buckets (vector length)
+        """
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+
+    def _features(self, text: str) -> List[str]:
+        words = [singularize(word) for word in TOKEN_PATTERN.findall(text.lower())]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            hashes = np.fromiter(
+                (zlib.crc32(feature.encode("utf-8")) for feature in self._features(text)),
+                dtype=np.uint32,
+            )
+            if not len(hashes):
+                continue
+            # The top bit picks the sign so that collisions tend to cancel out
+            signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], hashes % self.dimensions, signs)
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+        return vectors.tolist()
+
+
+def get_embedding_provider(settings: Settings) -> EmbeddingProvider:
+    """
+    Create the embedding provider selected in the settings.
+
+    Args:
+        settings: Application settings
+
+    Returns:
+        The configured EmbeddingProvider
+    """
+    provider = settings.embeddings.provider
+    if provider == "openai":
+        return OpenAIEmbeddingProvider(
+            settings.openai.api_key,
+            settings.openai.embedding_model,
+            settings.vector_store.embedding_dimensions,
+        )
+    if provider == "hashing":
+        return HashingEmbeddingProvider(settings.embeddings.hashing_dimensions)
+    raise ValueError(f"Unknown embedding provider: {provider}")
@@ -1,16 +1,69 @@
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+import asyncio
 import os
 import time
 import logging
 from mealprep.db.models import MealSuggestion, MealPlan
 from mealprep.config.settings import get_api_key
 from dotenv import load_dotenv
-import pandas as pd
 
 load_dotenv()
 log = logging.getLogger(__name__)
 
 
+def build_request(
+    prompt: str,
+    temperature: float = 0.7,
+    similar_recipes: list[str] | None = None,
+    plan: bool = False,
+) -> dict:
+    """Arguments of the chat completion request for a meal suggestion or plan."""
+    context = "\n".join(similar_recipes) if similar_recipes else ""
+
+    full_prompt = f"{context}\n\n{prompt}" if context else prompt
+
+    if plan:
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "meal_plan",
+                "schema": MealPlan.model_json_schema(),
+            },
+        }
+    else:
+        response_format = {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "meal_suggestion",
+                "schema": MealSuggestion.model_json_schema(),
+            },
+        }
+
+    return {
+        "model": "gpt-5-mini",
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a helpful private chef assistant.",
+            },
+            {"role": "user", "content": full_prompt},
+        ],
+        "temperature": temperature,
+        "response_format": response_format,
+    }
+
+
+def parse_completion(completion, plan: bool = False):
+    """Validate the structured output of a completion into plain dicts."""
+    message = completion.choices[0].message.content
+    if plan:
+        meal_plan = MealPlan.model_validate_json(message)
+        return meal_plan.as_list()
+
+    parsed = MealSuggestion.model_validate_json(message)
+    return parsed.model_dump()
+
+
 class OpenAIClient:
     """Client for interacting with the OpenAI API with structured outputs."""
 
@@ -24,59 +77,56 @@ class OpenAIClient:
         self,
         prompt: str,
         temperature: float = 0.7,
-        similar_recipes: pd.DataFrame | None = None,
+        similar_recipes: list[str] | None = None,
         plan: bool = False,
     ):
-        context = ""
-        if similar_recipes is not None and not similar_recipes.empty:
-            context = "\n".join(similar_recipes["contents"].tolist())
-
-        full_prompt = f"{context}\n\n{prompt}" if context else prompt
-
-        if plan:
-            response_format = {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "meal_plan",
-                    "schema": MealPlan.model_json_schema(),
-                },
-            }
-        else:
-            response_format = {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "meal_suggestion",
-                    "schema": MealSuggestion.model_json_schema(),
-                },
-            }
+        request = build_request(prompt, temperature, similar_recipes, plan)
 
         for attempt in range(2):
             try:
-                completion = self.client.chat.completions.create(
-                    model="gpt-5-mini",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a helpful private chef assistant.",
-                        },
-                        {"role": "user", "content": full_prompt},
-                    ],
-                    temperature=temperature,
-                    response_format=response_format,
-                )
-
-                message = completion.choices[0].message.content
-                if plan:
-                    meal_plan = MealPlan.model_validate_json(message)
-                    parsed = meal_plan.as_list()
-
-                    return parsed
-
-                parsed = MealSuggestion.model_validate_json(message)
-                return parsed.model_dump()
+                completion = self.client.chat.completions.create(**request)
+                return parse_completion(completion, plan)
 
             except Exception:
                 log.exception(f"Attempt {attempt+1}: error parsing structured output")
                 time.sleep(1)
 
         return None
+
+    def close(self) -> None:
+        """Close the underlying HTTP client."""
+        self.client.close()
+
+
+class AsyncOpenAIClient:
+    """Asynchronous counterpart of OpenAIClient, for use from an event loop."""
+
+    def __init__(self, api_key: str = None):
+        self.api_key = api_key or get_api_key("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("OpenAI API key must be provided or set in OPENAI_API_KEY")
+        self.client = AsyncOpenAI(api_key=self.api_key)
+
+    async def get_meal_suggestion(
+        self,
+        prompt: str,
+        temperature: float = 0.7,
+        similar_recipes: list[str] | None = None,
+        plan: bool = False,
+    ):
+        request = build_request(prompt, temperature, similar_recipes, plan)
+
+        for attempt in range(2):
+            try:
+                completion = await self.client.chat.completions.create(**request)
+                return parse_completion(completion, plan)
+
+            except Exception:
+                log.exception(f"Attempt {attempt+1}: error parsing structured output")
+                await asyncio.sleep(1)
+
+        return None
+
+    async def close(self) -> None:
+        """Close the underlying HTTP client."""
+        await self.client.close()
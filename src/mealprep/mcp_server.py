@@ -2,10 +2,14 @@ import logging
 import sys
 import os
 import asyncio
+import time
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
+from typing import TYPE_CHECKING, Optional
 from mcp import types
-from mealprep.services.meal_service import MealService
+
+if TYPE_CHECKING:
+    from mealprep.services.async_meal_service import AsyncMealService
 
 # Set up logging to a file so we can debug
 logging.basicConfig(
@@ -20,8 +24,30 @@ logger = logging.getLogger(__name__)
 
 logger.info("MCP Server starting...")
 
-# Initialize your service
-service = MealService()
+# The service is created on first use, so the server answers the handshake
+# and list_tools without waiting for pandas, openai and the database clients
+# to load; tool calls await it, so they overlap their I/O
+_service: Optional["AsyncMealService"] = None
+_service_lock = asyncio.Lock()
+
+
+def _create_service() -> "AsyncMealService":
+    from mealprep.services.async_meal_service import AsyncMealService
+
+    start_time = time.perf_counter()
+    service = AsyncMealService()
+    logger.info(f"Meal service loaded in {time.perf_counter() - start_time:.3f} seconds")
+    return service
+
+
+async def get_service() -> "AsyncMealService":
+    """Return the meal service, loading it in a worker thread on first call."""
+    global _service
+    async with _service_lock:
+        if _service is None:
+            # Off the event loop, so other requests are answered meanwhile
+            _service = await asyncio.to_thread(_create_service)
+    return _service
 
 # Create MCP server
 server = Server("mealprep")
@@ -49,14 +75,15 @@ async def list_resources() -> list[types.Resource]:
 @server.read_resource()
 async def read_resource(uri: str) -> str:
     """Read a specific resource."""
+    service = await get_service()
     if uri == "mealprep://recipes":
         # Return sample recipes or search results
-        recipes = service.vector_store.get_diverse_recipes(limit=10)
+        recipes = await service.db.get_diverse_recipes(limit=10)
         return recipes.to_json()
 
     elif uri == "mealprep://meal-plans":
         # Return latest meal plan
-        plan = service.get_latest_plan()
+        plan = await service.get_latest_plan()
         return str(plan)
 
     raise ValueError(f"Unknown resource: {uri}")
@@ -122,8 +149,9 @@ async def list_tools() -> list[types.Tool]:
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
     """Execute a tool."""
+    service = await get_service()
     if name == "suggest_meal":
-        result = service.suggest_meal(
+        result = await service.suggest_meal(
             ingredients=arguments.get("ingredients", []),
             num_people=arguments.get("num_people", 2),
             dietary_preferences=arguments.get("dietary_preferences"),
@@ -131,7 +159,7 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
         return [types.TextContent(type="text", text=str(result))]
 
     elif name == "generate_meal_plan":
-        result = service.generate_meal_plan(
+        result = await service.generate_meal_plan(
             num_days=arguments.get("num_days", 7),
             num_people=arguments.get("num_people", 2),
         )
@@ -140,7 +168,9 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
     elif name == "search_recipes":
         # Implement recipe search
         query = arguments.get("query", "")
-        results = service.vector_store.search(query, limit=5)
+        results = await service.vector_store.search(
+            query, limit=5, columns=["id", "metadata", "contents"]
+        )
         return [types.TextContent(type="text", text=results.to_json())]
 
     raise ValueError(f"Unknown tool: {name}")
@@ -0,0 +1,208 @@
+import asyncio
+import time
+from datetime import datetime
+
+from mealprep.config.settings import get_settings
+from mealprep.db.async_database import AsyncMealDatabase
+from mealprep.db.async_vector_store import AsyncVectorStore
+from mealprep.db.response_cache import ResponseCache, ResponseRequest
+from mealprep.helpers.utils import parse_diet
+from mealprep.llm.openai_client import AsyncOpenAIClient
+from mealprep.services.meal_service import SUGGESTION_MMR_LAMBDA, MealServiceBase
+
+
+class AsyncMealService(MealServiceBase):
+    """
+    Asynchronous counterpart of MealService, for event loops such as the MCP server.
+
+    Database queries, vector searches and LLM calls are awaited instead of
+    blocking, so concurrent requests overlap their I/O, and the independent
+    lookups of one request run concurrently. The response cache shared with
+    MealService runs in worker threads on a connection pool of its own.
+    """
+
+    def __init__(self, api_key: str = None):
+        """
+        Initialize AsyncMealService.
+
+        Args:
+            api_key: OpenAI API key (from env if not provided)
+        """
+        self.db = AsyncMealDatabase()
+        self.vector_store = AsyncVectorStore()
+        self.llm = AsyncOpenAIClient(api_key)
+        self.response_cache = (
+            ResponseCache() if get_settings().response_cache.enabled else None
+        )
+
+    async def _similar_recipes(
+        self, ingredients: list[str], dietary_preferences: str = None
+    ) -> list[str]:
+        """Recipes given as context to a suggestion, as in MealService.suggest_meal."""
+        if ingredients:
+            # Only the recipe texts go into the prompt
+            hits = await self.vector_store.search(
+                ingredients,
+                limit=10,
+                return_dataframe=False,
+                diet=parse_diet(dietary_preferences),
+                mmr_lambda=SUGGESTION_MMR_LAMBDA,
+                hybrid=True,
+                columns=["contents"],
+            )
+            return [hit.contents for hit in hits]
+        recipes = await self.db.get_diverse_recipes(
+            limit=10, dietary_preferences=dietary_preferences
+        )
+        return recipes["contents"].tolist()
+
+    async def suggest_meal(
+        self,
+        ingredients: list[str],
+        days_back: int = 14,
+        num_people: int = 3,
+        dietary_preferences: str = None,
+        rejected_meals: list[str] = None,
+    ) -> dict:
+        """
+        Suggest a meal based on available ingredients.
+
+        Args:
+            ingredients: List of available ingredients
+            days_back: Number of days to look back for recent meals (default 14)
+            num_people: Number of people to serve
+            dietary_preferences: Free-text dietary preferences
+            rejected_meals: Meals not to suggest again
+
+        Returns:
+            Parsed meal suggestion
+        """
+        recent_meals, embedding = await asyncio.gather(
+            self.db.get_meals_from_days_back(days_back),
+            self._request_embedding(ingredients),
+        )
+        all_excluded = recent_meals + (rejected_meals or [])
+        # Reuse the answer to an equal or similar ingredient request, as in MealService.suggest_meal
+        request = self._response_request(
+            "suggestion", ingredients, dietary_preferences, num_people
+        )
+        cached = await self._cached_response(request, all_excluded, embedding)
+        if cached is not None:
+            return self.parse_meal_suggestion(cached)
+        start_time = time.perf_counter()
+
+        similar_recipes = await self._similar_recipes(ingredients, dietary_preferences)
+        prompt = self._build_suggestion_prompt(
+            ingredients=ingredients or [],
+            all_excluded=all_excluded,
+            num_people=num_people,
+            dietary_preferences=dietary_preferences,
+            context_type="ingredient-based" if ingredients else "diverse-selection",
+        )
+        suggestion = await self.llm.get_meal_suggestion(
+            prompt, temperature=1.0, similar_recipes=similar_recipes
+        )
+        await self._cache_response(
+            request, suggestion, time.perf_counter() - start_time, embedding
+        )
+        return self.parse_meal_suggestion(suggestion)
+
+    async def generate_meal_plan(
+        self,
+        num_days: int,
+        num_people: int = 2,
+        days_back: int = 14,
+        dietary_preferences: str = None,
+    ) -> dict:
+        """Generate entire meal plan in ONE LLM call."""
+        recent_meals, recipes = await asyncio.gather(
+            self.db.get_meals_from_days_back(days_back),
+            # Recipes from a different cluster for each day, for variety; plans
+            # are not cached, as every plan should come from a fresh sample
+            self.db.get_clustered_recipes(
+                num_clusters=num_days, per_cluster=3, dietary_preferences=dietary_preferences
+            ),
+        )
+        prompt = self._build_mealplan_prompt(
+            num_days=num_days,
+            num_people=num_people,
+            dietary_preferences=dietary_preferences,
+            all_excluded=recent_meals,
+        )
+        suggestion = await self.llm.get_meal_suggestion(
+            prompt, temperature=1.0, similar_recipes=recipes["contents"].tolist(), plan=True
+        )
+        meals = self.parse_meal_plan(suggestion)
+        ingredients = []
+        for meal in meals:
+            ingredients.extend(meal.get("ingredients", []))
+        return {"meals": meals, "shopping_list": self._create_shopping_list(ingredients)}
+
+    async def add_meal(
+        self, ingredients: list[str], meal: str, recipe: list[str], date: datetime = None
+    ) -> int:
+        """Add a meal to the database, see MealService.add_meal."""
+        return await self.db.add_meal(
+            ", ".join(ingredients), meal, "\n".join(recipe), date or datetime.now()
+        )
+
+    async def get_recent_meals(self, days_back: int = 14) -> list[str]:
+        """Get the names of the meals from the last N days."""
+        return await self.db.get_meals_from_days_back(days_back)
+
+    async def add_feedback(self, meal_id: int, feedback: str) -> None:
+        """Add feedback for a meal (for future learning)."""
+        await self.db.update_meal_feedback(meal_id, feedback)
+
+    async def get_latest_plan(self):
+        """Retrieve the latest meal plan."""
+        return await self.db.get_latest_meal_plan()
+
+    async def _request_embedding(self, ingredients: list[str]) -> list[float] | None:
+        """Embedding of the ingredients for the semantic cache tier; the search reuses it."""
+        if not ingredients or self.response_cache is None:
+            return None
+        [embedding] = await self.vector_store.embed_queries([ingredients])
+        return embedding
+
+    async def _cached_response(
+        self, request: ResponseRequest, excluded: list[str], embedding: list[float] = None
+    ):
+        """Look a request up in the response cache, None on a miss or without a cache."""
+        if self.response_cache is None or not request.ingredients:
+            return None
+        return await asyncio.to_thread(
+            self.response_cache.lookup,
+            request,
+            excluded,
+            embedding,
+            self.vector_store.vec.embedding_model,
+        )
+
+    async def _cache_response(
+        self,
+        request: ResponseRequest,
+        response,
+        latency_seconds: float,
+        embedding: list[float] = None,
+    ) -> None:
+        """Store a generated response in the response cache, if there is one."""
+        if self.response_cache is not None and request.ingredients:
+            await asyncio.to_thread(
+                self.response_cache.store,
+                request,
+                response,
+                latency_seconds,
+                embedding,
+                self.vector_store.vec.embedding_model,
+            )
+
+    def response_cache_stats(self) -> dict | None:
+        """Return the response cache metrics (see ResponseCache.stats), None without a cache."""
+        return self.response_cache.stats() if self.response_cache else None
+
+    async def close(self) -> None:
+        """Close the database pools and the LLM client."""
+        await asyncio.gather(self.db.close(), self.vector_store.close(), self.llm.close())
+        if self.response_cache is not None:
+            await asyncio.to_thread(self.response_cache.close)
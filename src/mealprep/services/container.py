@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional
+
+# The client modules are imported when their client is first created
+if TYPE_CHECKING:
+    from mealprep.db.database import MealDatabase
+    from mealprep.db.vector_store import VectorStore
+    from mealprep.llm.openai_client import OpenAIClient
+    from mealprep.services.meal_service import MealService
+
+
+class ServiceContainer:
+    """
+    Process-wide owner of the clients behind MealService.
+
+    The database pool, the vector store and the LLM client are created on
+    first use and shared by every caller in the process, so UI reruns and
+    sessions reuse their connections instead of opening new ones. All of
+    them are closed by close().
+    """
+
+    def __init__(self, api_key: str = None):
+        """
+        Initialize ServiceContainer; no client is created until it is used.
+
+        Args:
+            api_key: OpenAI API key (from env if not provided)
+        """
+        self.api_key = api_key
+        self._lock = threading.RLock()
+        self._db: Optional[MealDatabase] = None
+        self._vector_store: Optional[VectorStore] = None
+        self._llm: Optional[OpenAIClient] = None
+        self._service: Optional[MealService] = None
+        self._closed = False
+
+    def _check_open(self) -> None:
+        if self._closed:
+            raise RuntimeError("The service container is closed")
+
+    @property
+    def db(self) -> MealDatabase:
+        """Shared meal database and its connection pool."""
+        with self._lock:
+            self._check_open()
+            if self._db is None:
+                from mealprep.db.database import MealDatabase
+
+                self._db = MealDatabase()
+            return self._db
+
+    @property
+    def vector_store(self) -> VectorStore:
+        """Shared vector store and its Timescale Vector client."""
+        with self._lock:
+            self._check_open()
+            if self._vector_store is None:
+                from mealprep.db.vector_store import VectorStore
+
+                self._vector_store = VectorStore()
+            return self._vector_store
+
+    @property
+    def llm(self) -> OpenAIClient:
+        """Shared OpenAI client."""
+        with self._lock:
+            self._check_open()
+            if self._llm is None:
+                from mealprep.llm.openai_client import OpenAIClient
+
+                self._llm = OpenAIClient(self.api_key)
+            return self._llm
+
+    @property
+    def service(self) -> MealService:
+        """Meal service built on the shared clients."""
+        with self._lock:
+            self._check_open()
+            if self._service is None:
+                from mealprep.services.meal_service import MealService
+
+                self._service = MealService(
+                    db=self.db, vector_store=self.vector_store, llm=self.llm
+                )
+            return self._service
+
+    def close(self) -> None:
+        """Close the clients created so far; safe to call more than once."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            for name, resource in (
+                ("LLM client", self._llm),
+                ("vector store", self._vector_store),
+                ("database", self._db),
+            ):
+                if resource is None:
+                    continue
+                try:
+                    resource.close()
+                except Exception:
+                    logging.exception(f"Failed to close the {name}")
+            self._db = self._vector_store = self._llm = self._service = None
+        logging.info("Closed the service container")
+
+
+_container: Optional[ServiceContainer] = None
+_container_lock = threading.Lock()
+
+
+def get_container() -> ServiceContainer:
+    """
+    Return the process-wide ServiceContainer, creating it on first call.
+
+    The container is closed when the interpreter exits.
+    """
+    global _container
+    with _container_lock:
+        if _container is None:
+            _container = ServiceContainer()
+            atexit.register(_container.close)
+        return _container
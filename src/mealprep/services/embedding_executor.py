@@ -0,0 +1,146 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Iterable, Iterator, List, Optional, Tuple
+
+import openai
+from mealprep.db.vector_store import VectorStore, estimate_tokens
+from mealprep.llm.embeddings import OpenAIEmbeddingProvider
+from mealprep.helpers.rate_limit import ProgressReporter, RateLimiter
+
+# Chunks embed_chunks reads ahead of the one its caller is storing
+READ_AHEAD_CHUNKS = 2
+
+
+class EmbeddingExecutor:
+    """
+    Embeds a stream of text chunks with several API requests in flight.
+
+    Requests are throttled by a request and token rate limiter that backs off
+    when the API answers with 429, so bulk loads run as close to the quota as
+    the API allows without failing.
+    """
+
+    def __init__(
+        self,
+        vec: VectorStore,
+        max_in_flight: int = 8,
+        requests_per_minute: int = 3000,
+        tokens_per_minute: int = 1_000_000,
+        max_retries: int = 8,
+        progress: Optional[ProgressReporter] = None,
+    ):
+        """
+        Initialize EmbeddingExecutor.
+
+        Args:
+            vec: VectorStore used to generate the embeddings
+            max_in_flight: Maximum number of concurrent embedding requests
+            requests_per_minute: Request quota of the embeddings endpoint
+            tokens_per_minute: Token quota of the embeddings endpoint
+            max_retries: Attempts per request before giving up (at least one)
+            progress: Reporter for throughput and ETA
+        """
+        self.vec = vec
+        self.provider = self.vec.embedding_provider
+        if isinstance(self.provider, OpenAIEmbeddingProvider):
+            # Retries are handled here so that rate-limit errors reach the
+            # limiter; a copy is used so other users of vec keep their retries
+            self.provider = self.provider.with_options(max_retries=0)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.progress = progress or ProgressReporter(label="embeddings")
+
+    def embed_chunks(
+        self, chunks: Iterable[Tuple[Any, List[str]]]
+    ) -> Iterator[Tuple[Any, List[List[float]]]]:
+        """
+        Embed chunks of texts, yielding results in input order.
+
+        Requests for upcoming chunks are sent while earlier chunks are still in
+        flight, but no more than READ_AHEAD_CHUNKS chunks are read ahead so
+        memory stays bounded.
+
+        Args:
+            chunks: Iterable of (key, texts) pairs
+
+        Yields:
+            (key, embeddings) pairs, one per input chunk
+        """
+        pending: Deque[Tuple[Any, List[Tuple[List[int], Future]], int]] = deque()
+        chunks = iter(chunks)
+        exhausted = False
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            while pending or not exhausted:
+                # Keep the pool busy by submitting the next chunks early
+                while not exhausted and len(pending) < READ_AHEAD_CHUNKS:
+                    try:
+                        key, texts = next(chunks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    batches = [
+                        (batch, pool.submit(self._embed_batch, [texts[i] for i in batch]))
+                        for batch in self.vec.batch_indices(texts)
+                    ]
+                    pending.append((key, batches, len(texts)))
+
+                if not pending:
+                    break
+                key, batches, size = pending.popleft()
+                embeddings: List[Optional[List[float]]] = [None] * size
+                for batch, future in batches:
+                    for i, embedding in zip(batch, future.result()):
+                        embeddings[i] = embedding
+                yield key, embeddings
+
+        logging.info(f"Embedding finished: {self.progress.summary()}")
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed one batch, retrying on rate-limit and transient errors.
+
+        The embedding cache is checked first; only the texts it misses are
+        sent, and only they wait for and count against the rate limits.
+        """
+        sent_tokens = []
+
+        def throttle(request_texts: List[str]) -> None:
+            tokens = sum(estimate_tokens(text) for text in request_texts)
+            self.limiter.acquire(tokens)
+            sent_tokens.append(tokens)
+
+        attempts = max(1, self.max_retries)
+        for attempt in range(1, attempts + 1):
+            sent_tokens.clear()
+            try:
+                embeddings = self.vec.get_embeddings(
+                    texts, provider=self.provider, before_request=throttle
+                )
+            except openai.RateLimitError as e:
+                if attempt == attempts:
+                    raise
+                self.limiter.on_rate_limited(_retry_after(e))
+                continue
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                if attempt == attempts:
+                    raise
+                delay = min(60.0, 2.0**attempt)
+                logging.warning(f"Embedding request failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+                continue
+            if sent_tokens:
+                self.limiter.on_success()
+            self.progress.update(len(texts), sum(sent_tokens))
+            return embeddings
+
+
+def _retry_after(error: openai.APIStatusError) -> Optional[float]:
+    """Read the delay suggested by the API from a rate-limit response."""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -1,140 +1,27 @@
+from __future__ import annotations
+
 from datetime import datetime, timedelta
-from mealprep.llm.claude_client import ClaudeClient
-from mealprep.llm.openai_client import OpenAIClient
-from mealprep.db.database import MealDatabase
-from mealprep.db.vector_store import VectorStore
+from typing import TYPE_CHECKING
 import re
+import time
 import json
 
-# Initialize VectorStore
-vec = VectorStore()
-
-
-class MealService:
-    """Service for meal planning operations."""
-
-    def __init__(self, api_key: str = None):
-        """
-        Initialize MealService.
-
-        Args:
-            db_path: Path to SQLite database
-            api_key: Anthropic API key (from env if not provided)
-        """
-        self.db = MealDatabase()
-        self.llm = OpenAIClient(api_key)
-
-    def suggest_meal(
-        self,
-        ingredients: list[str],
-        days_back: int = 14,
-        num_people: int = 3,
-        dietary_preferences: str = None,
-        rejected_meals: list[str] = None,
-    ) -> str:
-        """
-        Suggest a meal based on available ingredients.
-
-        Args:
-            ingredients: List of available ingredients
-            days_back: Number of days to look back for recent meals (default 14)
-
-        Returns:
-            Suggested meal as string
-        """
-        # Get recent meals to avoid repetition
-        recent_meals = self.db.get_meals_from_days_back(days_back)
-        all_excluded = recent_meals + (rejected_meals or [])
-
-        if ingredients and len(ingredients) > 0:
-            # USER HAS INGREDIENTS -> Use RAG to find similar recipes
-            similar_recipes_df = vec.search(
-                ingredients,
-                limit=10,
-                metadata_filter={"dietary_preferences": dietary_preferences},
-            )
-            context_type = "ingredient-based"
-        else:
-            # NO INGREDIENTS -> Either:
-            # Option A: Get popular/diverse recipes
-            similar_recipes_df = self.db.get_diverse_recipes(
-                limit=10, dietary_preferences=dietary_preferences
-            )
-            context_type = "diverse-selection"
-
-            # Option B: Don't use RAG at all
-            # similar_recipes = []
-            # context_type = "creative"
-
-        # Build prompt for LLM
-        prompt = self._build_suggestion_prompt(
-            ingredients=ingredients or [],
-            all_excluded=all_excluded,
-            num_people=num_people,
-            dietary_preferences=dietary_preferences,
-            context_type=context_type,
-        )
-
-        # Get suggestion from LLM
-        suggestion = self.llm.get_meal_suggestion(
-            prompt, temperature=1.0, similar_recipes=similar_recipes_df
-        )
-        return self.parse_meal_suggestion(suggestion)
-
-    def add_meal(
-        self, ingredients: str, meal: str, recipe: str, date: datetime = None
-    ) -> int:
-        """
-        Add a meal to the database.
-
-        Args:
-            ingredients: Comma-separated string of ingredients
-            meal: Name of the meal
-            recipe: Recipe steps
-            date: Date when the meal was cooked (default now)
-
-        Returns:
-            ID of the added meal
-        """
-        if date is None:
-            date = datetime.now()
-
-        # Store in database
-        return self.db.add_meal(", ".join(ingredients), meal, "\n".join(recipe), date)
-
-    def get_recent_meals(self, days_back: int = 14) -> list[dict]:
-        """
-        Get meals from the last N days.
-
-        Args:
-            days_back: Number of days to retrieve
-
-        Returns:
-            List of meal records with date and meal name
-        """
-        return self.db.get_meals_from_days_back(days_back)
-
-    def add_feedback(self, meal_id: int, feedback: str) -> None:
-        """
-        Add feedback for a meal (for future learning).
+# The database, vector store and LLM modules pull in pandas, openai and
+# timescale_vector; they are imported when a MealService is created, so
+# importing the prompt and parsing helpers stays cheap
+if TYPE_CHECKING:
+    from mealprep.db.database import MealDatabase
+    from mealprep.db.response_cache import ResponseCache, ResponseRequest
+    from mealprep.db.vector_store import VectorStore
+    from mealprep.llm.openai_client import OpenAIClient
 
-        Args:
-            meal_id: ID of the meal in database
-            feedback: Feedback text (e.g., "loved it", "too spicy", etc.)
-        """
-        self.db.update_meal_feedback(meal_id, feedback)
+# Balance of relevance and diversity of the recipes given as context, so the
+# suggestions are not variations of one dish
+SUGGESTION_MMR_LAMBDA = 0.5
 
-    def get_meal_by_name(self, meal_name: int) -> dict:
-        """
-        Retrieve a meal record by its name.
 
-        Args:
-            meal_name: Name of the meal to retrieve
-
-        Returns:
-            Meal record as a dictionary
-        """
-        return self.db.get_meal_by_name(meal_name)
+class MealServiceBase:
+    """Prompt building and response parsing shared by the meal services."""
 
     def parse_meal_suggestion(self, raw_response: dict) -> dict:
         """
@@ -165,132 +52,6 @@ class MealService:
             # Fallback: use regex parser if structured output failed
             return self._fallback_parse_meal_plan(raw_response)
 
-    def generate_meal_plan(
-        self,
-        num_days: int,
-        num_people: int = 2,
-        days_back: int = 14,
-        dietary_preferences: str = None,
-    ) -> dict:
-        """Generate entire meal plan in ONE LLM call."""
-
-        # Get recent meals to avoid repetition
-        recent_meals = self.db.get_meals_from_days_back(days_back)
-
-        # Get diverse recipes for inspiration
-        similar_recipes_df = self.db.get_diverse_recipes(
-            limit=num_days * 3, dietary_preferences=dietary_preferences
-        )
-
-        # Single prompt for entire plan
-        prompt = self._build_mealplan_prompt(
-            num_days=num_days,
-            num_people=num_people,
-            dietary_preferences=dietary_preferences,
-            all_excluded=recent_meals,
-        )
-
-        suggestion = self.llm.get_meal_suggestion(
-            prompt, temperature=1.0, similar_recipes=similar_recipes_df, plan=True
-        )
-        meals = self.parse_meal_plan(suggestion)
-        # Collect all ingredients
-        ingredients = []
-        for meal in meals:
-            ingredients.extend(meal.get("ingredients", []))
-        # Generate shopping list
-        shopping_list = self._create_shopping_list(ingredients)
-
-        return {"meals": meals, "shopping_list": shopping_list}
-
-    def _generate_meal_plan(
-        self,
-        num_days: int,
-        num_people: int,
-        days_back: int,
-        dietary_preferences: str = None,
-    ) -> dict:
-        """Generate a meal plan for X days with shopping list."""
-        meals = []
-        all_ingredients = []
-
-        for day in range(1, num_days + 1):
-            # Get diverse meals - use rejected_meals to avoid repeats
-            rejected = [m["meal_name"] for m in meals]
-
-            # Generate meal for this day
-            meal = self.suggest_meal(
-                ingredients=[],  # Let RAG suggest based on variety
-                days_back=days_back,
-                num_people=num_people,
-                dietary_preferences=dietary_preferences,
-                rejected_meals=rejected,
-            )
-
-            meal["day_number"] = day
-            meals.append(meal)
-            all_ingredients.extend(meal["ingredients"])
-
-        # Deduplicate and organize shopping list
-        shopping_list = self._create_shopping_list(all_ingredients)
-        return {"meals": meals, "shopping_list": shopping_list}
-
-    def save_meal_plan_to_db(
-        self,
-        meal_plan: dict,
-        num_people: int,
-        dietary_preferences: str = None,
-        name: str = None,
-    ):
-        """Save a meal plan to database."""
-        # Create meal plan record
-        plan_id = self.db.save_meal_plan(
-            num_days=len(meal_plan["meals"]),
-            num_people=num_people,
-            dietary_preferences=dietary_preferences,
-            name=name,
-        )
-
-        # Save each meal
-        for meal in meal_plan["meals"]:
-            self.db.add_meal_to_plan(
-                meal_plan_id=plan_id,
-                day_number=meal["day_number"],
-                ingredients=", ".join(meal.get("ingredients", [])),
-                meal=meal["meal_name"],
-                recipe="|".join(meal["recipe"]),
-                accepted=False,
-            )
-
-        return plan_id
-
-    def get_latest_plan(self):
-        """Retrieve the latest meal plan."""
-        return self.db.get_latest_meal_plan()
-
-    def regenerate_meal_for_day(
-        self,
-        day: int,
-        meal_plan_context: dict,
-        num_people: int,
-        dietary_preferences: str = None,
-    ):
-        """Generate a new meal for a specific day in the plan."""
-        # Get all meal names from the plan to avoid duplicates
-        existing_meals = [
-            m["meal_name"] for m in meal_plan_context["meals"] if m["day_number"] != day
-        ]
-
-        # Generate new meal
-        new_meal = self.suggest_meal(
-            ingredients=[],
-            rejected_meals=existing_meals,
-            num_people=num_people,
-            dietary_preferences=dietary_preferences,
-        )
-
-        return new_meal
-
     def _build_suggestion_prompt(
         self,
         ingredients: list[str],
@@ -415,6 +176,32 @@ class MealService:
             """
         return prompt
 
+    def _response_request(
+        self,
+        kind: str,
+        ingredients: list[str],
+        dietary_preferences: str,
+        num_people: int,
+        num_days: int = 1,
+    ) -> ResponseRequest:
+        """
+        Describe a suggestion or plan request for the response cache.
+
+        Only requests with ingredients are cached: without them the answer is
+        made from a random sample of recipes, and reusing it would give every
+        caller with the same preferences the same "diverse" meal.
+        """
+        from mealprep.db.embedding_cache import canonical_query
+        from mealprep.db.response_cache import ResponseRequest, normalize_preferences
+
+        return ResponseRequest(
+            kind=kind,
+            ingredients=canonical_query(ingredients) if ingredients else "",
+            preferences=normalize_preferences(dietary_preferences),
+            num_people=num_people,
+            num_days=num_days,
+        )
+
     def _create_shopping_list(self, ingredients: list[str]) -> list[str]:
         """Create a deduplicated shopping list from ingredients."""
         ingredient_count = {}
@@ -581,3 +368,339 @@ class MealService:
             meals.append(meal)
 
         return meals
+
+
+class MealService(MealServiceBase):
+    """Service for meal planning operations."""
+
+    def __init__(
+        self,
+        api_key: str = None,
+        db: MealDatabase = None,
+        vector_store: VectorStore = None,
+        llm: OpenAIClient = None,
+        response_cache: ResponseCache = None,
+    ):
+        """
+        Initialize MealService.
+
+        Clients that are not given are created here; pass shared ones (see
+        ServiceContainer) to reuse their connections across services.
+
+        Args:
+            api_key: OpenAI API key (from env if not provided)
+            db: Meal database
+            vector_store: Vector store searched for similar recipes
+            llm: LLM client
+            response_cache: Cache of LLM responses (defaults to one on the
+                database pool when enabled in the settings)
+        """
+        from mealprep.config.settings import get_settings
+        from mealprep.db.database import MealDatabase
+        from mealprep.db.response_cache import ResponseCache
+        from mealprep.db.vector_store import VectorStore
+        from mealprep.llm.openai_client import OpenAIClient
+
+        self.db = db or MealDatabase()
+        self.vector_store = vector_store or VectorStore()
+        self.llm = llm or OpenAIClient(api_key)
+        if response_cache is None and get_settings().response_cache.enabled:
+            response_cache = ResponseCache(self.db.pool)
+        self.response_cache = response_cache
+
+    def suggest_meal(
+        self,
+        ingredients: list[str],
+        days_back: int = 14,
+        num_people: int = 3,
+        dietary_preferences: str = None,
+        rejected_meals: list[str] = None,
+    ) -> str:
+        """
+        Suggest a meal based on available ingredients.
+
+        Args:
+            ingredients: List of available ingredients
+            days_back: Number of days to look back for recent meals (default 14)
+
+        Returns:
+            Suggested meal as string
+        """
+        from mealprep.helpers.utils import parse_diet
+
+        # Get recent meals to avoid repetition
+        recent_meals = self.db.get_meals_from_days_back(days_back)
+        all_excluded = recent_meals + (rejected_meals or [])
+
+        # Reuse the answer to an equal or similar ingredient request, unless it
+        # suggests an excluded meal; the embedding is the one the search uses
+        request = self._response_request(
+            "suggestion", ingredients, dietary_preferences, num_people
+        )
+        embedding = (
+            self.vector_store.embed_queries([ingredients])[0]
+            if ingredients and self.response_cache
+            else None
+        )
+        cached = self._cached_response(request, all_excluded, embedding)
+        if cached is not None:
+            return self.parse_meal_suggestion(cached)
+        start_time = time.perf_counter()
+
+        if ingredients and len(ingredients) > 0:
+            # USER HAS INGREDIENTS -> Use RAG to find similar recipes
+            # Only the recipe texts go into the prompt
+            hits = self.vector_store.search(
+                ingredients,
+                limit=10,
+                return_dataframe=False,
+                diet=parse_diet(dietary_preferences),
+                mmr_lambda=SUGGESTION_MMR_LAMBDA,
+                hybrid=True,
+                columns=["contents"],
+            )
+            similar_recipes = [hit.contents for hit in hits]
+            context_type = "ingredient-based"
+        else:
+            # NO INGREDIENTS -> Either:
+            # Option A: Get popular/diverse recipes
+            similar_recipes = self.db.get_diverse_recipes(
+                limit=10, dietary_preferences=dietary_preferences
+            )["contents"].tolist()
+            context_type = "diverse-selection"
+
+            # Option B: Don't use RAG at all
+            # similar_recipes = []
+            # context_type = "creative"
+
+        # Build prompt for LLM
+        prompt = self._build_suggestion_prompt(
+            ingredients=ingredients or [],
+            all_excluded=all_excluded,
+            num_people=num_people,
+            dietary_preferences=dietary_preferences,
+            context_type=context_type,
+        )
+
+        # Get suggestion from LLM
+        suggestion = self.llm.get_meal_suggestion(
+            prompt, temperature=1.0, similar_recipes=similar_recipes
+        )
+        self._cache_response(request, suggestion, time.perf_counter() - start_time, embedding)
+        return self.parse_meal_suggestion(suggestion)
+
+    def add_meal(
+        self, ingredients: str, meal: str, recipe: str, date: datetime = None
+    ) -> int:
+        """
+        Add a meal to the database.
+
+        Args:
+            ingredients: Comma-separated string of ingredients
+            meal: Name of the meal
+            recipe: Recipe steps
+            date: Date when the meal was cooked (default now)
+
+        Returns:
+            ID of the added meal
+        """
+        if date is None:
+            date = datetime.now()
+
+        # Store in database
+        return self.db.add_meal(", ".join(ingredients), meal, "\n".join(recipe), date)
+
+    def get_recent_meals(self, days_back: int = 14) -> list[dict]:
+        """
+        Get meals from the last N days.
+
+        Args:
+            days_back: Number of days to retrieve
+
+        Returns:
+            List of meal records with date and meal name
+        """
+        return self.db.get_meals_from_days_back(days_back)
+
+    def add_feedback(self, meal_id: int, feedback: str) -> None:
+        """
+        Add feedback for a meal (for future learning).
+
+        Args:
+            meal_id: ID of the meal in database
+            feedback: Feedback text (e.g., "loved it", "too spicy", etc.)
+        """
+        self.db.update_meal_feedback(meal_id, feedback)
+
+    def get_meal_by_name(self, meal_name: int) -> dict:
+        """
+        Retrieve a meal record by its name.
+
+        Args:
+            meal_name: Name of the meal to retrieve
+
+        Returns:
+            Meal record as a dictionary
+        """
+        return self.db.get_meal_by_name(meal_name)
+
+    def generate_meal_plan(
+        self,
+        num_days: int,
+        num_people: int = 2,
+        days_back: int = 14,
+        dietary_preferences: str = None,
+    ) -> dict:
+        """Generate entire meal plan in ONE LLM call."""
+
+        # Get recent meals to avoid repetition
+        recent_meals = self.db.get_meals_from_days_back(days_back)
+
+        # Get recipes from a different cluster for each day, for variety; plans
+        # are not cached, as every plan should come from a fresh sample
+        similar_recipes = self.db.get_clustered_recipes(
+            num_clusters=num_days, per_cluster=3, dietary_preferences=dietary_preferences
+        )["contents"].tolist()
+
+        # Single prompt for entire plan
+        prompt = self._build_mealplan_prompt(
+            num_days=num_days,
+            num_people=num_people,
+            dietary_preferences=dietary_preferences,
+            all_excluded=recent_meals,
+        )
+
+        suggestion = self.llm.get_meal_suggestion(
+            prompt, temperature=1.0, similar_recipes=similar_recipes, plan=True
+        )
+        meals = self.parse_meal_plan(suggestion)
+        # Collect all ingredients
+        ingredients = []
+        for meal in meals:
+            ingredients.extend(meal.get("ingredients", []))
+        # Generate shopping list
+        shopping_list = self._create_shopping_list(ingredients)
+
+        return {"meals": meals, "shopping_list": shopping_list}
+
+    def _generate_meal_plan(
+        self,
+        num_days: int,
+        num_people: int,
+        days_back: int,
+        dietary_preferences: str = None,
+    ) -> dict:
+        """Generate a meal plan for X days with shopping list."""
+        meals = []
+        all_ingredients = []
+
+        for day in range(1, num_days + 1):
+            # Get diverse meals - use rejected_meals to avoid repeats
+            rejected = [m["meal_name"] for m in meals]
+
+            # Generate meal for this day
+            meal = self.suggest_meal(
+                ingredients=[],  # Let RAG suggest based on variety
+                days_back=days_back,
+                num_people=num_people,
+                dietary_preferences=dietary_preferences,
+                rejected_meals=rejected,
+            )
+
+            meal["day_number"] = day
+            meals.append(meal)
+            all_ingredients.extend(meal["ingredients"])
+
+        # Deduplicate and organize shopping list
+        shopping_list = self._create_shopping_list(all_ingredients)
+        return {"meals": meals, "shopping_list": shopping_list}
+
+    def save_meal_plan_to_db(
+        self,
+        meal_plan: dict,
+        num_people: int,
+        dietary_preferences: str = None,
+        name: str = None,
+    ):
+        """Save a meal plan to database."""
+        # Create meal plan record
+        plan_id = self.db.save_meal_plan(
+            num_days=len(meal_plan["meals"]),
+            num_people=num_people,
+            dietary_preferences=dietary_preferences,
+            name=name,
+        )
+
+        # Save each meal
+        for meal in meal_plan["meals"]:
+            self.db.add_meal_to_plan(
+                meal_plan_id=plan_id,
+                day_number=meal["day_number"],
+                ingredients=", ".join(meal.get("ingredients", [])),
+                meal=meal["meal_name"],
+                recipe="|".join(meal["recipe"]),
+                accepted=False,
+            )
+
+        return plan_id
+
+    def get_latest_plan(self):
+        """Retrieve the latest meal plan."""
+        return self.db.get_latest_meal_plan()
+
+    def regenerate_meal_for_day(
+        self,
+        day: int,
+        meal_plan_context: dict,
+        num_people: int,
+        dietary_preferences: str = None,
+    ):
+        """Generate a new meal for a specific day in the plan."""
+        # Get all meal names from the plan to avoid duplicates, including the
+        # meal being replaced so it is not suggested again
+        existing_meals = [m["meal_name"] for m in meal_plan_context["meals"]]
+
+        # Generate new meal
+        new_meal = self.suggest_meal(
+            ingredients=[],
+            rejected_meals=existing_meals,
+            num_people=num_people,
+            dietary_preferences=dietary_preferences,
+        )
+
+        return new_meal
+
+    def _cached_response(
+        self, request: ResponseRequest, excluded: list[str], embedding: list[float] = None
+    ):
+        """Look a request up in the response cache, None on a miss or without a cache."""
+        if self.response_cache is None or not request.ingredients:
+            return None
+        return self.response_cache.lookup(
+            request, excluded, embedding, self.vector_store.embedding_model
+        )
+
+    def _cache_response(
+        self,
+        request: ResponseRequest,
+        response,
+        latency_seconds: float,
+        embedding: list[float] = None,
+    ) -> None:
+        """Store a generated response in the response cache, if there is one."""
+        if self.response_cache is not None and request.ingredients:
+            self.response_cache.store(
+                request, response, latency_seconds, embedding, self.vector_store.embedding_model
+            )
+
+    def response_cache_stats(self) -> dict | None:
+        """Return the response cache metrics (see ResponseCache.stats), None without a cache."""
+        return self.response_cache.stats() if self.response_cache else None
+
+    def close(self) -> None:
+        """Close the database pool, the vector store and the LLM client."""
+        if self.response_cache is not None:
+            self.response_cache.close()
+        self.db.close()
+        self.vector_store.close()
+        self.llm.close()
@@ -0,0 +1,17 @@
+import os
+
+import psycopg2
+import pytest
+
+
+@pytest.fixture
+def database_url() -> str:
+    """DATABASE_URL of a reachable database; the test is skipped without one."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        pytest.skip("DATABASE_URL is not set")
+    try:
+        psycopg2.connect(url, connect_timeout=3).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Database unavailable: {e}")
+    return url
@@ -0,0 +1,88 @@
+"""Binary COPY encoding of the bulk loader."""
+
+import json
+import struct
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+from mealprep.db.bulk_loader import _ByteStream, encode_records
+
+SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+
+
+def _records() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "id": [str(uuid.uuid4()), uuid.uuid4()],
+            "metadata": [{"diet_pref": "vegan", "dessert": False}, '{"title": "Pâté"}'],
+            "contents": ["Lentil soup", "Crème brûlée"],
+            "embedding": [[0.5, -1.25, 3.0], np.array([1e-3, 2.0, -0.0])],
+        }
+    )
+
+
+def _decode(stream: bytes) -> list:
+    """Parse a binary COPY stream into tuples of raw field values."""
+    assert stream[:11] == SIGNATURE
+    flags, extension_length = struct.unpack_from("!ii", stream, 11)
+    assert (flags, extension_length) == (0, 0)
+    offset = 19
+    rows = []
+    while True:
+        (field_count,) = struct.unpack_from("!h", stream, offset)
+        offset += 2
+        if field_count == -1:
+            break
+        fields = []
+        for _ in range(field_count):
+            (length,) = struct.unpack_from("!i", stream, offset)
+            offset += 4
+            fields.append(stream[offset : offset + length])
+            offset += length
+        rows.append(fields)
+    assert offset == len(stream)
+    return rows
+
+
+@pytest.mark.parametrize("vector_type, dtype", [("vector", ">f4"), ("halfvec", ">f2")])
+def test_encode_records(vector_type, dtype):
+    df = _records()
+
+    rows = _decode(b"".join(encode_records(df, 3, vector_type)))
+
+    assert len(rows) == len(df)
+    for fields, record in zip(rows, df.itertuples()):
+        record_id, metadata, contents, embedding = fields
+        assert uuid.UUID(bytes=record_id) == uuid.UUID(str(record.id))
+        assert metadata[:1] == b"\x01"
+        expected_metadata = record.metadata
+        if isinstance(expected_metadata, str):
+            expected_metadata = json.loads(expected_metadata)
+        assert json.loads(metadata[1:].decode("utf-8")) == expected_metadata
+        assert contents.decode("utf-8") == record.contents
+        assert struct.unpack_from("!hh", embedding) == (3, 0)
+        assert len(embedding) == 4 + 3 * np.dtype(dtype).itemsize
+        values = np.frombuffer(embedding[4:], dtype=dtype)
+        np.testing.assert_array_equal(values, np.asarray(record.embedding, dtype=dtype))
+
+
+def test_encode_no_records():
+    df = _records().iloc[:0]
+
+    assert _decode(b"".join(encode_records(df, 3))) == []
+
+
+def test_encode_rejects_other_dimensions():
+    with pytest.raises(ValueError, match="Expected 4-dimensional"):
+        list(encode_records(_records(), 4))
+
+
+def test_byte_stream_reads_across_chunks():
+    stream = _ByteStream(iter([b"abc", b"", b"defgh"]))
+
+    assert stream.read(2) == b"ab"
+    assert stream.read(4) == b"c"
+    assert stream.read() == b"defgh"
+    assert stream.read() == b""
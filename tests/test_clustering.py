@@ -0,0 +1,65 @@
+"""Spherical mini-batch k-means."""
+
+import numpy as np
+import pytest
+from mealprep.helpers.clustering import MiniBatchKMeans, normalize_rows
+
+DIMENSIONS = 16
+N_CLUSTERS = 4
+
+
+def _separable(rng, n_per_cluster: int):
+    """Points scattered tightly around orthogonal directions, with their true cluster."""
+    directions = np.eye(DIMENSIONS)[:N_CLUSTERS] * 5
+    labels = np.repeat(np.arange(N_CLUSTERS), n_per_cluster)
+    points = directions[labels] + rng.normal(scale=0.3, size=(len(labels), DIMENSIONS))
+    order = rng.permutation(len(labels))
+    return points[order], labels[order]
+
+
+def _same_partition(predicted, expected) -> bool:
+    """Whether two labelings split the points the same way, up to renaming."""
+    pairs = set(zip(predicted.tolist(), expected.tolist()))
+    return len(pairs) == len(set(predicted.tolist())) == len(set(expected.tolist()))
+
+
+def test_recovers_separable_clusters_in_batches():
+    rng = np.random.default_rng(0)
+    points, labels = _separable(rng, 250)
+    model = MiniBatchKMeans(N_CLUSTERS, rng=np.random.default_rng(1))
+
+    for start in range(0, len(points), 100):
+        batch_labels = model.partial_fit(points[start : start + 100])
+        assert _same_partition(batch_labels, labels[start : start + 100])
+
+    assert model.counts.sum() == len(points)
+    assert _same_partition(model.predict(points), labels)
+    # Every centroid points at one of the true directions
+    assert np.sort(model.centroids.max(axis=1)) == pytest.approx(np.ones(N_CLUSTERS), abs=0.05)
+    assert np.allclose(np.linalg.norm(model.centroids, axis=1), 1, atol=1e-5)
+
+
+def test_restored_model_predicts_the_same():
+    rng = np.random.default_rng(2)
+    points, _ = _separable(rng, 50)
+    model = MiniBatchKMeans(N_CLUSTERS, rng=rng)
+    model.partial_fit(points)
+
+    restored = MiniBatchKMeans.from_centroids(model.centroids * 3, model.counts)
+
+    assert (restored.predict(points) == model.predict(points)).all()
+
+
+def test_normalize_rows_keeps_zero_rows():
+    rows = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+
+    np.testing.assert_allclose(rows, [[0.6, 0.8], [0.0, 0.0]], rtol=1e-6)
+
+
+def test_rejects_small_first_batch_and_unfitted_predict():
+    model = MiniBatchKMeans(N_CLUSTERS)
+
+    with pytest.raises(ValueError, match="fewer than 4 clusters"):
+        model.partial_fit(np.eye(DIMENSIONS)[:3])
+    with pytest.raises(ValueError, match="not been fitted"):
+        model.predict(np.eye(DIMENSIONS))
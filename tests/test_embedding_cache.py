@@ -0,0 +1,114 @@
+"""Query canonicalization and the embedding caches."""
+
+import itertools
+from types import SimpleNamespace
+
+import pytest
+from mealprep.db import embedding_cache
+from mealprep.db.embedding_cache import (
+    EmbeddingCache,
+    QueryEmbeddingCache,
+    cache_key,
+    canonical_query,
+    query_text,
+)
+from mealprep.db.vector_store import VectorStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Make every cache access one second later than the previous one."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: float(next(ticks)))
+
+
+def _key(i: int) -> bytes:
+    return cache_key("model", f"text {i}")
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        (["Rice ", "salmon"], "rice, salmon"),
+        (["salmons", "rice", "rice"], "rice, salmon"),
+        (["Cherry  Tomatoes", "potato"], "cherry tomato, potato"),
+        (["", "  "], ""),
+        ("  Quick   Salmon Bowl ", "quick salmon bowl"),
+    ],
+)
+def test_canonical_query(query, expected):
+    assert canonical_query(query) == expected
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        (["Pies", "cookies"], "cookies, pies"),
+        (["molasses", "bay  leaves", "brownies", "molasses"], "bay leaves, brownies, molasses"),
+        (["Rice ", "salmon"], "rice, salmon"),
+        ("  Apple Pies ", "apple pies"),
+    ],
+)
+def test_query_text_keeps_the_given_words(query, expected):
+    assert query_text(query) == expected
+
+
+def test_embed_queries_shares_embeddings_by_canonical_query():
+    embedded = []
+
+    def get_embeddings(texts):
+        embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+    vec = SimpleNamespace(query_cache=QueryEmbeddingCache(), get_embeddings=get_embeddings)
+    first = VectorStore.embed_queries(vec, [["Pies", "rice"], ["rice", "pies", "rice"]])
+    second = VectorStore.embed_queries(
+        vec, [["Salmons", "rice"], ["RICE", "pies"], ["salmon", "rice"]]
+    )
+
+    # One request per cache key, with the words as given rather than the key "py, rice"
+    assert embedded == ["pies, rice", "rice, salmons"]
+    assert first == [[10.0], [10.0]]
+    assert second == [[13.0], [10.0], [13.0]]
+
+
+def test_embedding_cache_counts_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    cache.put_many({_key(1): [1.0, 2.0], _key(2): [3.0, 4.0]})
+
+    found = cache.get_many([_key(1), _key(3), _key(1)])
+
+    assert found == {_key(1): [1.0, 2.0]}
+    assert cache.get(_key(2)) == [3.0, 4.0]
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "entries": 2}
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path, clock):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=10)
+    for i in range(10):
+        cache.put_many({_key(i): [float(i)]})
+    cache.get_many([_key(0), _key(1), _key(2)])
+
+    # The 11th entry evicts down to 9, dropping the two least recently used
+    cache.put_many({_key(10): [10.0]})
+
+    assert set(cache.get_many([_key(i) for i in range(11)])) == {
+        _key(i) for i in (0, 1, 2, 5, 6, 7, 8, 9, 10)
+    }
+    assert cache.stats()["entries"] == 9
+
+
+def test_embedding_cache_counts_entries_of_other_instances(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite")
+    first = EmbeddingCache(path, max_entries=10)
+    second = EmbeddingCache(path, max_entries=10)
+
+    first.put_many({_key(i): [float(i)] for i in range(6)})
+    second.put_many({_key(i): [float(i)] for i in range(6, 12)})
+
+    # The second instance saw 12 entries although it wrote only 6
+    assert first.stats()["entries"] == 9
+    assert second.stats()["entries"] == 9
+    # Entries written together are equally old, so any three of the first six go
+    kept = set(second.get_many([_key(i) for i in range(12)]))
+    assert {_key(i) for i in range(6, 12)} <= kept
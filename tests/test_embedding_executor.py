@@ -0,0 +1,115 @@
+"""Retries, backoff and cache use of the EmbeddingExecutor, on a fake clock."""
+
+from types import SimpleNamespace
+
+import openai
+import pytest
+from mealprep.config.settings import get_settings
+from mealprep.db.embedding_cache import EmbeddingCache
+from mealprep.db.vector_store import VectorStore
+from mealprep.helpers import rate_limit
+from mealprep.services import embedding_executor
+from mealprep.services.embedding_executor import EmbeddingExecutor
+
+from tests.test_rate_limit import FakeClock
+
+
+def _rate_limit_error(retry_after: str = None) -> openai.RateLimitError:
+    # Built without an HTTP response object; only its headers are read
+    error = openai.RateLimitError.__new__(openai.RateLimitError)
+    error.response = SimpleNamespace(headers={"retry-after": retry_after} if retry_after else {})
+    return error
+
+
+def _connection_error() -> openai.APIConnectionError:
+    return openai.APIConnectionError.__new__(openai.APIConnectionError)
+
+
+class FakeProvider:
+    """Embeds a text as its length, after raising the queued errors."""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.requests = []
+
+    def embed(self, texts):
+        self.requests.append(list(texts))
+        if self.errors:
+            raise self.errors.pop(0)
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    monkeypatch.setattr(embedding_executor, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def vec(monkeypatch, tmp_path):
+    monkeypatch.setattr(get_settings().embeddings, "provider", "hashing")
+    vec = VectorStore()
+    vec.embedding_cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    return vec
+
+
+def _executor(vec, provider, max_retries=3):
+    vec.embedding_provider = provider
+    return EmbeddingExecutor(
+        vec, requests_per_minute=60, tokens_per_minute=60_000, max_retries=max_retries
+    )
+
+
+def test_rate_limited_requests_back_off_and_retry(vec, clock):
+    provider = FakeProvider([_rate_limit_error(), _rate_limit_error("5")])
+    executor = _executor(vec, provider)
+
+    assert executor._embed_batch(["tofu", "rice"]) == [[4.0], [4.0]]
+
+    assert len(provider.requests) == 3
+    assert clock.slept == [2.0, 5.0]
+    # Halved twice, then one additive step back up
+    assert executor.limiter.fraction == pytest.approx(0.25 + executor.limiter.recovery)
+    assert executor.progress.done == 2
+
+
+def test_transient_errors_are_retried_after_a_delay(vec, clock):
+    provider = FakeProvider([_connection_error()])
+    executor = _executor(vec, provider)
+
+    assert executor._embed_batch(["tofu"]) == [[4.0]]
+    assert clock.slept == [2.0]
+    assert executor.limiter.fraction == 1.0
+
+
+def test_gives_up_after_max_retries(vec, clock):
+    provider = FakeProvider([_rate_limit_error("1")] * 3)
+    executor = _executor(vec, provider)
+
+    with pytest.raises(openai.RateLimitError):
+        executor._embed_batch(["tofu"])
+    assert len(provider.requests) == 3
+    assert executor.progress.done == 0
+
+
+def test_cached_texts_skip_the_rate_limits(vec, clock):
+    provider = FakeProvider()
+    executor = _executor(vec, provider)
+    executor._embed_batch(["tofu", "rice"])
+    requests_available = executor.limiter.requests._tokens
+    tokens_available = executor.limiter.tokens._tokens
+
+    assert executor._embed_batch(["rice", "tofu"]) == [[4.0], [4.0]]
+
+    assert len(provider.requests) == 1
+    assert executor.limiter.requests._tokens == requests_available
+    assert executor.limiter.tokens._tokens == tokens_available
+    # Cached recipes count towards the progress, but not towards the tokens sent
+    assert executor.progress.done == 4
+    assert executor.progress.tokens == 4
+
+    assert executor._embed_batch(["tofu", "salmon"]) == [[4.0], [6.0]]
+    assert provider.requests[-1] == ["salmon"]
+    assert executor.limiter.requests._tokens == requests_available - 1
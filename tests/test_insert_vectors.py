@@ -0,0 +1,37 @@
+"""Chunk selection of the recipe ingest."""
+
+import pandas as pd
+from mealprep.insert_vectors import iter_pending_chunks
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.stored = set()
+
+    def existing_ids(self, ids, table_name=None):
+        return [id_ for id_ in ids if id_ in self.stored]
+
+
+def test_repeated_recipes_are_yielded_once(tmp_path):
+    path = tmp_path / "recipes.csv"
+    titles = ["a", "b", "a", "c", "d", "e", "f", "b"]
+    pd.DataFrame(
+        {
+            "title": titles,
+            "ingredients": [f"['{title} beans', 'rice']" for title in titles],
+            "directions": ["Cook"] * len(titles),
+        }
+    ).to_csv(path, index=False)
+    vec = FakeVectorStore()
+
+    yielded = []
+    previous = None
+    for _, chunk in iter_pending_chunks(vec, path, 2, None, None):
+        # The chunk before is stored while this one is embedded
+        if previous is not None:
+            vec.stored.update(previous["id"])
+        yielded.append(chunk["title"].tolist())
+        previous = chunk
+
+    # "a" repeats in the chunk in flight; "b" is stored by the time it repeats
+    assert yielded == [["a", "b"], ["c"], ["d", "e"], ["f"]]
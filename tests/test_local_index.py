@@ -0,0 +1,155 @@
+"""Memory-mapped exact search, checked against brute force and jsonb containment."""
+
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+from mealprep.db import local_index
+from mealprep.db.local_index import FLAGS_FILE, MmapVectorIndex, contains
+from mealprep.helpers.utils import FLAG_COLUMNS
+
+DIMENSIONS = 8
+NUM_ROWS = 300
+DIETS = ["vegan", "vegetarian", "pescatarian", "omnivore"]
+
+FILTERS = [
+    {"diet_pref": "vegan"},
+    {"with_meat": False, "dessert": True},
+    [{"diet_pref": "vegan"}, {"diet_pref": "pescatarian", "with_fish": True}],
+    {"tags": ["quick"]},
+    {"nutrition": {"course": "main"}},
+    [{"dessert": True}, {"tags": ["quick", "cheap"]}],
+    {"diet_pref": "vegan", "tags": ["cheap"]},
+]
+
+
+def _records(rng) -> pd.DataFrame:
+    rows = []
+    for i in range(NUM_ROWS):
+        metadata = {"diet_pref": DIETS[i % len(DIETS)], "tags": []}
+        for flag in FLAG_COLUMNS:
+            # Some records predate a flag and do not have it at all
+            if rng.random() > 0.1:
+                metadata[flag] = bool(rng.random() < 0.5)
+        for tag in ("quick", "cheap"):
+            if rng.random() < 0.3:
+                metadata["tags"].append(tag)
+        metadata["nutrition"] = {"course": "main" if i % 3 else "side", "kcal": int(rng.integers(100, 900))}
+        rows.append(
+            {
+                "id": uuid.UUID(int=i),
+                "metadata": metadata,
+                "contents": f"recipe {i}",
+                "embedding": rng.normal(size=DIMENSIONS).tolist(),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def records():
+    return _records(np.random.default_rng(0))
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch, records):
+    # Small blocks, so that the top k is merged across blocks
+    monkeypatch.setattr(local_index, "BLOCK_ROWS", 64)
+    writer = MmapVectorIndex.writer(tmp_path / "index", NUM_ROWS, DIMENSIONS)
+    writer.append(records[:100])
+    writer.append(records[100:])
+    writer.close()
+    return MmapVectorIndex(tmp_path / "index")
+
+
+def _brute_force(records, query, limit, metadata_filter=None):
+    """Ids and cosine distances of the nearest matching records."""
+    embeddings = np.array(records["embedding"].tolist())
+    distances = 1 - embeddings @ query / (np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query))
+    patterns = metadata_filter if isinstance(metadata_filter, list) else [metadata_filter]
+    matching = [
+        i
+        for i, metadata in enumerate(records["metadata"])
+        if metadata_filter is None or any(contains(metadata, pattern) for pattern in patterns)
+    ]
+    nearest = sorted(matching, key=lambda i: distances[i])[:limit]
+    return [records["id"][i] for i in nearest], [distances[i] for i in nearest]
+
+
+def _assert_matches_brute_force(index, records, queries, limit, metadata_filter=None):
+    results = index.search(queries, limit=limit, metadata_filter=metadata_filter)
+
+    assert len(results) == len(queries)
+    for query, result in zip(queries, results):
+        ids, distances = _brute_force(records, query, limit, metadata_filter)
+        assert [row[0] for row in result] == ids
+        assert [row[4] for row in result] == pytest.approx(distances, abs=1e-5)
+
+
+def test_top_k_matches_brute_force(index, records):
+    queries = np.random.default_rng(1).normal(size=(5, DIMENSIONS))
+
+    _assert_matches_brute_force(index, records, queries, limit=10)
+
+    result = index.search(queries[0], limit=1)[0][0]
+    position = records["id"].tolist().index(result[0])
+    assert result[1] == records["metadata"][position]
+    assert result[2] == f"recipe {position}"
+    np.testing.assert_allclose(result[3], records["embedding"][position], rtol=1e-6)
+
+
+@pytest.mark.parametrize("metadata_filter", FILTERS)
+def test_filtered_top_k_matches_brute_force(index, records, metadata_filter):
+    queries = np.random.default_rng(2).normal(size=(3, DIMENSIONS))
+
+    _assert_matches_brute_force(index, records, queries, limit=7, metadata_filter=metadata_filter)
+
+
+def test_filter_with_few_matches_returns_fewer_rows(index, records):
+    metadata_filter = {"nutrition": {"kcal": records["metadata"][42]["nutrition"]["kcal"]}}
+    expected = sum(contains(metadata, metadata_filter) for metadata in records["metadata"])
+
+    result = index.search(np.ones(DIMENSIONS), limit=50, metadata_filter=metadata_filter)[0]
+
+    assert 1 <= len(result) == expected < 50
+    assert index.search(np.ones(DIMENSIONS), metadata_filter={"diet_pref": "keto"}) == [[]]
+
+
+@pytest.mark.parametrize("metadata_filter", FILTERS)
+def test_filter_columns_agree_with_scanning_the_records(tmp_path, index, metadata_filter):
+    # An index exported before the filter columns existed scans every record
+    (tmp_path / "index" / FLAGS_FILE).unlink()
+    scanning = MmapVectorIndex(tmp_path / "index")
+
+    assert scanning.flags is None
+    assert (index.filter_mask(metadata_filter) == scanning.filter_mask(metadata_filter)).all()
+
+
+def test_missing_flag_matches_neither_true_nor_false(index, records):
+    missing = [i for i, metadata in enumerate(records["metadata"]) if "dessert" not in metadata]
+
+    assert missing
+    assert not index.filter_mask({"dessert": True})[missing].any()
+    assert not index.filter_mask({"dessert": False})[missing].any()
+
+
+def test_contains_follows_jsonb_semantics():
+    metadata = {"diet_pref": "vegan", "tags": ["quick", "cheap"], "nutrition": {"kcal": 400, "course": "main"}}
+
+    assert contains(metadata, {})
+    assert contains(metadata, {"nutrition": {"kcal": 400}})
+    assert contains(metadata, {"tags": ["cheap"]})
+    assert contains(metadata, {"tags": []})
+    assert not contains(metadata, {"tags": ["cheap", "slow"]})
+    assert not contains(metadata, {"nutrition": {"kcal": 400, "fat": 10}})
+    assert not contains(metadata, {"calories": None})
+    # A nested array does not contain a bare scalar; only a top-level one does
+    assert not contains(metadata, {"tags": "quick"})
+    assert contains(["quick", "cheap"], "quick")
+    assert not contains([["quick"]], "quick")
+    assert contains([["quick", "cheap"]], [["cheap"]])
+    # Numbers compare by value, but booleans are not numbers
+    assert contains({"kcal": 400}, {"kcal": 400.0})
+    assert not contains({"vegan": True}, {"vegan": 1})
+    assert not contains([0, 1], False)
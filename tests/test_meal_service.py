@@ -0,0 +1,100 @@
+"""Response cache use of MealService, on in-memory clients."""
+
+import itertools
+
+import pandas as pd
+from mealprep.db.response_cache import normalize_meal_name, response_meal_names
+from mealprep.services.meal_service import MealService
+
+
+class FakeDatabase:
+    def get_meals_from_days_back(self, days_back):
+        return []
+
+    def get_diverse_recipes(self, limit, dietary_preferences=None):
+        return pd.DataFrame({"contents": ["Lentil soup: lentils, carrots, onion"]})
+
+
+class FakeVectorStore:
+    embedding_model = "fake"
+
+    def embed_queries(self, queries):
+        return [[1.0, 0.0] for _ in queries]
+
+    def search(self, query, limit, **kwargs):
+        return []
+
+
+class FakeLLM:
+    """Suggests a new meal on every call and records the prompts."""
+
+    def __init__(self):
+        self.prompts = []
+        self._counter = itertools.count(1)
+
+    def get_meal_suggestion(self, prompt, temperature, similar_recipes, plan=False):
+        self.prompts.append(prompt)
+        n = next(self._counter)
+        return {"meal_name": f"Meal {n}", "ingredients": [f"item {n}"], "recipe": ["Cook"]}
+
+
+class FakeResponseCache:
+    """Exact-tier cache in a dict, honoring the exclusion list like ResponseCache."""
+
+    def __init__(self):
+        self.responses = {}
+        self.lookups = []
+
+    def lookup(self, request, excluded=(), embedding=None, embedding_model=None):
+        self.lookups.append(request)
+        response = self.responses.get(request.key())
+        excluded = {normalize_meal_name(name) for name in excluded}
+        if response is None or excluded.intersection(response_meal_names(response)):
+            return None
+        return response
+
+    def store(self, request, response, latency_seconds, embedding=None, embedding_model=None):
+        self.responses[request.key()] = response
+
+
+def _service():
+    return MealService(
+        db=FakeDatabase(),
+        vector_store=FakeVectorStore(),
+        llm=FakeLLM(),
+        response_cache=FakeResponseCache(),
+    )
+
+
+def test_regenerate_suggests_a_new_meal_each_time():
+    service = _service()
+    plan = {
+        "meals": [
+            {"day_number": 1, "meal_name": "Tofu stir fry"},
+            {"day_number": 2, "meal_name": "Chicken curry"},
+        ]
+    }
+
+    shown = []
+    for _ in range(3):
+        meal = service.regenerate_meal_for_day(2, plan, num_people=2)
+        assert meal["meal_name"] not in shown
+        shown.append(meal["meal_name"])
+        # The prompt excludes the meal being replaced as well as the other days'
+        assert plan["meals"][1]["meal_name"] in service.llm.prompts[-1]
+        assert plan["meals"][0]["meal_name"] in service.llm.prompts[-1]
+        plan["meals"][1]["meal_name"] = meal["meal_name"]
+
+    # Suggestions without ingredients come from a random sample, never the cache
+    assert service.response_cache.lookups == []
+    assert service.response_cache.responses == {}
+
+
+def test_ingredient_suggestion_is_reused():
+    service = _service()
+
+    first = service.suggest_meal(["chicken", "rice"], num_people=2)
+    second = service.suggest_meal(["rice", "chicken"], num_people=2)
+
+    assert second == first
+    assert len(service.llm.prompts) == 1
@@ -0,0 +1,63 @@
+"""Maximal marginal relevance selection."""
+
+import numpy as np
+from mealprep.helpers.mmr import mmr_select
+
+CANDIDATES = np.array(
+    [
+        [1.0, 0.0],
+        [0.99, 0.1],
+        [0.0, 1.0],
+        [-1.0, 0.0],
+    ]
+)
+
+
+def _cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def _reference_mmr(query, candidates, k, lambda_mult):
+    """Straightforward MMR, recomputing every similarity at every step."""
+    selected = []
+    while len(selected) < min(k, len(candidates)):
+        scores = {}
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            redundancy = max((_cosine(candidate, candidates[j]) for j in selected), default=0.0)
+            scores[i] = lambda_mult * _cosine(query, candidate) - (1 - lambda_mult) * redundancy
+        selected.append(max(scores, key=scores.get))
+    return selected
+
+
+def test_lambda_one_ranks_by_relevance():
+    query = np.array([0.2, 1.0])
+
+    relevance = [_cosine(query, candidate) for candidate in CANDIDATES]
+
+    assert mmr_select(query, CANDIDATES, 4, lambda_mult=1.0) == list(np.argsort(relevance)[::-1])
+
+
+def test_lambda_zero_picks_the_least_similar_next():
+    # The first pick has no redundancy to weigh, so the most relevant (first) one is taken
+    order = mmr_select(np.array([1.0, 0.0]), CANDIDATES, 4, lambda_mult=0.0)
+
+    assert order == [0, 3, 2, 1]
+
+
+def test_balanced_lambda_matches_reference():
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=16)
+    candidates = rng.normal(size=(40, 16))
+
+    for lambda_mult in (0.3, 0.5, 0.8):
+        assert mmr_select(query, candidates, 10, lambda_mult) == _reference_mmr(
+            query, candidates, 10, lambda_mult
+        )
+
+
+def test_k_is_capped_by_the_candidates():
+    assert sorted(mmr_select(np.array([1.0, 0.0]), CANDIDATES, 10, 0.5)) == [0, 1, 2, 3]
+    assert mmr_select(np.array([1.0, 0.0]), CANDIDATES[:0], 3) == []
+    assert mmr_select(np.array([1.0, 0.0]), CANDIDATES, 0) == []
@@ -0,0 +1,168 @@
+"""Connection pool checkout, transactions and timeouts, on fake connections."""
+
+import threading
+
+import psycopg2
+import pytest
+from mealprep.db import pool as pool_module
+from mealprep.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection")
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Connections opened by the pool, in order."""
+    opened = []
+
+    def connect(dsn, options=None):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(pool_module.psycopg2, "connect", connect)
+    return opened
+
+
+def test_checkout_reuses_connections_and_commits(connections):
+    pool = ConnectionPool("dsn", min_size=1, max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second is connections[0]
+    assert first.commits == 2
+    assert pool.stats()["checkouts"] == 2
+    assert pool.stats()["size"] == 1
+
+
+def test_failed_block_rolls_back_and_returns_the_connection(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1)
+
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("bad statement")
+
+    assert (conn.commits, conn.rollbacks) == (0, 1)
+    with pool.connection() as again:
+        assert again is conn
+
+
+def test_connection_closed_in_block_is_discarded(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1)
+
+    with pool.connection() as conn:
+        conn.close()
+    with pool.connection() as replacement:
+        pass
+
+    assert replacement is not conn
+    assert pool.stats()["discarded"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_stale_broken_connection_is_replaced(connections):
+    pool = ConnectionPool("dsn", min_size=1, max_size=1, check_after_seconds=0)
+    connections[0].broken = True
+
+    with pool.connection() as conn:
+        pass
+
+    assert conn is connections[1]
+    assert pool.stats()["reconnects"] == 1
+
+
+def test_checkout_times_out_when_the_pool_is_exhausted(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1, timeout=0.05)
+
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+
+    assert pool.stats()["timeouts"] == 1
+    assert len(connections) == 1
+
+
+def test_waiter_gets_the_released_connection(connections):
+    pool = ConnectionPool("dsn", min_size=0, max_size=1, timeout=5)
+    checked_out = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with pool.connection():
+            checked_out.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    checked_out.wait()
+    threading.Timer(0.05, release.set).start()
+
+    with pool.connection() as conn:
+        assert conn is connections[0]
+    holder.join()
+    assert pool.stats()["timeouts"] == 0
+
+
+def test_connect_retries_with_backoff(monkeypatch):
+    attempts = []
+
+    def connect(dsn, options=None):
+        attempts.append(options)
+        if len(attempts) < 3:
+            raise psycopg2.OperationalError("connection refused")
+        return FakeConnection()
+
+    monkeypatch.setattr(pool_module.psycopg2, "connect", connect)
+    pool = ConnectionPool("dsn", min_size=1, connect_retries=3, backoff_seconds=0)
+    assert pool.stats()["size"] == 1
+    assert attempts[0] == "-c statement_timeout=30000"
+
+    attempts.clear()
+    with pytest.raises(ConnectionError):
+        ConnectionPool("dsn", min_size=1, connect_retries=2, backoff_seconds=0)
+
+
+def test_closed_pool_refuses_checkouts(connections):
+    pool = ConnectionPool("dsn", min_size=1, max_size=1)
+    pool.close()
+
+    assert connections[0].closed
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            pass
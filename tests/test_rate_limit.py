@@ -0,0 +1,89 @@
+"""Token bucket and adaptive rate limiter, on a fake clock."""
+
+import pytest
+from mealprep.helpers import rate_limit
+from mealprep.helpers.rate_limit import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module; sleeping advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_bucket_starts_full_and_refills(clock):
+    bucket = TokenBucket(per_minute=60, capacity=10)
+
+    assert bucket.acquire(10) == 0
+    # Refills at one token per second
+    assert bucket.acquire(3) == pytest.approx(3.0)
+    clock.now += 100
+    assert bucket.acquire(10) == 0
+    assert bucket.acquire(1) == pytest.approx(1.0)
+
+
+def test_bucket_delays_requests_above_capacity(clock):
+    bucket = TokenBucket(per_minute=60, capacity=10)
+    bucket.acquire(4)
+
+    # Waits until the bucket is full, then goes into debt
+    assert bucket.acquire(25) == pytest.approx(4.0)
+    assert bucket.acquire(1) == pytest.approx(16.0)
+
+
+def test_bucket_rate_change_keeps_accrued_tokens(clock):
+    bucket = TokenBucket(per_minute=60, capacity=10)
+    bucket.acquire(10)
+    clock.now += 2
+
+    bucket.set_rate(120)
+
+    assert bucket.acquire(4) == pytest.approx(1.0)
+
+
+def test_limiter_halves_rates_and_pauses_when_rate_limited(clock):
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=60_000)
+
+    assert limiter.on_rate_limited() == 2.0
+    assert limiter.on_rate_limited() == 4.0
+    assert limiter.on_rate_limited(retry_after=7.5) == 7.5
+    assert limiter.fraction == 0.125
+    assert limiter.requests.rate == pytest.approx(600 * 0.125 / 60)
+    assert limiter.tokens.rate == pytest.approx(60_000 * 0.125 / 60)
+
+    # Every caller waits out the longest pause
+    assert limiter.acquire(10) == pytest.approx(7.5)
+
+
+def test_limiter_backs_off_to_min_fraction_and_recovers_additively(clock):
+    limiter = RateLimiter(600, 60_000, min_fraction=0.1, recovery=0.05)
+    for _ in range(10):
+        limiter.on_rate_limited(retry_after=1)
+    assert limiter.fraction == 0.1
+
+    for _ in range(3):
+        limiter.on_success()
+    assert limiter.fraction == pytest.approx(0.25)
+    assert limiter.tokens.rate == pytest.approx(60_000 * 0.25 / 60)
+
+    # A success resets the exponential delay
+    assert limiter.on_rate_limited() == 2.0
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.fraction == 1.0
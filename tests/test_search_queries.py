@@ -0,0 +1,44 @@
+"""SQL built by search_queries, run against a scratch table."""
+
+import psycopg2
+import pytest
+from mealprep.db.search_queries import cluster_sample_query
+
+
+@pytest.fixture
+def cursor(database_url):
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """CREATE TEMP TABLE recipes (
+                    contents text, cluster_id int, random_key float8 DEFAULT random())"""
+            )
+            cursor.execute("CREATE TEMP TABLE recipes_clusters (cluster_id int, size int)")
+            yield cursor
+    finally:
+        conn.close()
+
+
+def test_cluster_sample_returns_small_clusters_once(cursor):
+    # Cluster 0 has fewer rows than are sampled per cluster
+    cursor.execute(
+        """INSERT INTO recipes (contents, cluster_id)
+        SELECT 'recipe ' || i, (i >= 2)::int FROM generate_series(0, 11) AS i"""
+    )
+    cursor.execute("INSERT INTO recipes_clusters VALUES (0, 2), (1, 10), (2, 0)")
+
+    for _ in range(20):
+        cursor.execute(
+            cluster_sample_query("recipes", "recipes_clusters"),
+            {"clusters": 3, "per_cluster": 4},
+        )
+        rows = cursor.fetchall()
+        by_cluster = {}
+        for cluster_id, contents in rows:
+            by_cluster.setdefault(cluster_id, []).append(contents)
+
+        assert len(rows) == len({contents for _, contents in rows})
+        assert sorted(by_cluster[0]) == ["recipe 0", "recipe 1"]
+        assert len(by_cluster[1]) == 4
+        assert 2 not in by_cluster
@@ -0,0 +1,72 @@
+"""Startup-time budget of the mealprep entry points."""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from mealprep.benchmarks.import_time import measure_import
+
+# Milliseconds mealprep's own modules may add to an import, on top of the
+# third-party packages every entry point needs anyway
+IMPORT_BUDGET_MS = 150
+# Milliseconds between a list_tools request and its response
+LIST_TOOLS_BUDGET_MS = 200
+
+LIGHT_MODULES = [
+    "mealprep.services.meal_service",
+    "mealprep.services.container",
+]
+
+
+def _own_import_ms(result: dict) -> float:
+    return result["by_package_ms"].get("mealprep", 0.0)
+
+
+def _requires_mcp_server_api():
+    mcp_server = pytest.importorskip("mcp.server")
+    if not hasattr(mcp_server.Server, "list_tools"):
+        pytest.skip("mealprep.mcp_server uses the decorator API of mcp 1.x")
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_import_defers_heavy_packages(module):
+    result = measure_import(module)
+
+    assert result["heavy_packages"] == []
+    assert result["total_ms"] < IMPORT_BUDGET_MS
+
+
+def test_mcp_server_import_defers_service():
+    _requires_mcp_server_api()
+    result = measure_import("mealprep.mcp_server")
+
+    assert result["heavy_packages"] == []
+    assert _own_import_ms(result) < IMPORT_BUDGET_MS
+
+
+def test_mcp_server_answers_list_tools():
+    _requires_mcp_server_api()
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    async def list_tools():
+        server = StdioServerParameters(
+            command=sys.executable, args=["-m", "mealprep.mcp_server"], env=dict(os.environ)
+        )
+        async with stdio_client(server) as (read_stream, write_stream):
+            async with ClientSession(read_stream, write_stream) as session:
+                await session.initialize()
+                start_time = time.perf_counter()
+                result = await session.list_tools()
+                return result, (time.perf_counter() - start_time) * 1000
+
+    result, elapsed_ms = asyncio.run(list_tools())
+
+    assert {tool.name for tool in result.tools} == {
+        "suggest_meal",
+        "generate_meal_plan",
+        "search_recipes",
+    }
+    assert elapsed_ms < LIST_TOOLS_BUDGET_MS
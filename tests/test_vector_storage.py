@@ -0,0 +1,95 @@
+"""Build and search a small vector table in each embedding storage mode."""
+
+import itertools
+import uuid
+
+import pandas as pd
+import pytest
+from mealprep.config.settings import get_settings
+from mealprep.db.search_queries import column_type, index_column_type
+from mealprep.db.vector_store import COMPACT_STORAGE_PGVECTOR, VectorStore
+from mealprep.helpers.utils import add_dietary_prefs, diet_metadata
+
+PROTEINS = ["chicken", "salmon", "tofu", "lentils", "shrimp", "eggs", "beef", "chickpeas"]
+SIDES = ["rice", "noodles", "potatoes", "quinoa", "couscous"]
+VEGETABLES = ["broccoli", "spinach", "carrots", "peppers"]
+
+
+def _recipes() -> pd.DataFrame:
+    rows = [
+        {"title": f"{protein} with {side}", "ingredients": f"{protein}, {side}, {vegetable}, garlic"}
+        for protein, side, vegetable in itertools.product(PROTEINS, SIDES, VEGETABLES)
+    ]
+    df = add_dietary_prefs(pd.DataFrame(rows))
+    return pd.DataFrame(
+        {
+            "id": [str(uuid.uuid4()) for _ in range(len(df))],
+            "metadata": [
+                {"title": recipe["title"], **diet_metadata(recipe)} for _, recipe in df.iterrows()
+            ],
+            "contents": [f"{r.title}: {r.ingredients}" for r in df.itertuples()],
+        }
+    )
+
+
+def _create_table(vec: VectorStore, monkeypatch) -> None:
+    """Run create_tables, creating the base table itself when vectorscale is not installed."""
+    with vec.vec_client.connect() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'vectorscale'")
+        if cursor.fetchone() is None:
+            # timescale_vector's DDL always creates the vectorscale extension
+            cursor.execute(
+                f"""CREATE TABLE "{vec.table_name}" (id uuid PRIMARY KEY, metadata jsonb,
+                contents text, embedding vector({vec.dimensions}))"""
+            )
+            monkeypatch.setattr(vec.vec_client, "create_tables", lambda: None)
+    vec.create_tables()
+
+
+@pytest.fixture(params=["vector", "halfvec", "binary"])
+def store(request, monkeypatch, database_url):
+    storage = request.param
+    settings = get_settings()
+    monkeypatch.setattr(settings.embeddings, "provider", "hashing")
+    monkeypatch.setattr(settings.embeddings, "table_name", f"test_storage_{storage}")
+    monkeypatch.setattr(settings.embedding_cache, "enabled", False)
+    monkeypatch.setattr(settings.vector_store, "storage", storage)
+    monkeypatch.setattr(settings.vector_store, "engine", "postgres")
+    monkeypatch.setattr(settings.vector_store, "index_dimensions", None)
+    monkeypatch.setattr(settings.index, "kind", "hnsw")
+    monkeypatch.setattr(settings.index, "diet_indexes", [])
+
+    vec = VectorStore()
+    try:
+        if storage != "vector" and vec.pgvector_version() < COMPACT_STORAGE_PGVECTOR:
+            pytest.skip(f"{storage} storage needs pgvector 0.7+")
+        with vec.vec_client.connect() as conn, conn.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS "{vec.table_name}"')
+        _create_table(vec, monkeypatch)
+        yield vec
+        with vec.vec_client.connect() as conn, conn.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS "{vec.table_name}"')
+    finally:
+        vec.close()
+
+
+def test_storage_mode_builds_and_searches(store):
+    storage = store.vector_settings.storage
+    df = _recipes()
+    df["embedding"] = store.get_embeddings(df["contents"].tolist())
+    store.bulk_load(df)
+    store.create_index()
+
+    assert store.storage_type() == column_type(storage)
+    info = store.index_info(refresh=True)
+    assert info["kind"] == "hnsw"
+    assert info["column_type"] == index_column_type(storage, store.dimensions)
+
+    for contents in df["contents"].iloc[::17]:
+        hits = store.search(contents, limit=3, return_dataframe=False)
+        assert hits[0].contents == contents
+        assert hits[0].distance == pytest.approx(0, abs=1e-2)
+
+    hits = store.search("tofu with rice", limit=5, diet="vegan", return_dataframe=False)
+    assert len(hits) == 5
+    assert {hit.metadata["diet_pref"] for hit in hits} == {"vegan"}